@@ -0,0 +1,101 @@
+"""Wire bytes and CPU per DV update for large vectors.
+
+`legacy` is the previous single JSON datagram re-encoded for every neighbor
+(anything above 4096 bytes was truncated by the receiver). `fragmented` is
+zlib compressed fragments, encoded once per vector version and cached.
+
+Usage:
+$ python bench/bench_dv_encoding.py [neighbors]
+"""
+import sys
+import time
+
+# harness puts src/ on the path (and silences logging)
+import harness
+from utils import encode, decode
+from dvnode import DVNode
+from fragment import Reassembler
+
+DESTINATIONS = [1_000, 10_000]
+RUNS = 5
+
+
+def create_node(destinations):
+    # port 0 binds an ephemeral socket that is never used
+    node = DVNode(0, [{"port": 1025, "loss": 0.1}])
+    node.port = 1024
+    for dst in range(destinations):
+        route = {"loss": round(0.01 * (dst % 97), 2), "hops": [1025 + dst % 4]}
+        node.distance_vector[2000 + dst] = route
+    node.dv_version += 1
+    return node
+
+
+def best_ms(fn):
+    """Fastest of RUNS calls in ms."""
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def measure(destinations, neighbors):
+    node = create_node(destinations)
+    dv = node.distance_vector
+
+    def legacy():
+        for _ in range(neighbors):
+            encode(node.create_dv_message("dv", {"vector": dv}))
+
+    def cold():
+        node.dv_cache = (None, [])
+        node.encoded_dv(dv)
+
+    def warm():
+        for _ in range(neighbors):
+            node.encoded_dv(dv)
+
+    datagrams = node.encoded_dv(dv)
+
+    def receive():
+        reassembler = Reassembler()
+        for datagram in datagrams:
+            message = decode(datagram)
+            reassembler.add(message["metadata"], message["payload"])
+
+    legacy_bytes = len(encode(node.create_dv_message("dv", {"vector": dv})))
+    node.client.sock.close()
+    return {
+        "legacy_bytes": legacy_bytes,
+        "legacy_ms": best_ms(legacy),
+        "bytes": sum(len(datagram) for datagram in datagrams),
+        "fragments": len(datagrams),
+        "cold_ms": best_ms(cold),
+        "warm_ms": best_ms(warm),
+        "receive_ms": best_ms(receive),
+    }
+
+
+def main(neighbors=4):
+    print(f"neighbors={neighbors} (CPU is per update, i.e. sent to every neighbor)")
+    print(
+        "| routes | legacy bytes | legacy ms | frag bytes | frags "
+        "| encode ms | cached ms | reassemble ms |"
+    )
+    print(
+        "|--------|--------------|-----------|------------|-------"
+        "|-----------|-----------|---------------|"
+    )
+    for destinations in DESTINATIONS:
+        r = measure(destinations, neighbors)
+        print(
+            f"| {destinations:>6} | {r['legacy_bytes']:>12} | {r['legacy_ms']:9.2f} "
+            f"| {r['bytes']:>10} | {r['fragments']:>5} | {r['cold_ms']:9.2f} "
+            f"| {r['warm_ms']:9.3f} | {r['receive_ms']:13.2f} |"
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,94 @@
+"""Failure detection and reconvergence time after a DV neighbor dies.
+
+Four real DV nodes on localhost UDP form a square where A reaches C through B
+(cheap) or D (expensive). Once A routes to C via B, B is stopped and the bench
+times how long A takes to declare B dead and how long until both A and C route
+around it through D.
+
+Usage:
+$ python bench/bench_failover.py [heartbeat-interval ...]
+"""
+import sys
+import time
+from threading import Thread
+
+# harness puts src/ on the path (and silences logging)
+import harness
+from dvnode import DVNode, HEARTBEAT_MISSES
+
+A, B, C, D = 6001, 6002, 6003, 6004
+LINKS = {
+    A: {B: 0.1, D: 0.5},
+    B: {A: 0.1, C: 0.1},
+    C: {B: 0.1, D: 0.5},
+    D: {A: 0.5, C: 0.5},
+}
+INTERVALS = [0.1, 0.25, 0.5]
+POLL_INTERVAL = 0.005
+
+
+def start_nodes(heartbeat_interval):
+    nodes = {}
+    for port, links in LINKS.items():
+        neighbors = [{"port": p, "loss": loss} for p, loss in links.items()]
+        nodes[port] = DVNode(port, neighbors, heartbeat_interval=heartbeat_interval)
+    # same threads `listen` starts, minus the input loop and signal handler
+    for node in nodes.values():
+        Thread(target=node.client.listen, daemon=True).start()
+        Thread(target=node.monitor_neighbors, daemon=True).start()
+    with nodes[A].distance_vector_lock:
+        nodes[A].dispatch_dv(nodes[A].distance_vector)
+    return nodes
+
+
+def wait_for(condition, deadline=30):
+    """Seconds until `condition()` holds (None on timeout)."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < deadline:
+        if condition():
+            return time.perf_counter() - started
+        time.sleep(POLL_INTERVAL)
+    return None
+
+
+def stop_nodes(nodes):
+    for node in nodes.values():
+        node.stop_event.set()
+    time.sleep(1.1)
+    for node in nodes.values():
+        node.client.sock.close()
+
+
+def measure(heartbeat_interval):
+    """(initial convergence s, detection s, reconvergence s) for one failure."""
+    nodes = start_nodes(heartbeat_interval)
+    a, c = nodes[A], nodes[C]
+    converged = wait_for(lambda: a.fib.lookup(C) == B and c.fib.lookup(A) == B)
+    # let every node hear every neighbor at least once
+    time.sleep(heartbeat_interval * 2)
+
+    nodes[B].stop_event.set()
+    started = time.perf_counter()
+    wait_for(lambda: B in a.dead_neighbors)
+    detected = time.perf_counter() - started
+    wait_for(lambda: a.fib.lookup(C) == D and c.fib.lookup(A) == D)
+    reconverged = time.perf_counter() - started
+    stop_nodes(nodes)
+    return converged, detected, reconverged
+
+
+def main(*intervals):
+    intervals = intervals or INTERVALS
+    print(f"misses={HEARTBEAT_MISSES}")
+    print("| interval s | converge s | detect s | reconverge s |")
+    print("|------------|------------|----------|--------------|")
+    for interval in intervals:
+        converged, detected, reconverged = measure(interval)
+        print(
+            f"| {interval:10.2f} | {converged:10.3f} "
+            f"| {detected:8.3f} | {reconverged:12.3f} |"
+        )
+
+
+if __name__ == "__main__":
+    main(*[float(arg) for arg in sys.argv[1:]])
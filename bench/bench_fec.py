@@ -0,0 +1,75 @@
+"""Compares goodput and per packet tail latency with FEC on and off.
+
+Latency is measured from a packet's first send to its first in-order ACK
+at the receiver, so it includes waits for retransmits (or parity recovery).
+
+Usage:
+$ python bench/bench_fec.py [fec-k] [total-bytes]
+"""
+import sys
+import statistics
+
+# harness puts src/ on the path
+from harness import LoopbackNetwork, MemoryRecorder, create_gbn_pair, run_stream
+import eventtrace
+
+DROP_RATES = [0.01, 0.05, 0.1, 0.2, 0.3]
+WINDOW_SIZE = 16
+CHUNK_SIZE = 256
+RUNS = 3
+# scaled down from 500ms so a sweep finishes in seconds
+TIMEOUT = 50 / 1000
+DELAY = 2 / 1000
+
+
+def packet_latencies(sender, receiver):
+    """ms from first send to first in-order ACK, per packet."""
+    sent = sender.tracer.first_times(eventtrace.SENT)
+    acked = receiver.tracer.first_times(eventtrace.ACK_SENT)
+    return [(acked[seq] - sent[seq]) / 1_000_000 for seq in acked if seq in sent]
+
+
+def measure(drop_rate, fec_k, total_bytes):
+    """Median goodput (MB/s) and median p50/p99 latency (ms) over RUNS transfers."""
+    goodputs, p50s, p99s = [], [], []
+    for run in range(RUNS):
+        network = LoopbackNetwork(DELAY)
+        sender, receiver = create_gbn_pair(
+            network,
+            WINDOW_SIZE,
+            "-p",
+            drop_rate,
+            seed=run,
+            fec_k=fec_k,
+            timeout=TIMEOUT,
+        )
+        sender.tracer, receiver.tracer = MemoryRecorder(), MemoryRecorder()
+        try:
+            transfer = run_stream(sender, total_bytes, CHUNK_SIZE)
+        finally:
+            network.stop()
+        goodputs.append(transfer["total_bytes"] / transfer["elapsed"] / 1_000_000)
+        latencies = sorted(packet_latencies(sender, receiver))
+        p50s.append(statistics.median(latencies))
+        p99s.append(latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)])
+    return statistics.median(goodputs), statistics.median(p50s), statistics.median(p99s)
+
+
+def main(fec_k=4, total_bytes=32 * 1024):
+    print(
+        f"window={WINDOW_SIZE} k={fec_k} bytes={total_bytes} "
+        f"timeout={TIMEOUT}s delay={DELAY}s"
+    )
+    print("| -p   | off MB/s | off p50 | off p99 | fec MB/s | fec p50 | fec p99 |")
+    print("|------|----------|---------|---------|----------|---------|---------|")
+    for drop_rate in DROP_RATES:
+        off = measure(drop_rate, 0, total_bytes)
+        fec = measure(drop_rate, fec_k, total_bytes)
+        print(
+            f"| {drop_rate:<4} | {off[0]:8.3f} | {off[1]:7.1f} | {off[2]:7.1f} "
+            f"| {fec[0]:8.3f} | {fec[1]:7.1f} | {fec[2]:7.1f} |"
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,93 @@
+"""Forwarding throughput of a single DV relay and FIB rebuild cost.
+
+The relay's `send` is replaced with a counter so only the per hop work is
+timed: FIB lookup, TTL handling and building the relayed message (plus JSON
+decode/encode in the `wire` column, matching what a real hop pays).
+
+Usage:
+$ python bench/bench_forwarding.py [packets]
+"""
+import sys
+import time
+
+# harness puts src/ on the path (and silences logging)
+import harness
+from utils import encode, decode
+from dvnode import DVNode
+from fib import ForwardingTable
+
+DESTINATIONS = [10, 1000, 10000]
+NEXT_HOPS = [1, 2, 4]
+RELAY_PORT = 2000
+FIRST_DST = 10000
+
+
+class RelayNode(DVNode):
+    """DVNode that counts relayed packets instead of sending them."""
+
+    def __init__(self, distance_vector):
+        # port 0 binds an ephemeral socket that is never used
+        super().__init__(0, [])
+        self.port = RELAY_PORT
+        self.distance_vector = distance_vector
+        self.relayed = 0
+
+    def send(self, message, peer_port):
+        self.relayed += 1
+
+
+def create_distance_vector(destinations, next_hops):
+    """`destinations` routes, each with `next_hops` equal cost hops."""
+    hops = [3000 + hop for hop in range(next_hops)]
+    return {
+        FIRST_DST + dst: {"loss": 0.1, "hops": list(hops)}
+        for dst in range(destinations)
+    }
+
+
+def rate(count, started):
+    return count / (time.perf_counter() - started)
+
+
+def measure(destinations, next_hops, packets):
+    """(FIB rebuild ms, relayed packets/s, relayed packets/s incl. JSON)."""
+    relay = RelayNode(create_distance_vector(destinations, next_hops))
+    started = time.perf_counter()
+    relay.fib = ForwardingTable(relay.distance_vector)
+    rebuild_ms = (time.perf_counter() - started) * 1000
+
+    messages = [
+        relay.create_data_message(1, FIRST_DST + i % destinations, 16, "x" * 64)
+        for i in range(packets)
+    ]
+    started = time.perf_counter()
+    for message in messages:
+        relay.handle_incoming_data(message["metadata"], message["payload"])
+    in_memory = rate(packets, started)
+
+    datagrams = [encode(message) for message in messages]
+    started = time.perf_counter()
+    for datagram in datagrams:
+        message = decode(datagram)
+        relay.handle_incoming_data(message["metadata"], message["payload"])
+        encode(message)
+    wire = rate(packets, started)
+    relay.client.sock.close()
+    return rebuild_ms, in_memory, wire
+
+
+def main(packets=100_000):
+    print(f"packets={packets}")
+    print("| routes | hops | FIB rebuild ms | relay pkts/s | relay+JSON pkts/s |")
+    print("|--------|------|----------------|--------------|-------------------|")
+    for destinations in DESTINATIONS:
+        for next_hops in NEXT_HOPS:
+            rebuild_ms, in_memory, wire = measure(destinations, next_hops, packets)
+            print(
+                f"| {destinations:>6} | {next_hops:>4} | {rebuild_ms:14.3f} "
+                f"| {in_memory:12.0f} | {wire:17.0f} |"
+            )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
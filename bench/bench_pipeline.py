@@ -0,0 +1,116 @@
+"""Pipelined transfer queue and receiver flow control.
+
+The first table sends `transfers` short messages one at a time (waiting for
+each transfer's stats, as senders had to before) and then all queued back to
+back. The second streams into a sink that sleeps on every write and compares
+receive windows: refused packets, retransmissions and the most chunks ever
+buffered at the receiver.
+
+Usage:
+$ python bench/bench_pipeline.py [transfers] [total-bytes]
+"""
+import sys
+import time
+
+# harness puts src/ on the path (and silences logging)
+from harness import LoopbackNetwork, MemoryRecorder, create_gbn_pair, run_stream
+import eventtrace
+
+WINDOW_SIZE = 16
+MESSAGE = "pipeline"
+CHUNK_SIZE = 256
+# scaled down from 500ms so a sweep finishes in seconds
+TIMEOUT = 50 / 1000
+DELAY = 2 / 1000
+# per write delay of the slow consumer
+WRITE_DELAY = 1 / 1000
+RECEIVE_WINDOWS = [4, 16, 64, 1_000_000]
+
+
+class SlowSink:
+    """File-like sink that sleeps on every write and tracks the receive backlog."""
+
+    def __init__(self):
+        self.node = None
+        self.peak_backlog = 0
+
+    def write(self, data):
+        self.peak_backlog = max(self.peak_backlog, self.node.delivery.qsize() + 1)
+        time.sleep(WRITE_DELAY)
+
+    def flush(self):
+        pass
+
+
+def wait_idle(sender, deadline=60):
+    if not sender.transfer_done.wait(deadline):
+        raise TimeoutError(f"transfers did not finish within {deadline}s")
+
+
+def measure_queue(transfers, pipelined):
+    """Transfers per second for `transfers` messages."""
+    network = LoopbackNetwork(DELAY)
+    sender, _receiver = create_gbn_pair(network, WINDOW_SIZE, "-p", 0, timeout=TIMEOUT)
+    started = time.perf_counter()
+    try:
+        for _ in range(transfers):
+            if not pipelined:
+                sender.transfer_done.clear()
+            sender.handle_command(f"send {MESSAGE}")
+            if not pipelined:
+                wait_idle(sender)
+        if pipelined:
+            sender.transfer_done.clear()
+            wait_idle(sender)
+    finally:
+        network.stop()
+    return transfers / (time.perf_counter() - started)
+
+
+def measure_flow(receive_window, total_bytes):
+    """(goodput MB/s, refused packets, retransmitted packets, peak backlog)."""
+    network = LoopbackNetwork(DELAY)
+    sink = SlowSink()
+    sender, receiver = create_gbn_pair(
+        network,
+        WINDOW_SIZE,
+        "-p",
+        0,
+        timeout=TIMEOUT,
+        receiver_options={"sink": sink, "receive_window": receive_window},
+    )
+    sink.node = receiver
+    # without loss every DROPPED event at the receiver is a flow control refusal
+    receiver.tracer = MemoryRecorder()
+    try:
+        transfer = run_stream(sender, total_bytes, CHUNK_SIZE)
+    finally:
+        network.stop()
+    events = receiver.tracer.events
+    refused = sum(1 for _, event, _ in events if event == eventtrace.DROPPED)
+    goodput = transfer["total_bytes"] / transfer["elapsed"] / 1_000_000
+    return goodput, refused, transfer["retransmitted_packets"], sink.peak_backlog
+
+
+def main(transfers=50, total_bytes=64 * 1024):
+    print(f"window={WINDOW_SIZE} transfers={transfers} message={len(MESSAGE)}B")
+    print("| mode       | transfers/s |")
+    print("|------------|-------------|")
+    for pipelined in (False, True):
+        label = "pipelined" if pipelined else "serialized"
+        rate = measure_queue(transfers, pipelined)
+        print(f"| {label:<10} | {rate:11.1f} |")
+    print()
+    print(f"bytes={total_bytes} chunk={CHUNK_SIZE}B write delay={WRITE_DELAY}s")
+    print("| rwnd    | MB/s  | refused | retx | peak backlog |")
+    print("|---------|-------|---------|------|--------------|")
+    for receive_window in RECEIVE_WINDOWS:
+        goodput, refused, retx, backlog = measure_flow(receive_window, total_bytes)
+        print(
+            f"| {receive_window:>7} | {goodput:5.3f} | {refused:7} "
+            f"| {retx:4} | {backlog:12} |"
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,101 @@
+"""Latency and throughput of the udp, unix and shm transports between two processes.
+
+An echo process bounces every datagram back. Latency is the round trip of one
+JSON message at a time; throughput keeps `window` messages in flight (like a
+GBN window) and counts echoed messages per second.
+
+Usage:
+$ python bench/bench_transport.py [messages] [payload-bytes] [window]
+"""
+import sys
+import time
+from multiprocessing import Process, Event
+
+# harness puts src/ on the path (and silences logging)
+import harness
+from utils import encode, decode
+from transport import TRANSPORTS, create_transport
+
+PING_PORT = 6400
+ECHO_PORT = 6401
+BUFSIZE = 65536
+STOP = b"stop"
+# an idle window for this long means the in-flight messages were dropped
+LOSS_TIMEOUT = 0.2
+
+
+def echo(name, ready):
+    transport = create_transport(name)
+    transport.bind(ECHO_PORT)
+    ready.set()
+    while True:
+        received = transport.receive(1, BUFSIZE)
+        if received is None:
+            continue
+        data, (_ip, port) = received
+        if data == STOP:
+            break
+        transport.sendto(data, ("127.0.0.1", port))
+    transport.close()
+
+
+def receive(transport, timeout=1):
+    """Next echoed message (None if it was dropped on the way)."""
+    received = transport.receive(timeout, BUFSIZE)
+    return decode(received[0]) if received is not None else None
+
+
+def message(seq, payload):
+    return encode({"type": "message", "payload": payload, "metadata": {"seq": seq}})
+
+
+def measure(name, messages, payload_bytes, window):
+    """(rtt p50 us, rtt p99 us, messages/s with `window` in flight, lost)."""
+    ready = Event()
+    peer = Process(target=echo, args=(name, ready))
+    peer.start()
+    ready.wait()
+    transport = create_transport(name)
+    transport.bind(PING_PORT)
+    payload = "x" * payload_bytes
+    try:
+        rtts = []
+        for seq in range(messages):
+            started = time.perf_counter()
+            transport.sendto(message(seq, payload), ("127.0.0.1", ECHO_PORT))
+            receive(transport)
+            rtts.append(time.perf_counter() - started)
+        rtts.sort()
+
+        started = time.perf_counter()
+        sent = echoed = lost = 0
+        while echoed + lost < messages:
+            while sent < messages and sent - echoed - lost < window:
+                transport.sendto(message(sent, payload), ("127.0.0.1", ECHO_PORT))
+                sent += 1
+            if receive(transport, LOSS_TIMEOUT) is None:
+                # everything still in flight was dropped
+                lost = sent - echoed
+            else:
+                echoed += 1
+        rate = echoed / (time.perf_counter() - started)
+    finally:
+        transport.sendto(STOP, ("127.0.0.1", ECHO_PORT))
+        peer.join()
+        transport.close()
+    p50 = rtts[len(rtts) // 2] * 1_000_000
+    p99 = rtts[int(len(rtts) * 0.99)] * 1_000_000
+    return p50, p99, rate, lost
+
+
+def main(messages=5000, payload_bytes=512, window=16):
+    print(f"messages={messages} payload={payload_bytes}B window={window}")
+    print("| transport | rtt p50 us | rtt p99 us | messages/s | lost |")
+    print("|-----------|------------|------------|------------|------|")
+    for name in TRANSPORTS:
+        p50, p99, rate, lost = measure(name, messages, payload_bytes, window)
+        print(f"| {name:<9} | {p50:10.1f} | {p99:10.1f} | {rate:10.0f} | {lost:4} |")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
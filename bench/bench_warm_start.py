@@ -0,0 +1,151 @@
+"""Time to a stable routing table after a cold start vs a snapshot warm start.
+
+A `size` x `size` grid of real DV nodes on localhost UDP (every link 0.1) is
+started cold with one corner kicking off, snapshotted, stopped and started
+again from the snapshots. Both runs are timed until every node holds the
+shortest path loss to every other node (and, for the warm run, until every
+snapshot route was confirmed by a neighbor).
+
+Usage:
+$ python bench/bench_warm_start.py [grid-size]
+"""
+import sys
+import time
+import tempfile
+from threading import Thread
+
+# harness puts src/ on the path (and silences logging)
+import harness
+import snapshot
+from dvnode import DVNode
+
+FIRST_PORT = 6200
+LINK_LOSS = 0.1
+POLL_INTERVAL = 0.005
+# seconds a run may take to converge before it counts as not converging
+DEADLINE = 60
+
+
+def grid_neighbors(size):
+    """{ port: [neighbor, ...] } for a size x size grid."""
+    neighbors = {}
+    for row in range(size):
+        for col in range(size):
+            port = FIRST_PORT + row * size + col
+            adjacent = [(row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)]
+            neighbors[port] = [
+                FIRST_PORT + r * size + c
+                for r, c in adjacent
+                if 0 <= r < size and 0 <= c < size
+            ]
+    return neighbors
+
+
+def expected_loss(size, src, dst):
+    """Grid shortest path loss (manhattan distance hops)."""
+    src_row, src_col = divmod(src - FIRST_PORT, size)
+    dst_row, dst_col = divmod(dst - FIRST_PORT, size)
+    hops = abs(src_row - dst_row) + abs(src_col - dst_col)
+    return round(hops * LINK_LOSS, 2)
+
+
+def is_stable(size, nodes):
+    for port, node in nodes.items():
+        vector = node.distance_vector
+        if len(vector) != len(nodes) - 1:
+            return False
+        for dst, route in vector.items():
+            if abs(route["loss"] - expected_loss(size, port, dst)) > 1e-9:
+                return False
+    return True
+
+
+def start_nodes(grid, directory, kickoff):
+    nodes = {}
+    for port, neighbors in grid.items():
+        links = [{"port": neighbor, "loss": LINK_LOSS} for neighbor in neighbors]
+        path = f"{directory}/node-{port}.snap"
+        nodes[port] = DVNode(port, links, snapshot_path=path)
+    # same threads `listen` starts, minus the input loop and signal handler
+    for node in nodes.values():
+        Thread(target=node.client.listen, daemon=True).start()
+    for port, node in nodes.items():
+        if node.warm_started or port == kickoff:
+            with node.distance_vector_lock:
+                node.dispatch_dv(node.distance_vector)
+    return nodes
+
+
+def wait_for(condition, deadline=DEADLINE):
+    started = time.perf_counter()
+    while time.perf_counter() - started < deadline:
+        if condition():
+            return True
+        time.sleep(POLL_INTERVAL)
+    return False
+
+
+def stop_nodes(nodes):
+    for node in nodes.values():
+        node.stop_event.set()
+    time.sleep(1.1)
+    for node in nodes.values():
+        node.client.sock.close()
+
+
+def measure(size, directory, warm):
+    """(seconds to stable table, seconds until no stale routes remain).
+
+    Either is None when it didn't happen within the deadline."""
+    grid = grid_neighbors(size)
+    started = time.perf_counter()
+    nodes = start_nodes(grid, directory, FIRST_PORT)
+    stable = None
+    if wait_for(lambda: is_stable(size, nodes)):
+        stable = time.perf_counter() - started
+    confirmed = None
+    if wait_for(lambda: not any(node.stale_neighbors for node in nodes.values())):
+        confirmed = time.perf_counter() - started
+    if not warm:
+        for node in nodes.values():
+            node.save_snapshot()
+    stop_nodes(nodes)
+    return stable, confirmed
+
+
+def measure_io(directory, routes):
+    """(snapshot bytes, write ms, mmap load ms) for one node with `routes` routes."""
+    vector = {str(10000 + i): {"loss": 0.25, "hops": [3001]} for i in range(routes)}
+    neighbor_vectors = {3000: vector}
+    path = f"{directory}/io.snap"
+    started = time.perf_counter()
+    size = snapshot.write_snapshot(path, 2000, neighbor_vectors)
+    write_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    snapshot.read_snapshot(path)
+    load_ms = (time.perf_counter() - started) * 1000
+    return size, write_ms, load_ms
+
+
+def main(size=5):
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"grid={size}x{size} nodes={size * size}")
+        print("| start | stable s | confirmed s |")
+        print("|-------|----------|-------------|")
+        for warm in (False, True):
+            stable, confirmed = measure(size, directory, warm)
+            label = "warm" if warm else "cold"
+            if stable is None or confirmed is None:
+                print(f"| {label:>5} | did not converge within {DEADLINE}s |")
+                continue
+            print(f"| {label:>5} | {stable:8.3f} | {confirmed:11.3f} |")
+        print()
+        print("| routes | snapshot bytes | write ms | load ms |")
+        print("|--------|----------------|----------|---------|")
+        for routes in (1000, 10000):
+            size_, write_ms, load_ms = measure_io(directory, routes)
+            print(f"| {routes:>6} | {size_:14} | {write_ms:8.2f} | {load_ms:7.2f} |")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,56 @@
+"""Compares goodput of a fixed GBN window against the AIMD controller.
+
+Usage:
+$ python bench/bench_window.py [window-size] [total-bytes]
+"""
+import sys
+import statistics
+
+from harness import LoopbackNetwork, create_gbn_pair, run_stream
+
+DROP_RATES = [0, 0.01, 0.05, 0.1, 0.2]
+CHUNK_SIZE = 256
+RUNS = 3
+# scaled down from 500ms so a sweep finishes in seconds
+TIMEOUT = 50 / 1000
+DELAY = 2 / 1000
+
+
+def measure(window_size, drop_rate, total_bytes, congestion_control):
+    """Median goodput (MB/s) and retransmission ratio over RUNS transfers."""
+    goodputs, ratios = [], []
+    for run in range(RUNS):
+        network = LoopbackNetwork(DELAY)
+        sender, _receiver = create_gbn_pair(
+            network,
+            window_size,
+            "-p",
+            drop_rate,
+            seed=run,
+            congestion_control=congestion_control,
+            timeout=TIMEOUT,
+        )
+        try:
+            transfer = run_stream(sender, total_bytes, CHUNK_SIZE)
+        finally:
+            network.stop()
+        goodputs.append(transfer["total_bytes"] / transfer["elapsed"] / 1_000_000)
+        ratios.append(transfer["retransmitted_packets"] / transfer["sent_packets"])
+    return statistics.median(goodputs), statistics.median(ratios)
+
+
+def main(window_size=32, total_bytes=64 * 1024):
+    print(f"window={window_size} bytes={total_bytes} timeout={TIMEOUT}s delay={DELAY}s")
+    print("| -p   | fixed MB/s | fixed retx | aimd MB/s | aimd retx |")
+    print("|------|------------|------------|-----------|-----------|")
+    for drop_rate in DROP_RATES:
+        fixed = measure(window_size, drop_rate, total_bytes, False)
+        aimd = measure(window_size, drop_rate, total_bytes, True)
+        print(
+            f"| {drop_rate:<4} | {fixed[0]:10.3f} | {fixed[1]:10.3f} "
+            f"| {aimd[0]:9.3f} | {aimd[1]:9.3f} |"
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,95 @@
+"""ACK latency behind slow DV updates with inline handling vs receive work queues.
+
+One real `SocketClient` on localhost UDP receives a steady stream of ACKs with
+a DV update mixed in every `dv_every` ACKs. Each DV costs `DV_COST` of handler
+time (standing in for the recompute, table print and fan-out). The bench reports
+how long ACKs waited to be handled and the per class drop counters for inline
+handling (`workers=0`, the old behavior) and for worker pools of 1 and 3.
+
+Usage:
+$ python bench/bench_work_queues.py [acks] [dv-every]
+"""
+import sys
+import time
+import socket
+from threading import Event, Thread
+
+# harness puts src/ on the path (and silences logging)
+import harness
+from utils import SocketClient, encode, WORK_CLASS_NAMES
+
+PORT = 6300
+DV_COST = 5 / 1000
+ACK_INTERVAL = 0.5 / 1000
+WORKER_COUNTS = [0, 1, 3]
+QUEUE_CAPACITY = 64
+
+
+class Receiver:
+    """Handler recording ACK queueing latency and burning `DV_COST` per DV."""
+
+    def __init__(self):
+        self.latencies = []
+        self.acks = 0
+        self.done = Event()
+
+    def on_message(self, _sock, _sender_ip, message):
+        if message["type"] == "dv":
+            time.sleep(DV_COST)
+            return
+        self.latencies.append(time.perf_counter() - message["metadata"]["sent_at"])
+        self.acks += 1
+        if message["metadata"]["last"]:
+            self.done.set()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def measure(workers, acks, dv_every):
+    """(ack p50 ms, ack p99 ms, acks handled, { class: stats })."""
+    receiver = Receiver()
+    stop_event = Event()
+    client = SocketClient(
+        PORT, stop_event, receiver.on_message, workers, QUEUE_CAPACITY
+    )
+    Thread(target=client.listen, daemon=True).start()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    dv = encode({"type": "dv", "payload": {}, "metadata": {"port": PORT + 1}})
+    for seq in range(acks):
+        if seq % dv_every == 0:
+            sock.sendto(dv, ("127.0.0.1", PORT))
+        metadata = {"sent_at": time.perf_counter(), "last": seq == acks - 1}
+        sock.sendto(encode({"type": "ack", "metadata": metadata}), ("127.0.0.1", PORT))
+        time.sleep(ACK_INTERVAL)
+    receiver.done.wait(30)
+
+    stop_event.set()
+    time.sleep(1.1)
+    client.sock.close()
+    sock.close()
+    p50 = percentile(receiver.latencies, 0.5) * 1000
+    p99 = percentile(receiver.latencies, 0.99) * 1000
+    return p50, p99, receiver.acks, client.queue_stats()
+
+
+def main(acks=2000, dv_every=10):
+    print(f"acks={acks} dv every {dv_every} acks, dv cost={DV_COST * 1000}ms")
+    print(f"capacity={QUEUE_CAPACITY} per class")
+    drops = " | ".join(f"{name} drops" for name in WORK_CLASS_NAMES)
+    print(f"| workers | ack p50 ms | ack p99 ms | acks  | {drops} |")
+    rules = "|".join("-" * (len(name) + 8) for name in WORK_CLASS_NAMES)
+    print(f"|---------|------------|------------|-------|{rules}|")
+    for workers in WORKER_COUNTS:
+        p50, p99, handled, stats = measure(workers, acks, dv_every)
+        dropped = " | ".join(
+            f"{stats[name]['dropped']:>{len(name) + 6}}" for name in WORK_CLASS_NAMES
+        )
+        print(f"| {workers:>7} | {p50:10.3f} | {p99:10.3f} | {handled:5} | {dropped} |")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,535 @@
+"""Vectorized discrete event model of a GenericGBNode transfer for capacity planning.
+
+Each row of a batch is one sender/receiver pair transferring `packets` one
+character packets (a `send` command) over a link with a fixed one way delay.
+Every iteration moves each row to its own next event (a data packet or ACK
+handled, or a timer expiry) and applies the node's rules with numpy masks:
+
+- the sender fills `window_size`, capped by the receiver's advertised window
+  once an ACK arrives, and only the ACK for exactly `window_base` slides it
+- a timer that sees no progress for `timeout` resends everything in flight
+- `-p` drops each data packet/ACK with a probability, `-d` drops every nth
+  packet/ACK number the first time it's seen (each node applies its own rule)
+- the receiver ACKs the next in order packet, re-ACKs duplicates, ignores
+  packets past a gap and sends stats after the last packet
+- both nodes handle their inbox one packet at a time, `service` seconds each
+  (the harness' per port pump threads)
+
+It reports the node's stats counters (sent/retransmitted packets, receiver
+dropped/total packets) plus timeouts, goodput and per packet latency (first
+send until in order delivery). AIMD (`-c aimd`), FEC, streams and receiver
+flow control aren't modelled.
+
+Usage:
+$ python bench/gbn_sim.py sweep [packets] [replicas] [results.json]
+$ python bench/gbn_sim.py validate [packets] [runs]
+
+`sweep` runs every WINDOWS x LOSS_RATES x RTTS x TIMEOUTS configuration and
+prints goodput and p99 latency tables at the node's default timeout (every
+configuration is written to `results.json`). `validate` fits `service` to a
+lossless loopback transfer and compares the model with real GenericGBNode
+pairs. Needs numpy (the nodes themselves don't).
+"""
+import sys
+import json
+import time
+import statistics
+from threading import Event
+
+import numpy as np
+
+# harness puts src/ on the path (and silences logging)
+from harness import LoopbackNetwork, create_gbn_pair
+from gbnnode import RECEIVE_WINDOW, TIMER_SLEEP_INTERVAL
+
+WINDOWS = [1, 2, 4, 8, 16, 32, 64, 128]
+LOSS_RATES = [0, 0.01, 0.02, 0.05, 0.1, 0.2, 0.3]
+RTTS = [1 / 1000, 5 / 1000, 10 / 1000, 20 / 1000, 50 / 1000, 100 / 1000]
+TIMEOUTS = [50 / 1000, 200 / 1000, TIMER_SLEEP_INTERVAL]
+# per packet handling time of the loopback harness, fitted by `validate`
+SERVICE_TIME = 300 / 1_000_000
+# sequence number standing in for the stats message in the sender's inbox
+STATS = -1
+
+# (window, mode, mode value) compared against real runs, with the bench harness'
+# scaled down timeout and delay
+VALIDATION_CONFIGS = [
+    (8, "-p", 0),
+    (8, "-p", 0.05),
+    (16, "-p", 0.1),
+    (4, "-p", 0.2),
+    (8, "-d", 5),
+    (32, "-d", 10),
+]
+VALIDATION_TIMEOUT = 50 / 1000
+VALIDATION_DELAY = 2 / 1000
+VALIDATION_REPLICAS = 200
+
+
+def offsets_within(count):
+    """0..count-1 for each row's `count`, concatenated."""
+    starts = np.repeat(np.cumsum(count) - count, count)
+    return np.arange(starts.size) - starts
+
+
+class Fifo:
+    """Per row inbox of (seq, ready time), one ring buffer row per batch row."""
+
+    def __init__(self, rows, capacity):
+        self.capacity = capacity
+        self.seq = np.zeros((rows, capacity), dtype=np.int64)
+        self.ready = np.zeros((rows, capacity))
+        self.head = np.zeros(rows, dtype=np.int64)
+        self.tail = np.zeros(rows, dtype=np.int64)
+
+    def push(self, rows, seq, ready, offsets=None):
+        """Appends a packet per row; a row repeated for a burst needs `offsets`."""
+        tail = self.tail[rows] if offsets is None else self.tail[rows] + offsets
+        slot = tail % self.capacity
+        self.seq[rows, slot] = seq
+        self.ready[rows, slot] = ready
+        if offsets is None:
+            self.tail[rows] += 1
+        else:
+            np.add.at(self.tail, rows, 1)
+        if np.any(self.tail[rows] - self.head[rows] > self.capacity):
+            raise OverflowError(f"more than {self.capacity} packets queued in a row")
+
+    def pop(self, rows):
+        slot = self.head[rows] % self.capacity
+        self.head[rows] += 1
+        return self.seq[rows, slot]
+
+    def next_at(self, rows, busy):
+        """When `rows` handle their oldest packet (inf when empty)."""
+        head = self.head[rows]
+        ready = self.ready[rows, head % self.capacity]
+        return np.where(self.tail[rows] > head, np.maximum(ready, busy), np.inf)
+
+    def select(self, keep):
+        for name in ("seq", "ready", "head", "tail"):
+            setattr(self, name, getattr(self, name)[keep])
+
+
+class GBNModel:
+    """Batch of sender/receiver pairs, one row per (configuration, replica).
+
+    Parameters are per row arrays; `nth` of 0 disables the `-d` rule and `loss`
+    of 0 the `-p` rule. Attribute names follow GenericGBNode's state.
+    """
+
+    def __init__(self, packets, window_size, loss, nth, delay, timeout, service, seed):
+        arrays = np.broadcast_arrays(window_size, loss, nth, delay, timeout, service)
+        window_size, loss, nth, delay, timeout, service = [a.copy() for a in arrays]
+        rows = len(window_size)
+        self.packets = packets
+        self.random = np.random.default_rng(seed)
+        self.window_size = window_size.astype(np.int64)
+        self.loss = loss.astype(float)
+        self.nth = nth.astype(np.int64)
+        self.delay = delay.astype(float)
+        self.timeout = timeout.astype(float)
+        self.service = service.astype(float)
+        # original row of each (compacted) row
+        self.rows = np.arange(rows)
+        self.done = np.zeros(rows, dtype=bool)
+
+        # sender
+        self.window_base = np.zeros(rows, dtype=np.int64)
+        self.next_seq_num = np.zeros(rows, dtype=np.int64)
+        self.highest_seq_sent = np.full(rows, -1, dtype=np.int64)
+        self.has_peer_rwnd = np.zeros(rows, dtype=bool)
+        self.pre_timer_base = np.zeros(rows, dtype=np.int64)
+        self.timer_at = self.timeout.copy()
+        self.sender_busy = np.zeros(rows)
+        # `-d` only drops a number the first time (per node)
+        self.dropped_acks = np.zeros((rows, packets), dtype=bool)
+        self.first_sent = np.full((rows, packets), np.inf)
+
+        # receiver
+        self.incoming_seq_num = np.zeros(rows, dtype=np.int64)
+        self.receiver_busy = np.zeros(rows)
+        self.dropped_data = np.zeros((rows, packets), dtype=bool)
+        self.delivered = np.zeros((rows, packets))
+
+        # a timeout resends at most a window while earlier packets may still queue
+        capacity = 4 * int(self.window_size.max(initial=1)) + 4
+        self.data = Fifo(rows, capacity)
+        self.acks = Fifo(rows, capacity)
+
+        # stats counters
+        self.sent_packets = np.zeros(rows, dtype=np.int64)
+        self.retransmitted_packets = np.zeros(rows, dtype=np.int64)
+        self.dropped_packets = np.zeros(rows, dtype=np.int64)
+        self.timeouts = np.zeros(rows, dtype=np.int64)
+        self.discarded_acks = np.zeros(rows, dtype=np.int64)
+        # by original row, filled in as rows finish
+        self.results = {
+            "elapsed": np.full(rows, np.nan),
+            "sent_packets": np.zeros(rows, dtype=np.int64),
+            "retransmitted_packets": np.zeros(rows, dtype=np.int64),
+            "dropped_packets": np.zeros(rows, dtype=np.int64),
+            "total_packets": np.zeros(rows, dtype=np.int64),
+            "timeouts": np.zeros(rows, dtype=np.int64),
+            "discarded_acks": np.zeros(rows, dtype=np.int64),
+            "latency": np.full((rows, packets), np.nan),
+        }
+
+    def effective_window(self, rows):
+        window = self.window_size[rows]
+        # every ACK advertises the (never filling) receive window for `send`
+        capped = np.minimum(window, RECEIVE_WINDOW)
+        return np.where(self.has_peer_rwnd[rows], capped, window)
+
+    def should_drop(self, rows, seq, dropped):
+        """`-p`/`-d` decision for packet (or ACK) numbers `seq` at one node."""
+        drop = self.random.random(len(rows)) < self.loss[rows]
+        nth = self.nth[rows]
+        is_drop_index = (nth > 0) & (seq % np.maximum(nth, 1) == 0) & (seq != 0)
+        first_time = is_drop_index & ~dropped[rows, seq]
+        dropped[rows[first_time], seq[first_time]] = True
+        return drop | first_time
+
+    def send(self, rows, first, count, now):
+        """Sends packets `first` to `first + count - 1` of each row back to back."""
+        sending = count > 0
+        rows, first, now = rows[sending], first[sending], now[sending]
+        count = count[sending]
+        self.sent_packets[rows] += count
+        offsets = None
+        # after the first window an ACK mostly frees room for one packet
+        if np.any(count > 1):
+            offsets = offsets_within(count)
+            rows, first, now = [np.repeat(a, count) for a in (rows, first, now)]
+            first = first + offsets
+        self.data.push(rows, first, now + self.delay[rows], offsets)
+        self.first_sent[rows, first] = np.minimum(self.first_sent[rows, first], now)
+
+    def send_buffer(self, rows, now):
+        """Sends from the buffer until the window (or the transfer) is exhausted."""
+        seq = self.next_seq_num[rows]
+        window_offset = seq - self.window_base[rows]
+        room = self.effective_window(rows) - window_offset
+        count = np.maximum(np.minimum(room, self.packets - seq), 0)
+        self.send(rows, seq, count, now)
+        # packets at or below the highest sent were rewound by a timeout
+        highest = self.highest_seq_sent[rows]
+        self.retransmitted_packets[rows] += np.clip(highest - seq + 1, 0, count)
+        self.highest_seq_sent[rows] = np.maximum(highest, seq + count - 1)
+        self.next_seq_num[rows] += count
+
+    def handle_incoming_message(self, rows, now):
+        seq = self.data.pop(rows)
+        handled = now + self.service[rows]
+        self.receiver_busy[rows] = handled
+        drop = self.should_drop(rows, seq, self.dropped_data)
+        # counters are reported with the stats, later duplicates aren't counted
+        expected = self.incoming_seq_num[rows]
+        self.dropped_packets[rows] += drop & (expected < self.packets)
+        accepted = ~drop & (seq == expected)
+        acked = ~drop & (seq <= expected)
+        self.delivered[rows[accepted], seq[accepted]] = handled[accepted]
+        self.incoming_seq_num[rows[accepted]] += 1
+        ack_rows = rows[acked]
+        self.acks.push(ack_rows, seq[acked], handled[acked] + self.delay[ack_rows])
+        complete = accepted & (seq == self.packets - 1)
+        stats_rows = rows[complete]
+        self.acks.push(stats_rows, STATS, handled[complete] + self.delay[stats_rows])
+
+    def handle_incoming_ack(self, rows, now):
+        seq = self.acks.pop(rows)
+        handled = now + self.service[rows]
+        self.sender_busy[rows] = handled
+        is_stats = seq == STATS
+        self.handle_incoming_stats(rows[is_stats], now[is_stats])
+        rows, seq, handled = rows[~is_stats], seq[~is_stats], handled[~is_stats]
+        drop = self.should_drop(rows, seq, self.dropped_acks)
+        self.discarded_acks[rows] += drop
+        rows, seq, handled = rows[~drop], seq[~drop], handled[~drop]
+        self.has_peer_rwnd[rows] = True
+        # base should ONLY increase if pack_num matches sender base
+        slides = seq == self.window_base[rows]
+        rows, handled = rows[slides], handled[slides]
+        self.window_base[rows] += 1
+        self.next_seq_num[rows] = np.maximum(
+            self.next_seq_num[rows], self.window_base[rows]
+        )
+        self.send_buffer(rows, handled)
+
+    def handle_incoming_stats(self, rows, now):
+        original = self.rows[rows]
+        self.done[rows] = True
+        self.results["elapsed"][original] = now
+        for name in (
+            "sent_packets",
+            "retransmitted_packets",
+            "dropped_packets",
+            "timeouts",
+            "discarded_acks",
+        ):
+            self.results[name][original] = getattr(self, name)[rows]
+        self.results["total_packets"][original] = (
+            self.dropped_packets[rows] + self.packets
+        )
+        latency = self.delivered[rows] - self.first_sent[rows]
+        self.results["latency"][original] = latency
+
+    def sender_timer(self, rows, now):
+        """Timer expiry: restart on progress, otherwise resend what's in flight."""
+        stalled = self.window_base[rows] == self.pre_timer_base[rows]
+        self.pre_timer_base[rows] = self.window_base[rows]
+        self.timer_at[rows] = now + self.timeout[rows]
+        rows, now = rows[stalled], now[stalled]
+        self.timeouts[rows] += 1
+        base = self.window_base[rows]
+        resend_count = np.minimum(
+            self.next_seq_num[rows] - base, self.effective_window(rows)
+        )
+        self.send(rows, base, resend_count, now)
+        self.retransmitted_packets[rows] += resend_count
+        self.next_seq_num[rows] = base + resend_count
+        self.send_buffer(rows, now)
+
+    def receiver_at(self, rows):
+        """When each row's receiver handles its next data packet (inf when idle)."""
+        return self.data.next_at(rows, self.receiver_busy[rows])
+
+    def sender_at(self, rows):
+        """(when, is timer) of each row's next ACK/stats or timer expiry."""
+        ack_at = self.acks.next_at(rows, self.sender_busy[rows])
+        sending = self.window_base[rows] < self.packets
+        timer_at = np.where(sending, self.timer_at[rows], np.inf)
+        return np.minimum(ack_at, timer_at), timer_at < ack_at
+
+    def step(self):
+        """Handles the next event of every unfinished row (data wins ties)."""
+        rows = np.nonzero(~self.done)[0]
+        data_at = self.receiver_at(rows)
+        sender_at, is_timer = self.sender_at(rows)
+        if not np.isfinite(np.minimum(data_at, sender_at)).all():
+            raise RuntimeError("model stalled with no pending events")
+        receiving = data_at <= sender_at
+        acking = ~receiving & ~is_timer
+        for handle, selected, now in (
+            (self.handle_incoming_message, receiving, data_at),
+            (self.handle_incoming_ack, acking, sender_at),
+            (self.sender_timer, ~receiving & is_timer, sender_at),
+        ):
+            # most steps of the last few rows only have one kind of event
+            if selected.any():
+                handle(rows[selected], now[selected])
+
+    def select(self, keep):
+        """Drops finished rows so iterations only touch the remaining ones."""
+        count = len(keep)
+        for name, value in list(vars(self).items()):
+            if isinstance(value, np.ndarray) and value.shape[:1] == (count,):
+                setattr(self, name, value[keep])
+        self.data.select(keep)
+        self.acks.select(keep)
+
+    def run(self):
+        """Runs every row to completion and returns the results by row."""
+        rows = np.arange(len(self.rows))
+        self.send_buffer(rows, np.zeros(len(rows)))
+        while True:
+            remaining = np.count_nonzero(~self.done)
+            if remaining == 0:
+                return self.results
+            if remaining <= len(self.done) // 2:
+                self.select(~self.done)
+            self.step()
+
+
+def simulate(
+    packets,
+    window_size,
+    loss,
+    nth,
+    rtt,
+    timeout,
+    replicas,
+    service=SERVICE_TIME,
+    seed=None,
+):
+    """Per configuration summaries (means over replicas), configurations as arrays."""
+    configs = np.broadcast_arrays(window_size, loss, nth, rtt, timeout)
+    window_size, loss, nth, rtt, timeout = [np.repeat(a, replicas) for a in configs]
+    delay = rtt / 2
+    model = GBNModel(packets, window_size, loss, nth, delay, timeout, service, seed)
+    results = model.run()
+    per_config = {
+        name: values.reshape(-1, replicas, *values.shape[1:])
+        for name, values in results.items()
+    }
+    latency = per_config.pop("latency").reshape(len(per_config["elapsed"]), -1)
+    summary = {name: values.mean(axis=1) for name, values in per_config.items()}
+    summary["goodput"] = packets / summary["elapsed"]
+    summary["latency_p50"] = np.percentile(latency, 50, axis=1)
+    summary["latency_p99"] = np.percentile(latency, 99, axis=1)
+    return summary
+
+
+def sweep(packets, replicas, path=None):
+    grid = np.meshgrid(WINDOWS, LOSS_RATES, RTTS, TIMEOUTS, indexing="ij")
+    window_size, loss, rtt, timeout = [axis.ravel() for axis in grid]
+    started = time.perf_counter()
+    summary = simulate(packets, window_size, loss, 0, rtt, timeout, replicas)
+    elapsed = time.perf_counter() - started
+    configs = len(window_size)
+    print(
+        f"{configs} configurations x {replicas} replicas of {packets} packets "
+        f"in {elapsed:.1f}s, service={SERVICE_TIME * 1_000_000:.0f}us"
+    )
+    print_tables(summary, window_size, loss, rtt, timeout)
+    if path:
+        records = [
+            {
+                "window_size": int(window_size[i]),
+                "loss": float(loss[i]),
+                "rtt": float(rtt[i]),
+                "timeout": float(timeout[i]),
+                **{name: round(float(value[i]), 6) for name, value in summary.items()},
+            }
+            for i in range(configs)
+        ]
+        with open(path, "w") as f:
+            json.dump({"packets": packets, "replicas": replicas, "results": records}, f)
+            f.write("\n")
+        print(f"\n{configs} configurations written to {path}")
+
+
+def print_tables(summary, window_size, loss, rtt, timeout):
+    """Goodput (packets/s) and p99 latency (ms) at the default timeout."""
+    columns = " | ".join(f"-p {rate:<5}" for rate in LOSS_RATES)
+    rules = "|".join("-" * 10 for _ in LOSS_RATES)
+    for title, name, scale, fmt in (
+        ("goodput (packets/s)", "goodput", 1, "8.0f"),
+        ("p99 latency (ms)", "latency_p99", 1000, "8.1f"),
+    ):
+        print(f"\n{title}, timeout={TIMER_SLEEP_INTERVAL * 1000:.0f}ms")
+        print(f"| rtt ms | window | {columns} |")
+        print(f"|--------|--------|{rules}|")
+        for rtt_value in RTTS:
+            for window in WINDOWS:
+                selected = (
+                    (rtt == rtt_value)
+                    & (window_size == window)
+                    & (timeout == TIMER_SLEEP_INTERVAL)
+                )
+                values = summary[name][selected][np.argsort(loss[selected])] * scale
+                cells = " | ".join(f"{value:{fmt}}" for value in values)
+                print(f"| {rtt_value * 1000:6.0f} | {window:6} | {cells} |")
+
+
+def run_real(packets, window_size, mode, mode_value, seed):
+    """Stats of one `send` transfer between GenericGBNodes on the loopback harness."""
+    network = LoopbackNetwork(VALIDATION_DELAY)
+    stats = {}
+    reported = Event()
+
+    def on_stats(message, _metadata):
+        stats.update(message)
+        reported.set()
+
+    sender, _receiver = create_gbn_pair(
+        network,
+        window_size,
+        mode,
+        mode_value,
+        seed=seed,
+        timeout=VALIDATION_TIMEOUT,
+        on_stats=on_stats,
+    )
+    try:
+        sender.handle_command("send " + "x" * packets)
+        if not reported.wait(120):
+            raise TimeoutError("transfer did not finish within 120s")
+    finally:
+        network.stop()
+    return {**sender.last_transfer, **stats}
+
+
+def simulate_config(packets, window_size, mode, mode_value, service):
+    loss, nth = (mode_value, 0) if mode == "-p" else (0, mode_value)
+    return simulate(
+        packets,
+        [window_size],
+        [loss],
+        [nth],
+        [2 * VALIDATION_DELAY],
+        [VALIDATION_TIMEOUT],
+        VALIDATION_REPLICAS,
+        service=service,
+        seed=0,
+    )
+
+
+def fit_service(packets, window_size, elapsed):
+    """Per packet service time making a lossless modelled transfer take `elapsed`."""
+    low, high = 0, elapsed / packets
+    for _ in range(30):
+        service = (low + high) / 2
+        modelled = simulate_config(packets, window_size, "-p", 0, service)["elapsed"]
+        low, high = (service, high) if modelled[0] < elapsed else (low, service)
+    return (low + high) / 2
+
+
+def validate(packets, runs):
+    """Compares the model with real transfers over the in-process loopback harness."""
+    real = []
+    for window_size, mode, mode_value in VALIDATION_CONFIGS:
+        transfers = [
+            run_real(packets, window_size, mode, mode_value, seed)
+            for seed in range(runs)
+        ]
+        real.append(
+            {
+                name: statistics.mean(transfer[name] for transfer in transfers)
+                for name in transfers[0]
+            }
+        )
+    window_size, mode, mode_value = VALIDATION_CONFIGS[0]
+    service = fit_service(packets, window_size, real[0]["elapsed"])
+    print(
+        f"packets={packets} runs={runs} timeout={VALIDATION_TIMEOUT}s "
+        f"delay={VALIDATION_DELAY}s, fitted service={service * 1_000_000:.0f}us"
+    )
+    print(
+        "| config       | real ms | model ms | real retx | model retx "
+        "| real dropped | model dropped |"
+    )
+    print(
+        "|--------------|---------|----------|-----------|------------"
+        "|--------------|---------------|"
+    )
+    for (window_size, mode, mode_value), transfer in zip(VALIDATION_CONFIGS, real):
+        model = simulate_config(packets, window_size, mode, mode_value, service)
+        label = f"w={window_size} {mode} {mode_value}"
+        print(
+            f"| {label:<12} | {transfer['elapsed'] * 1000:7.1f} "
+            f"| {model['elapsed'][0] * 1000:8.1f} "
+            f"| {transfer['retransmitted_packets']:9.1f} "
+            f"| {model['retransmitted_packets'][0]:10.1f} "
+            f"| {transfer['dropped_packets']:12.1f} "
+            f"| {model['dropped_packets'][0]:13.1f} |"
+        )
+
+
+def main(args):
+    command = args[0] if args else "sweep"
+    if command == "sweep" and len(args) <= 4:
+        packets = int(args[1]) if len(args) > 1 else 100
+        replicas = int(args[2]) if len(args) > 2 else 4
+        sweep(packets, replicas, args[3] if len(args) > 3 else None)
+    elif command == "validate" and len(args) <= 3:
+        packets = int(args[1]) if len(args) > 1 else 100
+        runs = int(args[2]) if len(args) > 2 else 5
+        validate(packets, runs)
+    else:
+        print(__doc__)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,151 @@
+"""In-process loopback harness wiring GenericGBNodes together without sockets."""
+import os
+import sys
+import time
+import logging
+from queue import Queue, Empty
+from threading import Thread, Event
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from log import logger
+from utils import encode, decode
+from gbnnode import GenericGBNode
+from loss import create_loss_model
+
+# benchmarks would otherwise spend most of their time logging every packet
+logger.setLevel(logging.WARNING)
+
+
+class LoopbackSock:
+    """Stands in for the UDP socket handed to `demux_incoming_message`."""
+
+    def __init__(self, network):
+        self.network = network
+
+    def sendto(self, data, address):
+        _ip, port = address
+        self.network.deliver(port, data)
+
+
+class LoopbackNetwork:
+    """Delivers encoded packets between nodes through per-port FIFO inboxes."""
+
+    def __init__(self, delay=0):
+        # one-way delay in seconds applied to every packet
+        self.delay = delay
+        self.stop_event = Event()
+        self.inboxes = {}
+        self.handlers = {}
+        self.sock = LoopbackSock(self)
+
+    def attach(self, port, handler):
+        """Registers `handler(sock, sender_ip, message)` for packets sent to port."""
+        self.inboxes[port] = Queue()
+        self.handlers[port] = handler
+        Thread(target=self.pump, args=(port,), daemon=True).start()
+
+    def deliver(self, port, data):
+        if port in self.inboxes:
+            self.inboxes[port].put((time.time() + self.delay, data))
+
+    def on_send(self, message, peer_port):
+        """`on_send` callback for GenericGBNode."""
+        self.deliver(peer_port, encode(message))
+
+    def pump(self, port):
+        inbox, handler = self.inboxes[port], self.handlers[port]
+        while not self.stop_event.is_set():
+            try:
+                deliver_at, data = inbox.get(timeout=0.1)
+            except Empty:
+                continue
+            wait = deliver_at - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            handler(self.sock, "127.0.0.1", decode(data))
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def seeded_loss(mode, mode_value, seed, port):
+    """Per node loss model; the same seed replays the same drop pattern."""
+    node_seed = None if seed is None else f"{seed}-{port}"
+    return create_loss_model(mode, mode_value, node_seed)
+
+
+def create_gbn_pair(
+    network,
+    window_size,
+    mode,
+    mode_value,
+    seed=None,
+    fec_k=0,
+    receiver_options=None,
+    **kwargs,
+):
+    """Creates a sender (port 1) and receiver (port 2) GBN node on the network.
+
+    `kwargs` go to the sender and `receiver_options` (e.g. a sink) to the receiver."""
+    kwargs.setdefault("loss_model", seeded_loss(mode, mode_value, seed, 1))
+    sender = GenericGBNode(
+        1,
+        2,
+        window_size,
+        mode,
+        mode_value,
+        network.stop_event,
+        network.on_send,
+        fec_k=fec_k,
+        **kwargs,
+    )
+    receiver = GenericGBNode(
+        2,
+        1,
+        window_size,
+        mode,
+        mode_value,
+        network.stop_event,
+        network.on_send,
+        loss_model=seeded_loss(mode, mode_value, seed, 2),
+        fec_k=fec_k,
+        **(receiver_options or {}),
+    )
+    network.attach(1, sender.demux_incoming_message)
+    network.attach(2, receiver.demux_incoming_message)
+    Thread(target=sender.send_buffer, daemon=True).start()
+    Thread(target=sender.sender_timer, daemon=True).start()
+    return sender, receiver
+
+
+def run_stream(sender, total_bytes, chunk_size, deadline=60):
+    """Streams `total_bytes` from sender and returns its `last_transfer` stats."""
+    chunks = (b"x" * chunk_size for _ in range(total_bytes // chunk_size))
+    sender.transfer_done.clear()
+    Thread(target=sender.stream, args=(chunks,), daemon=True).start()
+    if not sender.transfer_done.wait(deadline):
+        raise TimeoutError(f"transfer did not finish within {deadline}s")
+    return sender.last_transfer
+
+
+class MemoryRecorder:
+    """Event recorder keeping (timestamp_ns, event, seq) in memory for benches."""
+
+    enabled = True
+
+    def __init__(self):
+        self.events = []
+
+    def record(self, event, seq=-1, peer=0, size=0):
+        self.events.append((time.time_ns(), event, seq))
+
+    def first_times(self, event):
+        """seq -> first time `event` was recorded for it."""
+        times = {}
+        for timestamp, recorded, seq in self.events:
+            if recorded == event:
+                times.setdefault(seq, timestamp)
+        return times
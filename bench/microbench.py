@@ -0,0 +1,372 @@
+"""Microbenchmarks for the protocol hot paths, with stored baselines.
+
+Every case calls one function directly with stubbed `on_send`/socket
+callbacks, so nothing touches the network. `@deadloop` methods are called one
+iteration at a time through `__wrapped__`. Each case runs `repeat` batches and
+reports the fastest batch (less noisy for comparisons) and the median, in ns
+per call.
+
+Usage:
+$ python bench/microbench.py run [results.json] [name-filter]
+$ python bench/microbench.py compare [baseline.json] results.json [threshold]
+$ python bench/microbench.py baseline
+
+`compare` flags cases more than `threshold` (default 0.25, i.e. 25%) slower
+than the baseline and exits 1 if any regressed. `baseline` re-records
+`bench/microbench_baseline.json` (only do this on the machine the baseline is
+meant for).
+"""
+import gc
+import os
+import sys
+import json
+import math
+import time
+import platform
+import statistics
+from threading import Event
+
+# harness puts src/ on the path (and silences logging)
+import harness
+from utils import encode, decode
+from gbnnode import GenericGBNode
+from dvnode import DVNode
+from loss import create_loss_model
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "microbench_baseline.json"
+)
+REPEAT = 15
+THRESHOLD = 0.25
+PAYLOAD_SIZES = [64, 1024, 4096]
+WINDOW_SIZES = [8, 64]
+TRANSFER_SIZES = [64, 1024]
+DESTINATIONS = [100, 1000]
+NEIGHBORS = [4, 32]
+PORT = 5000
+PEER_PORT = 5001
+# calls per run for cases without a natural batch size
+CALLS = 1000
+# runs are repeated until a timed batch takes at least this long
+MIN_BATCH_NS = 5_000_000
+
+
+class StubSock:
+    """Stands in for the socket GBN receivers reply through."""
+
+    def sendto(self, data, address):
+        pass
+
+
+def create_gbn_node(window_size=8, mode="-p", mode_value=0):
+    return GenericGBNode(
+        PORT,
+        PEER_PORT,
+        window_size,
+        mode,
+        mode_value,
+        Event(),
+        lambda message, peer_port: None,
+        loss_model=create_loss_model(mode, mode_value, seed=1),
+    )
+
+
+def create_message(payload_bytes):
+    metadata = {"packet_num": 12, "port": PORT, "session": "ab" * 8, "transfer": 0}
+    return {"type": "message", "payload": "x" * payload_bytes, "metadata": metadata}
+
+
+def bench_encode(payload_bytes):
+    message = create_message(payload_bytes)
+
+    def run(_state):
+        for _ in range(CALLS):
+            encode(message)
+
+    return None, run, CALLS
+
+
+def bench_decode(payload_bytes):
+    datagram = encode(create_message(payload_bytes))
+
+    def run(_state):
+        for _ in range(CALLS):
+            decode(datagram)
+
+    return None, run, CALLS
+
+
+def bench_send_buffer(window_size):
+    """One send_buffer iteration per packet until the window is full."""
+    node = create_gbn_node(window_size)
+    send_buffer = GenericGBNode.send_buffer.__wrapped__
+
+    def setup():
+        with node.buffer_lock:
+            node.init_send_state()
+            node.queue_transfer(["x"] * window_size, "x" * window_size)
+
+    def run(_state):
+        for _ in range(window_size):
+            send_buffer(node)
+
+    return setup, run, window_size
+
+
+def bench_handle_incoming_ack(window_size):
+    """ACKs for a full window of in flight packets, in order."""
+    node = create_gbn_node(window_size)
+    send_buffer = GenericGBNode.send_buffer.__wrapped__
+    acks = [{"packet_num": seq} for seq in range(window_size)]
+
+    def setup():
+        with node.buffer_lock:
+            node.init_send_state()
+            node.queue_transfer(["x"] * window_size, "x" * window_size)
+        for _ in range(window_size):
+            send_buffer(node)
+
+    def run(_state):
+        for metadata in acks:
+            node.handle_incoming_ack("127.0.0.1", None, metadata)
+
+    return setup, run, window_size
+
+
+def bench_handle_incoming_message(packets):
+    """A whole in order transfer of `packets` one character packets."""
+    sent = []
+    sender = create_gbn_node(packets)
+    sender.on_send = lambda message, peer_port: sent.append(message)
+    with sender.buffer_lock:
+        sender.queue_transfer(["x"] * packets, "x" * packets)
+    for _ in range(packets):
+        GenericGBNode.send_buffer.__wrapped__(sender)
+    receiver = create_gbn_node()
+    sock = StubSock()
+
+    def setup():
+        receiver.init_receive_state()
+
+    def run(_state):
+        for message in sent:
+            receiver.handle_incoming_message("127.0.0.1", sock, message, None)
+
+    return setup, run, packets
+
+
+def bench_should_drop(mode, mode_value):
+    node = create_gbn_node(8, mode, mode_value)
+
+    def run(_state):
+        for seq in range(CALLS):
+            node.should_drop(seq)
+
+    return None, run, CALLS
+
+
+def create_dv_node(neighbors):
+    links = [{"port": PORT + 1 + n, "loss": 0.1} for n in range(neighbors)]
+    # port 0 binds an ephemeral endpoint that is never used
+    node = DVNode(0, links)
+    node.port = PORT
+    node.client.send_encoded = lambda datagram, port, ip="0.0.0.0": None
+    return node
+
+
+def create_vector(destinations, hop):
+    """`destinations` routes as they arrive on the wire (str keys)."""
+    return {
+        str(10000 + dst): {"loss": 0.05 * (dst % 7), "hops": [hop]}
+        for dst in range(destinations)
+    }
+
+
+def create_table(destinations, hop):
+    """`destinations` routes as a node stores them (int keys)."""
+    vector = create_vector(destinations, hop)
+    return {int(port): route for port, route in vector.items()}
+
+
+def bench_sync_distance_vector(destinations):
+    """Merges one neighbor vector into a copy of the current table."""
+    node = create_dv_node(4)
+    neighbor = PORT + 1
+    node.distance_vector = create_table(destinations, PORT + 2)
+    incoming = create_vector(destinations, PORT + 3)
+    calls = 20
+
+    def run(_state):
+        for _ in range(calls):
+            node.sync_distance_vector(neighbor, incoming, dict(node.distance_vector))
+
+    return None, run, calls
+
+
+def bench_dispatch_dv(destinations, neighbors):
+    """Encodes a changed table once and fans it out to every neighbor."""
+    node = create_dv_node(neighbors)
+    node.distance_vector = create_table(destinations, PORT + 1)
+    calls = 20
+
+    def run(_state):
+        for _ in range(calls):
+            # a dispatch follows a table change, so the encode cache is cold
+            node.dv_version += 1
+            node.dispatch_dv(node.distance_vector)
+
+    return None, run, calls
+
+
+def cases():
+    """(name, factory) for every case; factories return (setup, run, calls)."""
+    for size in PAYLOAD_SIZES:
+        yield f"encode[payload={size}]", lambda size=size: bench_encode(size)
+        yield f"decode[payload={size}]", lambda size=size: bench_decode(size)
+    for window in WINDOW_SIZES:
+        yield f"send_buffer[window={window}]", lambda w=window: bench_send_buffer(w)
+        yield (
+            f"handle_incoming_ack[window={window}]",
+            lambda w=window: bench_handle_incoming_ack(w),
+        )
+    for packets in TRANSFER_SIZES:
+        yield (
+            f"handle_incoming_message[packets={packets}]",
+            lambda p=packets: bench_handle_incoming_message(p),
+        )
+    yield "should_drop[-p 0.1]", lambda: bench_should_drop("-p", 0.1)
+    yield "should_drop[-d 5]", lambda: bench_should_drop("-d", 5)
+    for dsts in DESTINATIONS:
+        yield (
+            f"sync_distance_vector[dests={dsts}]",
+            lambda d=dsts: bench_sync_distance_vector(d),
+        )
+        for neighbors in NEIGHBORS:
+            yield (
+                f"dispatch_dv[dests={dsts},neighbors={neighbors}]",
+                lambda d=dsts, n=neighbors: bench_dispatch_dv(d, n),
+            )
+
+
+def timed_run(setup, run):
+    state = setup() if setup else None
+    started = time.perf_counter_ns()
+    run(state)
+    return time.perf_counter_ns() - started
+
+
+class Case:
+    """Batches of one case; short runs repeat until a batch takes `MIN_BATCH_NS`."""
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.setup, self.run, self.calls = factory()
+        elapsed = max(timed_run(self.setup, self.run), 1)
+        self.runs = max(1, math.ceil(MIN_BATCH_NS / elapsed))
+        self.per_call = []
+
+    def batch(self):
+        elapsed = sum(timed_run(self.setup, self.run) for _ in range(self.runs))
+        self.per_call.append(elapsed / (self.runs * self.calls))
+
+
+def run_all(name_filter=None, repeat=REPEAT):
+    """Runs `repeat` rounds of one batch per case and keeps each case's fastest.
+
+    Interleaving the rounds spreads slow stretches of a shared machine over all
+    cases instead of landing on whichever case was running. The collector is
+    paused while timing (as `timeit` does).
+    """
+    selected = [
+        Case(name, factory)
+        for name, factory in cases()
+        if not name_filter or name_filter in name
+    ]
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            for case in selected:
+                case.batch()
+    finally:
+        gc.enable()
+    results = {}
+    print(f"| {'case':<40} | {'best ns':>10} | {'median ns':>10} |")
+    print(f"|{'-' * 42}|{'-' * 12}|{'-' * 12}|")
+    for case in selected:
+        best, median = min(case.per_call), statistics.median(case.per_call)
+        results[case.name] = {
+            "ns_per_call": round(best, 1),
+            "median_ns": round(median, 1),
+        }
+        print(f"| {case.name:<40} | {best:10.1f} | {median:10.1f} |")
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "created_at": time.time(),
+        "results": results,
+    }
+
+
+def write_results(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+
+def compare(baseline, results, threshold=THRESHOLD):
+    """Prints per case change vs the baseline, returns the regressed case names."""
+    regressed = []
+    print(f"| {'case':<40} | {'baseline':>10} | {'current':>10} | {'change':>8} |")
+    print(f"|{'-' * 42}|{'-' * 12}|{'-' * 12}|{'-' * 10}|")
+    for name, current in results["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            ns = current["ns_per_call"]
+            print(f"| {name:<40} | {'-':>10} | {ns:10.1f} | {'new':>8} |")
+            continue
+        change = current["ns_per_call"] / base["ns_per_call"] - 1
+        flag = ""
+        if change > threshold:
+            regressed.append(name)
+            flag = " REGRESSED"
+        print(
+            f"| {name:<40} | {base['ns_per_call']:10.1f} "
+            f"| {current['ns_per_call']:10.1f} | {change:+8.1%} |{flag}"
+        )
+    for name in baseline["results"].keys() - results["results"].keys():
+        print(f"| {name:<40} | {'missing from results':>36} |")
+    return regressed
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(args):
+    command = args[0] if args else "run"
+    if command == "run":
+        data = run_all(args[2] if len(args) > 2 else None)
+        if len(args) > 1:
+            write_results(args[1], data)
+    elif command == "baseline":
+        write_results(BASELINE_PATH, run_all())
+        print(f"baseline written to {BASELINE_PATH}")
+    elif command == "compare" and len(args) in (2, 3, 4):
+        # `compare results.json` uses the stored baseline
+        if len(args) == 2:
+            baseline, results, threshold = BASELINE_PATH, args[1], THRESHOLD
+        else:
+            baseline, results = args[1], args[2]
+            threshold = float(args[3]) if len(args) == 4 else THRESHOLD
+        regressed = compare(load(baseline), load(results), threshold)
+        if regressed:
+            print(f"\n{len(regressed)} case(s) regressed more than {threshold:.0%}")
+            sys.exit(1)
+    else:
+        print(__doc__)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
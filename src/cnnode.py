@@ -18,6 +18,7 @@ from utils import (
 )
 from gbnnode import GBNode, GenericGBNode
 from dvnode import DVNode
+from loss import create_loss_model, seed_from_env
 
 LOSS_RATE_PRINT_INTERVAL = 1
 
@@ -29,10 +30,10 @@ class LinkError(Exception):
 
 
 class CNLink:
-    def __init__(self, port, recv_neighbors, send_neighbors):
+    def __init__(self, port, recv_neighbors, send_neighbors, transport=None):
         self.port = port
         self.recv_neighbors = recv_neighbors
-        self.send_neighbors = send_neighbors
+        self.send_neighbors = [int(port) for port in send_neighbors]
 
         self.stop_event = Event()
 
@@ -40,7 +41,13 @@ class CNLink:
         empty_neighbors = [{"port": n["port"], "loss": 0} for n in recv_neighbors]
         # include self in neighbors
         empty_neighbors.append({"port": port, "loss": 0})
-        self.dv_node = DVNode(port, empty_neighbors, self.demux_incoming_dv_message)
+        self.dv_node = DVNode(
+            port,
+            empty_neighbors,
+            self.demux_incoming_dv_message,
+            transport=transport,
+            adjacent_ports=self.send_neighbors,
+        )
 
         self.sending_probes_lock = Lock()
         self.sending_probes = {}
@@ -54,6 +61,7 @@ class CNLink:
             self.start_gbn_listener(recv_port, loss)
 
     def start_gbn_listener(self, recv_port, loss):
+        seed = seed_from_env(self.port, recv_port)
         gbnode = GenericGBNode(
             self.port,
             recv_port,
@@ -62,6 +70,7 @@ class CNLink:
             loss,
             self.stop_event,
             self.on_send_gbn,
+            loss_model=create_loss_model("-p", loss, seed),
         )
         self.recv_gbnodes[recv_port] = gbnode
 
@@ -184,7 +193,7 @@ def parse_args(args):
             raise InvalidArgException(
                 f"Invalid send <neighbor#-port>: {neighbor_arg}; Must be within 1024-65535"
             )
-        send_neighbors.append(neighbor_arg)
+        send_neighbors.append(int(neighbor_arg))
 
     return int(local_port), recv_neighbors, send_neighbors, is_last
 
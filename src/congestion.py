@@ -0,0 +1,68 @@
+import time
+from threading import Lock
+
+
+class AIMDWindow:
+    """Slow start + congestion avoidance (AIMD) window bounded by `max_window`."""
+
+    def __init__(self, max_window):
+        self.max_window = max(max_window, 1)
+        # ACKs (receive thread) and timeouts (timer thread) update it concurrently
+        self.window_lock = Lock()
+        # congestion window grows fractionally during congestion avoidance
+        self.cwnd = 1.0
+        # slow start threshold, starts wide open so the first window ramps fast
+        self.ssthresh = float(self.max_window)
+        self.started = time.time()
+        # [(seconds since start, effective window)] recorded on every change
+        self.trajectory = [(0.0, 1)]
+
+    def size(self):
+        """Effective window, never above the configured `window_size`."""
+        return max(min(int(self.cwnd), self.max_window), 1)
+
+    def on_ack(self):
+        """Grows by 1 per ACK in slow start, by 1/cwnd in congestion avoidance."""
+        with self.window_lock:
+            if self.cwnd < self.ssthresh:
+                self.cwnd += 1
+            else:
+                self.cwnd += 1 / self.cwnd
+            self.cwnd = min(self.cwnd, float(self.max_window))
+            self.record()
+
+    def on_timeout(self):
+        """Halves the threshold and restarts slow start from a window of 1."""
+        with self.window_lock:
+            self.ssthresh = max(self.cwnd / 2, 1.0)
+            self.cwnd = 1.0
+            self.record()
+
+    def record(self):
+        """Appends the effective window to the trajectory on change (lock held)."""
+        size = self.size()
+        if self.trajectory[-1][1] != size:
+            self.trajectory.append((time.time() - self.started, size))
+
+    def summary(self):
+        """Min/max/time weighted mean of the window trajectory."""
+        with self.window_lock:
+            trajectory = list(self.trajectory)
+            elapsed = time.time() - self.started
+        sizes = [size for _, size in trajectory]
+        weighted = 0
+        points = trajectory + [(elapsed, sizes[-1])]
+        for (start, size), (end, _) in zip(points, points[1:]):
+            weighted += size * (end - start)
+        return {
+            "min_window": min(sizes),
+            "max_window": max(sizes),
+            "mean_window": weighted / elapsed if elapsed else sizes[-1],
+            "window_changes": len(trajectory) - 1,
+        }
+
+    def reset(self):
+        """Restarts the trajectory for the next transfer, keeping learned state."""
+        with self.window_lock:
+            self.started = time.time()
+            self.trajectory = [(0.0, self.size())]
@@ -2,39 +2,111 @@ import sys
 from operator import itemgetter
 import time
 import json
+import re
 from threading import Thread, Event, Lock
 from log import logger
 
 from messages import parse_help_message, dv_help_message
+from profiling import instrumented, instrument_lock
+import eventtrace
+import snapshot
+from fib import ForwardingTable
+from fragment import encode_fragments, Reassembler, FRAGMENT_SIZE
 from utils import (
     InvalidArgException,
     valid_port,
     SocketClient,
     handles_signal,
+    encode,
+    deadloop,
 )
 
 
+# hop limit for forwarded data packets (guards against transient routing loops)
+DEFAULT_TTL = 16
+# seconds between keepalives (skipped when other traffic already went out)
+HEARTBEAT_INTERVAL = 1
+# neighbors silent for this many intervals are declared dead
+HEARTBEAT_MISSES = 3
+
+
 class DVNode:
-    def __init__(self, port, neighbors, on_message=None):
+    def __init__(
+        self,
+        port,
+        neighbors,
+        on_message=None,
+        on_data=None,
+        heartbeat_interval=HEARTBEAT_INTERVAL,
+        heartbeat_misses=HEARTBEAT_MISSES,
+        snapshot_path=None,
+        transport=None,
+        adjacent_ports=(),
+    ):
         # CLI args
         self.port = port
         self.neighbors = neighbors
 
+        # Neighbor liveness
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_misses = heartbeat_misses
+        # { port: loss } of configured direct links (excluding ourselves)
+        self.link_losses = {
+            n["port"]: n["loss"] for n in neighbors if n["port"] != port
+        }
+        # every adjacent link gets keepalives and liveness checks, including
+        # links without a configured cost yet (e.g. CN send-neighbors)
+        self.adjacent_ports = set(self.link_losses) | {
+            int(p) for p in adjacent_ports if int(p) != port
+        }
+        # port -> time of the last message heard from / sent to a neighbor
+        self.last_heard = {}
+        self.last_sent = {}
+        self.dead_neighbors = set()
+        # latest vector advertised by each direct neighbor (for recomputes)
+        self.neighbor_vectors = {}
+        # bumped whenever `neighbor_vectors` changes; what snapshots persist
+        self.neighbor_vectors_version = 0
+
         self.ip = "0.0.0.0"
-        self.distance_vector_lock = Lock()
+        # binary DV event trace (no-op unless `PA2_TRACE` is set)
+        self.tracer = eventtrace.get_recorder(port)
+        self.distance_vector_lock = instrument_lock(Lock(), "distance_vector_lock")
         # { local_port: {loss, hops} } for each links local_port
         self.distance_vector = self.create_distance_vector(neighbors)
+        # forwarding table rebuilt (and swapped in) only when routes change
+        self.fib = ForwardingTable(self.distance_vector)
+        self.forwarded_packets = 0
+        # bumped whenever `distance_vector` changes; keys the encoded DV cache
+        self.dv_version = 0
+        # (version, [datagram bytes]) so unchanged vectors aren't re-encoded
+        self.dv_cache = (None, [])
+        # fragment ids are unique per process run
+        self.boot_id = int(time.time() * 1000) % 2**31
+        self.reassembler = Reassembler()
+
+        # warm restart (no-op unless `PA2_SNAPSHOT_DIR` or `snapshot_path` is set)
+        self.snapshot_path = snapshot_path or snapshot.path_for(port)
+        self.snapshot_version = None
+        # neighbors whose vectors came from a snapshot and haven't been re-sent
+        self.stale_neighbors = set()
+        self.warm_started = self.load_snapshot()
 
         self.stop_event = Event()
-        self.client = SocketClient(port, self.stop_event, self.demux_incoming_message)
+        self.client = SocketClient(
+            port, self.stop_event, self.demux_incoming_message, transport=transport
+        )
 
         self.on_message = on_message
+        # called with (src, payload) for data addressed to this node
+        self.on_data = on_data
 
     def create_dv_message(self, type, payload=None):
         """Convert plaintext user input to serialized message 'packet'."""
         message_metadata = {"port": self.port, "neighbors": self.neighbors}
         return {"type": type, "payload": payload, "metadata": message_metadata}
 
+    @instrumented("dv.sync_distance_vector")
     def sync_distance_vector(self, incoming_port, incoming, existing):
         """Updates distance vector based on updated neighbor vectors."""
         # This really helped solidify my understanding:
@@ -48,6 +120,9 @@ class DVNode:
 
             if port_ == int(self.port):
                 continue
+            # split horizon: ignore routes the neighbor learned through us
+            if hops and int(self.port) in hops:
+                continue
 
             incoming_port_loss_rate = round(
                 float(incoming_port_loss) + float(loss_rate), 2
@@ -55,18 +130,34 @@ class DVNode:
 
             existing_port_loss_rate = existing.get(port_)
             # add to dict summing the incoming port's loss in current vector
+            # (entries are replaced, not mutated, since `existing` is a shallow copy)
             if not existing_port_loss_rate:
                 existing[port_] = {
                     "loss": incoming_port_loss_rate,
                     "hops": [incoming_port],
                 }
             else:
-                if incoming_port_loss_rate < existing_port_loss_rate.get("loss"):
-                    existing[port_]["loss"] = incoming_port_loss_rate
-                    existing[port_]["hops"] = [incoming_port]
-
-        # check if port exists in current (if not, compute sum of the source and its weight)
-        # e.g. if we have { 1025: 0.05, 1027: 0.03 } with incoming { 1024: 0.05, 1026: 0.03 } & source
+                existing_loss = existing_port_loss_rate.get("loss")
+                existing_hops = existing_port_loss_rate.get("hops")
+                if incoming_port_loss_rate < existing_loss:
+                    existing[port_] = {
+                        "loss": incoming_port_loss_rate,
+                        "hops": [incoming_port],
+                    }
+                # equal cost paths become extra next hops (direct links stay direct)
+                elif (
+                    incoming_port_loss_rate == existing_loss
+                    and existing_hops
+                    and incoming_port not in existing_hops
+                ):
+                    existing[port_] = {
+                        "loss": existing_loss,
+                        "hops": existing_hops + [incoming_port],
+                    }
+
+        # check if port exists in current (if not, compute sum of the source and its
+        # weight) e.g. if we have { 1025: 0.05, 1027: 0.03 } with incoming
+        # { 1024: 0.05, 1026: 0.03 } & source
         return existing
 
     def print_updated_vector(self, vec):
@@ -76,7 +167,59 @@ class DVNode:
             loss, hops = itemgetter("loss", "hops")(v)
             hops_messages = " ; ".join([f"Next hop -> {hop}" for hop in hops])
             combined_hops_message = f"; {hops_messages}" if hops else ""
-            logger.info(f"- ({loss}) -> Node {k}{combined_hops_message}")
+            stale = " (stale)" if self.is_stale(v) else ""
+            logger.info(f"- ({loss}) -> Node {k}{combined_hops_message}{stale}")
+
+    def is_stale(self, route):
+        """Routes learned only from snapshot vectors stay stale until re-advertised."""
+        hops = route.get("hops")
+        return bool(hops) and all(hop in self.stale_neighbors for hop in hops)
+
+    def load_snapshot(self):
+        """Rebuilds the table from the neighbor vectors in the last snapshot."""
+        if not self.snapshot_path:
+            return False
+        saved = snapshot.read_snapshot(self.snapshot_path)
+        if saved is None or saved.port != self.port:
+            return False
+        # only neighbors that are still configured (links may have changed)
+        self.neighbor_vectors = {
+            port: vector
+            for port, vector in saved.neighbor_vectors.items()
+            if port in self.link_losses
+        }
+        self.neighbor_vectors_version += 1
+        self.stale_neighbors = set(self.neighbor_vectors)
+        # monitor restored neighbors right away so dead ones get withdrawn
+        now = time.time()
+        for port in self.stale_neighbors:
+            self.last_heard[port] = now
+        self.distance_vector = self.recompute_distance_vector()
+        self.dv_version += 1
+        self.fib = ForwardingTable(self.distance_vector, self.fib.version + 1)
+        logger.info(
+            f"Node {self.port} warm started from {self.snapshot_path} "
+            f"(saved {now - saved.saved_at:.1f}s ago)"
+        )
+        self.print_updated_vector(self.distance_vector)
+        return True
+
+    def save_snapshot(self):
+        """Writes the last vector from each neighbor to disk."""
+        with self.distance_vector_lock:
+            version = self.neighbor_vectors_version
+            neighbor_vectors = dict(self.neighbor_vectors)
+        snapshot.write_snapshot(self.snapshot_path, self.port, neighbor_vectors)
+        self.snapshot_version = version
+
+    @deadloop
+    def persist_snapshots(self):
+        """Periodically snapshots routing state that changed."""
+        # the final pass after `stop_event` is set saves on shutdown too
+        self.stop_event.wait(snapshot.SNAPSHOT_INTERVAL)
+        # a neighbor's vector can change without changing our own table
+        if self.snapshot_version != self.neighbor_vectors_version:
+            self.save_snapshot()
 
     def create_distance_vector(self, neighbors):
         """Creates first distance vector with starting neighbors."""
@@ -88,60 +231,271 @@ class DVNode:
         self.print_updated_vector(vector)
         return vector
 
+    @instrumented("dv.handle_incoming_dv")
     def handle_incoming_dv(self, metadata, message):
         """Handles incoming neighbors distance vector."""
         incoming_dv, incoming_port = message.get("vector"), metadata.get("port")
         logger.info(f"Message received at Node { self.port} from Node {incoming_port}")
+        self.tracer.record(eventtrace.DV_RECEIVED, peer=incoming_port)
+
+        # anyone else would be merged as a zero cost (phantom) link
+        if incoming_port not in self.adjacent_ports:
+            logger.info(f"Ignoring DV from non-neighbor Node {incoming_port}")
+            return
 
         with self.distance_vector_lock:
-            new_distance_vector = self.sync_distance_vector(
-                incoming_port, incoming_dv, self.distance_vector.copy()
-            )
+            stored = self.neighbor_vectors.get(incoming_port)
+            if incoming_port in self.link_losses and stored != incoming_dv:
+                self.neighbor_vectors[incoming_port] = incoming_dv
+                self.neighbor_vectors_version += 1
+            # a fresh vector confirms (or replaces) the snapshot's
+            self.stale_neighbors.discard(incoming_port)
+            # worse/withdrawn routes can't be merged incrementally
+            if self.route_worsened(incoming_port, incoming_dv):
+                new_distance_vector = self.recompute_distance_vector()
+            else:
+                new_distance_vector = self.sync_distance_vector(
+                    incoming_port, incoming_dv, self.distance_vector.copy()
+                )
             # we print regardless if it results in new dispatch
             self.print_updated_vector(new_distance_vector)
-            # If changed update and dispatch
-            if self.distance_vector != new_distance_vector:
-                self.distance_vector = new_distance_vector
-                self.dispatch_dv(new_distance_vector)
+            self.update_distance_vector(new_distance_vector)
+
+    def update_distance_vector(self, new_distance_vector):
+        """Swaps in a changed vector, rebuilds the FIB and dispatches it (lock held)."""
+        if self.distance_vector == new_distance_vector:
+            return
+        self.distance_vector = new_distance_vector
+        self.dv_version += 1
+        self.fib = ForwardingTable(new_distance_vector, self.fib.version + 1)
+        self.tracer.record(eventtrace.DV_UPDATED, len(new_distance_vector))
+        self.dispatch_dv(new_distance_vector)
+
+    def route_worsened(self, incoming_port, incoming):
+        """Whether a neighbor now advertises worse (or no) routes we use through it."""
+        if incoming_port not in self.link_losses:
+            return False
+        link_loss = self.link_losses[incoming_port]
+        for port, route in self.distance_vector.items():
+            if incoming_port not in route.get("hops", []):
+                continue
+            advertised = incoming.get(str(port))
+            if advertised is None or self.port in advertised.get("hops", []):
+                return True
+            if round(link_loss + float(advertised.get("loss")), 2) > route["loss"]:
+                return True
+        return False
+
+    def recompute_distance_vector(self):
+        """Rebuilds the vector from live direct links and stored neighbor vectors."""
+        vector = {}
+        # CN links list themselves as a neighbor
+        if self.port in self.distance_vector:
+            vector[self.port] = self.distance_vector[self.port]
+        for port, loss in self.link_losses.items():
+            if port not in self.dead_neighbors:
+                vector[port] = {"loss": loss, "hops": []}
+        for port, incoming in self.neighbor_vectors.items():
+            if port not in self.dead_neighbors:
+                vector = self.sync_distance_vector(port, incoming, vector)
+        return vector
 
+    def withdraw_neighbor(self, port):
+        """Declares a silent neighbor dead, withdraws its routes and sends an update."""
+        logger.info(f"Node {port} is unreachable from Node {self.port}, withdrawing")
+        with self.distance_vector_lock:
+            self.dead_neighbors.add(port)
+            if self.neighbor_vectors.pop(port, None) is not None:
+                self.neighbor_vectors_version += 1
+            self.stale_neighbors.discard(port)
+            new_distance_vector = self.recompute_distance_vector()
+            self.print_updated_vector(new_distance_vector)
+            self.update_distance_vector(new_distance_vector)
+
+    def revive_neighbor(self, port):
+        """Restores the direct link of a neighbor that was declared dead."""
+        with self.distance_vector_lock:
+            # heartbeats and DVs are handled on different workers, revive once
+            if port not in self.dead_neighbors:
+                return
+            logger.info(f"Node {port} is reachable again from Node {self.port}")
+            self.dead_neighbors.discard(port)
+            new_distance_vector = self.recompute_distance_vector()
+            self.print_updated_vector(new_distance_vector)
+            self.update_distance_vector(new_distance_vector)
+
+    def heard_from(self, port):
+        """Any message from a neighbor counts as a heartbeat."""
+        if port not in self.adjacent_ports:
+            return
+        self.last_heard[port] = time.time()
+        if port in self.dead_neighbors:
+            self.revive_neighbor(port)
+
+    @deadloop
+    def monitor_neighbors(self):
+        """Sends keepalives on idle links and withdraws neighbors that went silent."""
+        now = time.time()
+        timeout = self.heartbeat_interval * self.heartbeat_misses
+        for port in self.adjacent_ports:
+            if port in self.dead_neighbors:
+                continue
+            # only send when nothing else (DV/data) went out this interval
+            if now - self.last_sent.get(port, 0) >= self.heartbeat_interval:
+                self.send(self.create_dv_message("hb"), port)
+            # neighbors are only monitored once they've been heard from
+            heard = self.last_heard.get(port)
+            if heard is not None and now - heard > timeout:
+                self.withdraw_neighbor(port)
+        self.stop_event.wait(self.heartbeat_interval / 2)
+
+    @instrumented("dv.demux_incoming_message")
     def demux_incoming_message(self, _sock, _sender_ip, payload):
         """Sends ACK based on configured drop rate."""
         metadata, message, type = itemgetter("metadata", "payload", "type")(payload)
+        self.heard_from(metadata.get("port"))
 
-        if type != "dv":
-            logger.info(f"Received invalid message type: {type}. Expecting ONLY `dv`")
-        else:
+        if type == "hb":
+            return
+        elif type == "dv":
             if self.on_message:
                 self.on_message(payload)
             self.handle_incoming_dv(metadata, message)
+        elif type == "dvfrag":
+            body = self.reassembler.add(metadata, message)
+            if body is None:
+                return
+            # rebuild the classic `dv` message once every fragment arrived
+            dv_metadata = {
+                "port": metadata.get("port"),
+                "neighbors": body["neighbors"],
+            }
+            dv_message = {
+                "type": "dv",
+                "payload": body["payload"],
+                "metadata": dv_metadata,
+            }
+            self.demux_incoming_message(_sock, _sender_ip, dv_message)
+        elif type == "data":
+            self.handle_incoming_data(metadata, message)
+        else:
+            logger.info(
+                f"Received invalid message type: {type}. Expecting `dv` or `data`"
+            )
+
+    def create_data_message(self, src, dst, ttl, payload, flow=None):
+        """Data packet relayed hop by hop towards `dst`."""
+        metadata = {"port": self.port, "src": src, "dst": dst, "ttl": ttl}
+        if flow is not None:
+            metadata["flow"] = flow
+        return {"type": "data", "payload": payload, "metadata": metadata}
+
+    def forward(self, dst, payload, src=None, ttl=DEFAULT_TTL, flow=None):
+        """Sends a data packet to the FIB next hop for `dst`."""
+        src = self.port if src is None else src
+        next_hop = self.fib.lookup(dst, flow)
+        if next_hop is None:
+            logger.info(f"No route from Node {self.port} to Node {dst}, dropping")
+            return False
+        self.send(self.create_data_message(src, dst, ttl, payload, flow), next_hop)
+        return True
+
+    @instrumented("dv.handle_incoming_data")
+    def handle_incoming_data(self, metadata, message):
+        """Delivers data addressed to this node, relaying everything else."""
+        src, dst, ttl = itemgetter("src", "dst", "ttl")(metadata)
+        if dst == self.port:
+            logger.info(f"Data received at Node {self.port} from Node {src}: {message}")
+            if self.on_data:
+                self.on_data(src, message)
+            return
+        if ttl <= 1:
+            logger.info(f"Data from Node {src} to Node {dst} expired at {self.port}")
+            return
+        if self.forward(dst, message, src, ttl - 1, metadata.get("flow")):
+            self.forwarded_packets += 1
+
+    def handle_command(self, user_input):
+        """Parses `send <dst-port> <message>` and forwards it along DV routes."""
+        if re.match("send ([0-9]+) (.*)", user_input):
+            _, dst, message = user_input.split(" ", 2)
+            self.forward(int(dst), message)
+        else:
+            logger.info(f"Unknown command `{user_input}`.")
 
     def send(self, message, peer_port):
+        self.last_sent[peer_port] = time.time()
         self.client.send(message, peer_port, self.ip)
 
+    def encode_dv(self, dv):
+        """Serialized datagrams for `dv`: one `dv` message, or `dvfrag`s when large."""
+        dv_message = self.create_dv_message("dv", {"vector": dv})
+        datagram = encode(dv_message)
+        if len(datagram) <= FRAGMENT_SIZE:
+            return [datagram]
+        body = {"payload": dv_message["payload"], "neighbors": self.neighbors}
+        message_id = f"{self.boot_id}-{self.dv_version}"
+        return encode_fragments("dvfrag", self.port, message_id, body)
+
+    def encoded_dv(self, dv):
+        """Cached `encode_dv` for the current vector (other vectors aren't cached)."""
+        if dv is not self.distance_vector:
+            return self.encode_dv(dv)
+        version, datagrams = self.dv_cache
+        if version != self.dv_version:
+            datagrams = self.encode_dv(dv)
+            self.dv_cache = (self.dv_version, datagrams)
+        return datagrams
+
+    @instrumented("dv.dispatch_dv")
     def dispatch_dv(self, dv):
         """Sends distance vector to neighbors in bulk."""
-        for neighbor_port, _loss in dv.items():
-            if neighbor_port == self.port:
+        # encoded once and reused for every neighbor
+        datagrams = self.encoded_dv(dv)
+        size = sum(len(datagram) for datagram in datagrams)
+        # only adjacent links (CN send-neighbors included); routes learned
+        # through a neighbor don't make their destination adjacent
+        for neighbor_port in sorted(self.adjacent_ports):
+            if neighbor_port in self.dead_neighbors:
                 continue
 
             logger.info(
                 f"DV Message sent from Node {self.port} to Node {neighbor_port}"
             )
-            dv_message = self.create_dv_message("dv", {"vector": dv})
-            self.client.send(dv_message, neighbor_port, self.ip)
+            for datagram in datagrams:
+                self.client.send_encoded(datagram, neighbor_port, self.ip)
+            # DV updates double as keepalives
+            self.last_sent[neighbor_port] = time.time()
+            self.tracer.record(eventtrace.DV_SENT, peer=neighbor_port, size=size)
 
     @handles_signal
-    def listen(self, should_start):
-        """Listens for incoming neighbor vectors. If `should_start` sends initial distance vector to neighbors."""
+    def listen(self, should_start, interactive=False):
+        """Listens for incoming neighbor vectors.
+
+        If `should_start` sends initial distance vector to neighbors.
+        """
         # Listens for incoming UDP messages
         client_listen = Thread(target=self.client.listen)
         client_listen.start()
+        # keepalives and neighbor failure detection
+        Thread(target=self.monitor_neighbors).start()
+        if self.snapshot_path:
+            Thread(target=self.persist_snapshots).start()
 
-        # send kickoff if CLI specified `last`
-        if should_start:
+        # send kickoff if CLI specified `last` (warm starts advertise right away)
+        if should_start or self.warm_started:
             with self.distance_vector_lock:
                 self.dispatch_dv(self.distance_vector)
 
+        # forwarding mode reads `send <dst-port> <message>` commands
+        while interactive and not self.stop_event.is_set():
+            try:
+                user_input = input(f"node> ")
+            except EOFError:
+                # stdin closed (e.g. piped commands); keep relaying
+                break
+            self.handle_command(user_input)
+
         client_listen.join(1)
 
 
@@ -155,8 +509,12 @@ def parse_args(args):
             f"Invalid <local-port>: {local_port}; Must be within 1024-65535"
         )
 
-    is_last = args[-1] == "last"
-    neighbor_args = neighbor_args[:-1] if is_last else neighbor_args
+    # trailing flags in any order
+    flags = set()
+    while neighbor_args and neighbor_args[-1] in ("last", "forward"):
+        flags.add(neighbor_args[-1])
+        neighbor_args = neighbor_args[:-1]
+    is_last, is_forward = "last" in flags, "forward" in flags
 
     if len(neighbor_args) == 0:
         raise InvalidArgException(
@@ -175,27 +533,29 @@ def parse_args(args):
         if idx % 2 == 0:
             if not valid_port(neighbor_arg):
                 raise InvalidArgException(
-                    f"Invalid <neighbor#-port>: {neighbor_arg}; Must be within 1024-65535"
+                    f"Invalid <neighbor#-port>: {neighbor_arg}; "
+                    "Must be within 1024-65535"
                 )
             neighbors.append({"port": int(neighbor_arg)})
         else:
             if not float(neighbor_arg):
                 raise InvalidArgException(
-                    f"Invalid <loss-rate-#>: {neighbor_arg}; Must be a valid floating number"
+                    f"Invalid <loss-rate-#>: {neighbor_arg}; "
+                    "Must be a valid floating number"
                 )
-            neighbors[max(idx - 2, 0)]["loss"] = float(neighbor_arg)
+            neighbors[idx // 2]["loss"] = float(neighbor_arg)
 
-    return int(local_port), neighbors, is_last
+    return int(local_port), neighbors, is_last, is_forward
 
 
 def parse_mode_and_go():
     """Validate neighbor options and check for end flag."""
     args = parse_help_message(dv_help_message)
     # validate args
-    local_port, neighbors, is_last = parse_args(args)
+    local_port, neighbors, is_last, is_forward = parse_args(args)
     # Create link and start if last flag was pasneighbor_ in CLI
     link = DVNode(local_port, neighbors)
-    link.listen(is_last)
+    link.listen(is_last, is_forward)
 
 
 if __name__ == "__main__":
@@ -206,6 +566,9 @@ if __name__ == "__main__":
     $ clear && python src/dvnode.py 1025 1024 0.01 1026 0.05
     $ clear && python src/dvnode.py 1026 1025 0.05 1027 0.03
     $ clear && python src/dvnode.py 1027 1024 0.05 1026 0.03 last
+
+    Forwarding data along the computed routes (`send <dst-port> <message>`):
+    $ clear && python src/dvnode.py 1024 1025 0.01 1027 0.05 forward
     """
     try:
         parse_mode_and_go()
@@ -0,0 +1,156 @@
+import os
+import time
+import atexit
+import struct
+from threading import Lock, Thread, Event
+
+# directory for binary event traces; recording is a no-op unless this is set
+TRACE_ENV = "PA2_TRACE"
+TRACE_MAGIC = b"PA2T"
+TRACE_VERSION = 1
+# magic, version, node port
+HEADER = struct.Struct("<4sHH")
+# timestamp ns, node, event, seq (-1 when n/a), peer, bytes
+RECORD = struct.Struct("<QHBiHI")
+# records held in memory between flushes (newest are dropped when full)
+RING_CAPACITY = 64 * 1024
+FLUSH_INTERVAL = 200 / 1000
+
+# Event types (append only; ids are stored in trace files)
+SENT = 0
+RECEIVED = 1
+DISCARDED = 2
+DROPPED = 3
+ACK_SENT = 4
+ACK_RECEIVED = 5
+ACK_DISCARDED = 6
+ACK_DROPPED = 7
+TIMEOUT = 8
+RETRANSMIT = 9
+STATS = 10
+WINDOW = 11
+DV_SENT = 12
+DV_RECEIVED = 13
+DV_UPDATED = 14
+
+EVENT_NAMES = [
+    "sent",
+    "received",
+    "discarded",
+    "dropped",
+    "ack_sent",
+    "ack_received",
+    "ack_discarded",
+    "ack_dropped",
+    "timeout",
+    "retransmit",
+    "stats",
+    "window",
+    "dv_sent",
+    "dv_received",
+    "dv_updated",
+]
+
+
+class NullRecorder:
+    """Recorder used when tracing is off."""
+
+    enabled = False
+
+    def record(self, event, seq=-1, peer=0, size=0):
+        pass
+
+
+class TraceRecorder:
+    """Packs events into a fixed ring buffer flushed to disk by a background thread."""
+
+    enabled = True
+
+    def __init__(self, path, node, capacity=RING_CAPACITY):
+        self.node = node
+        self.capacity = capacity
+        self.ring = bytearray(capacity * RECORD.size)
+        self.ring_lock = Lock()
+        # total records written/flushed (ring index is count % capacity)
+        self.written = 0
+        self.flushed = 0
+        # records dropped because the flusher fell a full ring behind
+        self.overflowed = 0
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(TRACE_MAGIC, TRACE_VERSION, node))
+        self.stop_event = Event()
+        Thread(target=self.flush_loop, daemon=True).start()
+        atexit.register(self.close)
+
+    def record(self, event, seq=-1, peer=0, size=0):
+        """Appends one event; never blocks on disk I/O."""
+        timestamp = time.time_ns()
+        with self.ring_lock:
+            if self.written - self.flushed >= self.capacity:
+                self.overflowed += 1
+                return
+            offset = (self.written % self.capacity) * RECORD.size
+            RECORD.pack_into(
+                self.ring, offset, timestamp, self.node, event, seq, peer, size
+            )
+            self.written += 1
+
+    def take_pending(self):
+        """Copies unflushed records out of the ring (at most two slices)."""
+        with self.ring_lock:
+            start, end = self.flushed, self.written
+            first = (start % self.capacity) * RECORD.size
+            last = (end % self.capacity) * RECORD.size
+            if end == start:
+                chunks = []
+            elif first < last:
+                chunks = [bytes(self.ring[first:last])]
+            else:
+                chunks = [bytes(self.ring[first:]), bytes(self.ring[:last])]
+            self.flushed = end
+        return chunks
+
+    def flush(self):
+        for chunk in self.take_pending():
+            self.file.write(chunk)
+        self.file.flush()
+
+    def flush_loop(self):
+        while not self.stop_event.wait(FLUSH_INTERVAL):
+            self.flush()
+
+    def close(self):
+        if self.stop_event.is_set():
+            return
+        self.stop_event.set()
+        self.flush()
+        self.file.close()
+
+
+recorders_lock = Lock()
+recorders = {}
+
+
+def get_recorder(node):
+    """Shared recorder for a node port, configured from `PA2_TRACE`."""
+    directory = os.environ.get(TRACE_ENV)
+    if not directory:
+        return NullRecorder()
+    with recorders_lock:
+        if node not in recorders:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"node-{node}.trace")
+            recorders[node] = TraceRecorder(path, node)
+        return recorders[node]
+
+
+def read_trace(path):
+    """Yields (timestamp_ns, node, event, seq, peer, size) tuples from a trace file."""
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+        magic, version, _node = HEADER.unpack(header)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            raise ValueError(f"{path} is not a v{TRACE_VERSION} trace")
+        data = f.read()
+    usable = len(data) - len(data) % RECORD.size
+    yield from RECORD.iter_unpack(data[:usable])
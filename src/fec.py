@@ -0,0 +1,82 @@
+from utils import encode_chunk, decode_chunk
+
+
+def xor_payloads(payloads):
+    """XOR of utf-8 payloads as an int (shorter payloads are zero padded)."""
+    parity = 0
+    for payload in payloads:
+        parity ^= int.from_bytes(payload.encode("utf-8"), "little")
+    return parity
+
+
+def group_start(seq, k, first=0):
+    """First sequence number of `seq`'s group; groups restart at each transfer."""
+    return first + (seq - first) // k * k
+
+
+class FecEncoder:
+    """Builds an XOR parity packet for every `k` consecutive packets of a transfer."""
+
+    def __init__(self, k):
+        self.k = k
+        # group start -> {seq: payload} of packets sent so far
+        self.groups = {}
+        # group start -> finished parity packet, kept for retransmits until ACKed
+        self.parities = {}
+
+    def add(self, seq, payload, is_last=False, first=0):
+        """Adds a sent packet; returns the group's parity once its last packet is in.
+
+        `first` is the transfer's first sequence number, so a transfer that
+        ends mid group never shares that group with the next one."""
+        start = group_start(seq, self.k, first)
+        packets = self.groups.setdefault(start, {})
+        packets.setdefault(seq, payload)
+        closes_group = seq - start == self.k - 1 or is_last
+        if not closes_group:
+            return None
+        if start not in self.parities:
+            self.parities[start] = self.create_parity(start, packets)
+        return self.parities[start]
+
+    def create_parity(self, first, packets):
+        ordered = [packets[seq] for seq in sorted(packets)]
+        lengths = [len(payload.encode("utf-8")) for payload in ordered]
+        parity = xor_payloads(ordered).to_bytes(max(lengths), "little")
+        return {"first": first, "lengths": lengths, "parity": encode_chunk(parity)}
+
+    def discard_below(self, seq):
+        """Forgets groups that were fully ACKed."""
+        for start in [g for g in self.groups if g + self.k <= seq]:
+            self.groups.pop(start)
+            self.parities.pop(start, None)
+
+
+class FecDecoder:
+    """Rebuilds a single missing packet per group from parity."""
+
+    def __init__(self, k):
+        self.k = k
+        # seq -> (payload, metadata) for every packet seen in open groups
+        self.received = {}
+
+    def add(self, seq, payload, metadata):
+        self.received.setdefault(seq, (payload, metadata))
+
+    def recover(self, first, lengths, parity):
+        """Returns (seq, payload) for the group's only missing packet, else None."""
+        seqs = range(first, first + len(lengths))
+        missing = [seq for seq in seqs if seq not in self.received]
+        if len(missing) != 1:
+            return None
+        seq = missing[0]
+        others = [self.received[s][0] for s in seqs if s != seq]
+        value = int.from_bytes(decode_chunk(parity), "little") ^ xor_payloads(others)
+        length = lengths[seq - first]
+        return seq, value.to_bytes(length, "little").decode("utf-8")
+
+    def discard_below(self, seq, first=0):
+        """Forgets packets in groups that end before `seq`'s group."""
+        start = group_start(seq, self.k, first)
+        for old_seq in [s for s in self.received if s < start]:
+            self.received.pop(old_seq)
@@ -0,0 +1,33 @@
+import zlib
+from itertools import count
+
+
+class ForwardingTable:
+    """Compact `dst -> next hops` table derived from a distance vector."""
+
+    def __init__(self, distance_vector, version=0):
+        # bumped on every rebuild so callers can tell tables apart
+        self.version = version
+        # dst -> tuple of equal cost next hops (direct links forward to dst)
+        self.next_hops = {}
+        for dst, route in distance_vector.items():
+            hops = route.get("hops") or [dst]
+            self.next_hops[int(dst)] = tuple(int(hop) for hop in hops)
+        # dst -> round robin counter used when packets carry no flow id
+        self.counters = {dst: count() for dst, hops in self.next_hops.items()}
+
+    def lookup(self, dst, flow=None):
+        """Next hop for `dst` (None when unreachable).
+
+        Equal cost hops are balanced per flow when `flow` is given (keeping a
+        flow's packets in order) and round robin per packet otherwise.
+        """
+        hops = self.next_hops.get(dst)
+        if not hops:
+            return None
+        if len(hops) == 1:
+            return hops[0]
+        if flow is not None:
+            # crc32 (unlike `hash`) picks the same hop in every process
+            return hops[zlib.crc32(str(flow).encode()) % len(hops)]
+        return hops[next(self.counters[dst]) % len(hops)]
@@ -0,0 +1,74 @@
+import json
+import time
+import zlib
+from threading import Lock
+
+from utils import encode, encode_chunk, decode_chunk
+
+# raw body bytes per fragment; base64 + metadata stays within the 4096b recv size
+FRAGMENT_SIZE = 2048
+# bodies larger than this are zlib compressed before fragmenting
+COMPRESS_THRESHOLD = 1024
+# partially reassembled messages are dropped after this many seconds
+REASSEMBLY_TIMEOUT = 2
+
+
+def encode_fragments(type, port, message_id, body, fragment_size=FRAGMENT_SIZE):
+    """Serializes `body` (zlib compressed when large) into fragment datagrams."""
+    data = json.dumps(body).encode("utf-8")
+    compressed = len(data) > COMPRESS_THRESHOLD
+    if compressed:
+        data = zlib.compress(data)
+    chunks = [
+        data[offset : offset + fragment_size]
+        for offset in range(0, max(len(data), 1), fragment_size)
+    ]
+    datagrams = []
+    for index, chunk in enumerate(chunks):
+        metadata = {
+            "port": port,
+            "id": message_id,
+            "index": index,
+            "count": len(chunks),
+            "compressed": compressed,
+        }
+        message = {"type": type, "payload": encode_chunk(chunk), "metadata": metadata}
+        datagrams.append(encode(message))
+    return datagrams
+
+
+class Reassembler:
+    """Collects fragments per (sender, message id) until the body is complete."""
+
+    def __init__(self, timeout=REASSEMBLY_TIMEOUT):
+        self.timeout = timeout
+        self.partials_lock = Lock()
+        # (port, id) -> {"started", "chunks": {index: bytes}}
+        self.partials = {}
+
+    def add(self, metadata, payload):
+        """Adds a fragment; returns the decoded body once all fragments arrived."""
+        key = (metadata.get("port"), metadata.get("id"))
+        count = metadata.get("count")
+        now = time.time()
+        with self.partials_lock:
+            self.expire(now)
+            partial = self.partials.setdefault(key, {"started": now, "chunks": {}})
+            partial["chunks"][metadata.get("index")] = decode_chunk(payload)
+            if len(partial["chunks"]) < count:
+                return None
+            self.partials.pop(key)
+        data = b"".join(partial["chunks"][index] for index in range(count))
+        if metadata.get("compressed"):
+            data = zlib.decompress(data)
+        return json.loads(data.decode("utf-8"))
+
+    def expire(self, now):
+        """Drops messages whose fragments stopped arriving."""
+        stale = [
+            key
+            for key, partial in self.partials.items()
+            if now - partial["started"] > self.timeout
+        ]
+        for key in stale:
+            self.partials.pop(key)
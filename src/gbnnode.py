@@ -1,12 +1,20 @@
 from log import logger
 from operator import itemgetter
-import random
 import time
 import re
-from threading import Thread, Event, Lock
+import os
+from collections import deque
+from queue import Queue, Empty
+from threading import Thread, Event, Lock, Condition
 import sys
 
-from messages import parse_help_message, gbn_help_message, get_stats_message
+from messages import (
+    parse_help_message,
+    gbn_help_message,
+    get_stats_message,
+    get_transfer_message,
+    get_window_message,
+)
 from utils import (
     deadloop,
     InvalidArgException,
@@ -14,15 +22,26 @@ from utils import (
     SocketClient,
     encode,
     handles_signal,
+    encode_chunk,
+    decode_chunk,
+    read_chunks,
+    DelayScheduler,
 )
+from congestion import AIMDWindow
+from loss import create_loss_model, build_loss_model
+from fec import FecEncoder, FecDecoder
+from profiling import instrumented, instrument_lock, instrumentation
+import eventtrace
 
 
 # 500ms (500ms/1000ms = 0.5s)
 TIMER_SLEEP_INTERVAL = 500 / 1000
-
-
-def decision(probability):
-    return random.random() < probability
+# raw bytes per stream packet (base64 encoded it stays within the 4096b recv size)
+STREAM_CHUNK_SIZE = 2048
+# stream buffer holds at most this many windows before the reader blocks
+STREAM_BUFFER_WINDOWS = 2
+# received stream chunks buffered for the sink (advertised to the sender as rwnd)
+RECEIVE_WINDOW = 64
 
 
 class ClientError(Exception):
@@ -42,6 +61,12 @@ class GenericGBNode:
         stop_event,
         on_send,
         on_stats=None,
+        sink=None,
+        congestion_control=False,
+        timeout=TIMER_SLEEP_INTERVAL,
+        loss_model=None,
+        fec_k=0,
+        receive_window=RECEIVE_WINDOW,
     ):
         # Main Params
         self.port = port
@@ -49,44 +74,185 @@ class GenericGBNode:
         self.window_size = window_size
         self.mode = mode
         self.mode_value = mode_value
+        # decides drops/delays for incoming packets (defaults to the `-p`/`-d` rule)
+        self.loss_model = loss_model or create_loss_model(mode, mode_value)
+        self.timeout = timeout
+        # send an XOR parity packet every `fec_k` packets (0 disables FEC)
+        self.fec_k = fec_k
+        # optional AIMD controller shrinking/growing the window within `window_size`
+        self.congestion = AIMDWindow(window_size) if congestion_control else None
+        # effective window over time for the last finished transfer
+        self.window_trajectory = []
+        # goodput/retransmission counters of the last finished transfer
+        self.last_transfer = None
+        # chunks waiting for a slow sink before the receiver stops accepting more
+        self.receive_window = receive_window
+        self.delivery = Queue()
+        self.delivery_started = False
+        # (sock, ip, port) owed a window update once the buffer drains
+        self.window_closed_by = None
         # GBN Logic
         self.init_gbn_state()
-        self.buffer_lock = Lock()
+        self.buffer_lock = instrument_lock(Lock(), "buffer_lock")
+        # signalled when ACKs free up buffer space for a blocked stream reader
+        self.buffer_space = Condition(self.buffer_lock)
+        # signalled when new packets, ACKs or window updates may allow sending
+        self.send_ready = Condition(self.buffer_lock)
         self.on_send = on_send
         self.stop_event = stop_event
+        # holds back packets with injected delay on a single shared thread
+        self.delay_scheduler = DelayScheduler(stop_event)
         self.on_stats = on_stats
-        self.last_acked = 0
+        # receiver writes in-order stream chunks here (None discards them)
+        self.sink = sink
+        # set once the peer reports stats for every queued transfer
+        self.transfer_done = Event()
+        # binary packet event trace (no-op unless `PA2_TRACE` is set)
+        self.tracer = eventtrace.get_recorder(port)
 
     def init_gbn_state(self):
-        """Initialize instance vars that depend on each GBN send."""
+        """Initialize the sending and receiving state of a GBN session."""
+        self.init_send_state()
+        self.init_receive_state()
+        self.loss_model.reset()
+
+    def init_send_state(self):
+        """Sender state; sequence numbers run across every queued transfer."""
         self.buffer = []
         # the last ack'ed message from receiver
         self.window_base = 0
         # the next index in window to send
         self.next_seq_num = 0
+        # receivers restart their sequence numbers when the session changes
+        self.session = int.from_bytes(os.urandom(4), "big")
+        # queued/in flight transfers (records from `queue_transfer`), oldest first
+        self.transfers = deque()
+        self.next_transfer_id = 0
+        # receive window last advertised by the peer (None until the first ACK)
+        self.peer_rwnd = None
+        # Streaming (bulk file/stdin) transfer state
+        self.streaming = False
+        self.highest_seq_sent = -1
+        self.fec_encoder = FecEncoder(self.fec_k) if self.fec_k else None
+
+    def init_receive_state(self, session=None):
+        """Receiver state for a (new) sending session."""
+        self.incoming_session = session
         # increased on succesful ACKs
         self.incoming_seq_num = 0
-        # used to compare in the timer against current inbox state
-        self.last_incoming_seq_num = 0
-        self.dropped_packet_numbers = []
-        # The message being sent (added to packet metadata)
-        self.total_message = ""
+        # first sequence number of the transfer `incoming_seq_num` belongs to
+        self.incoming_first = 0
+        self.fec_decoder = FecDecoder(self.fec_k) if self.fec_k else None
+        self.init_incoming_transfer()
+
+    def init_incoming_transfer(self):
+        """Receiver counters reported (and reset) with each transfer's stats."""
+        self.incoming_transfer = None
         self.dropped_packets = 0
         self.acked_packets = 0
-        self.sent_packets = 0
         self.partial_message = ""
+        self.stream_bytes = 0
+        self.stream_started = None
+        self.recovered_packets = 0
+        # packets refused while the sink's buffer was full
+        self.flow_dropped_packets = 0
 
     def create_gbn_message(self, type, payload=None, metadata={}):
         """Convert plaintext user input to serialized message 'packet'."""
         message_metadata = {"port": self.port, **metadata}
         return {"type": type, "payload": payload, "metadata": message_metadata}
 
-    def send(self, packet, seq_num):
+    def queue_transfer(self, packets, total_message=None):
+        """Appends a transfer's packets after everything already queued (lock held).
+
+        Waits for an open stream to end first, since its packets run until then."""
+        while self.transfers and self.transfers[-1]["last"] is None:
+            if self.stop_event.is_set():
+                return None
+            self.send_ready.wait(TIMER_SLEEP_INTERVAL)
+        first = self.window_base + len(self.buffer)
+        transfer = {
+            "id": self.next_transfer_id,
+            "first": first,
+            # streams stay open (None) until their terminating empty packet
+            "last": None if total_message is None else first + len(packets) - 1,
+            "total_message": total_message,
+            "total_bytes": 0 if total_message is None else len(total_message),
+            # set when its first packet goes out (not while queued)
+            "started": None,
+            "sent_packets": 0,
+            "retransmitted_packets": 0,
+        }
+        self.next_transfer_id += 1
+        self.transfers.append(transfer)
+        self.buffer.extend(packets)
+        instrumentation.record_depth("gbn.buffer", len(self.buffer))
+        self.send_ready.notify_all()
+        return transfer
+
+    def transfer_for(self, seq_num):
+        """The queued transfer `seq_num` belongs to."""
+        for transfer in self.transfers:
+            last = transfer["last"]
+            if transfer["first"] <= seq_num and (last is None or seq_num <= last):
+                return transfer
+        return None
+
+    def transfer_first(self, seq_num):
+        """First sequence number of `seq_num`'s transfer (lock held).
+
+        Logs count packets from 0 within each transfer."""
+        transfer = self.transfer_for(seq_num)
+        return transfer["first"] if transfer else 0
+
+    def transfer_metadata(self, transfer):
+        """Metadata describing a packet's transfer, sent with every packet."""
+        metadata = {
+            "session": self.session,
+            "transfer": transfer["id"],
+            "transfer_first": transfer["first"],
+        }
+        if transfer["total_message"] is None:
+            return {**metadata, "stream": True}
+        return {**metadata, "total_message": transfer["total_message"]}
+
+    def send(self, packet, seq_num, retransmit=False):
         """Adds metadata to header and sends packet to UDP socket."""
-        self.sent_packets += 1
-        metadata = {"packet_num": seq_num, "total_message": self.total_message}
+        transfer = self.transfer_for(seq_num)
+        if transfer["started"] is None:
+            transfer["started"] = time.time()
+        transfer["sent_packets"] += 1
+        if retransmit:
+            transfer["retransmitted_packets"] += 1
+        metadata = {"packet_num": seq_num, **self.transfer_metadata(transfer)}
         message = self.create_gbn_message("message", packet, metadata)
         self.on_send(message, self.peer_port)
+        self.send_parity(packet, seq_num, transfer)
+
+    def is_last_packet(self, packet, seq_num, transfer):
+        """Whether `seq_num` ends its transfer (closes the final FEC group)."""
+        if transfer["total_message"] is None:
+            return packet == ""
+        return seq_num == transfer["last"]
+
+    def send_parity(self, packet, seq_num, transfer):
+        """Sends the group's parity right after its last packet (FEC mode)."""
+        if not self.fec_encoder:
+            return
+        is_last = self.is_last_packet(packet, seq_num, transfer)
+        parity = self.fec_encoder.add(seq_num, packet, is_last, transfer["first"])
+        if parity is None:
+            return
+        first, lengths = parity["first"], parity["lengths"]
+        metadata = {
+            "first": first,
+            "lengths": lengths,
+            **self.transfer_metadata(transfer),
+        }
+        message = self.create_gbn_message("parity", parity["parity"], metadata)
+        self.on_send(message, self.peer_port)
+        first -= transfer["first"]
+        logger.info(f"parity{first}-{first + len(lengths) - 1} sent")
 
     @deadloop
     def send_buffer(self):
@@ -94,125 +260,432 @@ class GenericGBNode:
         with self.buffer_lock:
             # check if we can send more messages from buffer
             # buffer must be gt zero AND next_seq_num within window range
-            if len(self.buffer) == 0:
-                return
             # Can keep sending if next sequence number - window base <= window size
             window_offset = self.next_seq_num - self.window_base
-            is_within_window = window_offset < self.window_size
+            is_within_window = window_offset < self.effective_window()
             # Prevent sending sequence number thats gt buffer
             is_seq_within_buffer = window_offset < len(self.buffer)
-            # only dump buffer when seq-base is within window index range
-            if is_within_window and is_seq_within_buffer:
-                # fetch from buffer and send, increasing next seq num
-                next_packet = self.buffer[window_offset]
-                pack_num = self.next_seq_num
-                self.send(next_packet, pack_num)
-                logger.info(f"packet{pack_num} {next_packet} sent")
-                self.next_seq_num += 1
-
+            # sleep (instead of spinning) until an ACK, window update or new packet
+            if not (is_within_window and is_seq_within_buffer):
+                self.send_ready.wait(TIMER_SLEEP_INTERVAL)
+                return
+            # fetch from buffer and send, increasing next seq num
+            next_packet = self.buffer[window_offset]
+            pack_num = self.next_seq_num
+            is_retransmit = self.track_sent(pack_num)
+            self.send(next_packet, pack_num, is_retransmit)
+            label = pack_num - self.transfer_first(pack_num)
+            logger.info(f"packet{label} {self.describe(next_packet)} sent")
+            event = eventtrace.SENT
+            if is_retransmit:
+                event = eventtrace.RETRANSMIT
+            self.tracer.record(event, pack_num, self.peer_port, len(next_packet))
+            self.next_seq_num += 1
+
+    def track_sent(self, seq_num):
+        """Records `seq_num` as sent; True if it already went out before (lock held).
+
+        A window shrunk on timeout rewinds `next_seq_num`, so `send_buffer` also
+        resends packets and those count as retransmissions too."""
+        is_retransmit = seq_num <= self.highest_seq_sent
+        self.highest_seq_sent = max(self.highest_seq_sent, seq_num)
+        return is_retransmit
+
+    @instrumented("gbn.handle_incoming_stats")
     def handle_incoming_stats(self, message, metadata):
-        """Handles incoming `stats` message type."""
-        self.init_gbn_state()
+        """Handles incoming `stats` message type for one finished transfer."""
+        self.tracer.record(eventtrace.STATS, peer=metadata.get("port", 0))
+        with self.buffer_space:
+            transfer = self.complete_transfer(metadata.get("transfer"))
+            if transfer is None:
+                # duplicate stats for a transfer we already finished
+                return
+            is_idle = len(self.transfers) == 0
+        transfer_data = {
+            "total_bytes": transfer["total_bytes"],
+            "elapsed": time.time() - transfer["started"],
+            "sent_packets": transfer["sent_packets"],
+            "retransmitted_packets": transfer["retransmitted_packets"],
+        }
+        if transfer["total_message"] is None:
+            self.streaming = False
+        # the next transfer's packets are numbered (and dropped) from 0 again
+        self.loss_model.reset()
+        logger.info(f"transfer{transfer['id']} complete")
+        logger.info(get_transfer_message(**transfer_data))
+        self.last_transfer = transfer_data
+        # the window summary covers everything sent since the queue was last idle
+        if self.congestion and is_idle:
+            self.window_trajectory = list(self.congestion.trajectory)
+            logger.info(get_window_message(**self.congestion.summary()))
+            self.congestion.reset()
+        if is_idle:
+            self.transfer_done.set()
         if self.on_stats:
             self.on_stats(message, metadata)
 
+    def complete_transfer(self, transfer_id):
+        """Dequeues a transfer the peer fully received (lock held)."""
+        transfer = next((t for t in self.transfers if t["id"] == transfer_id), None)
+        if transfer is None:
+            return None
+        # stats imply every packet arrived, even if some of their ACKs were lost
+        end = transfer["last"] + 1
+        if end > self.window_base:
+            del self.buffer[: end - self.window_base]
+            self.window_base = end
+            self.next_seq_num = max(self.next_seq_num, end)
+            if self.fec_encoder:
+                self.fec_encoder.discard_below(end)
+            self.buffer_space.notify()
+            self.send_ready.notify_all()
+        # transfers are delivered in order so older ones are finished too
+        while self.transfers and self.transfers[0]["id"] <= transfer_id:
+            self.transfers.popleft()
+        return transfer
+
+    @instrumented("gbn.handle_incoming_ack")
     def handle_incoming_ack(self, sender_ip, sock, metadata):
         """Handle incoming `ack` message type."""
         pack_num = itemgetter("packet_num")(metadata)
+        with self.buffer_space:
+            first = self.transfer_first(pack_num)
+            # Handle DROPS based on mode resolution
+            if self.should_drop(pack_num - first):
+                self.dropped_packets += 1
+                logger.info(f"ACK{pack_num - first} discarded")
+                self.tracer.record(eventtrace.ACK_DISCARDED, pack_num, self.peer_port)
+                return
+            # only flow controlled (sink backed stream) receivers advertise one
+            if metadata.get("rwnd") != self.peer_rwnd:
+                self.peer_rwnd = metadata.get("rwnd")
+                self.send_ready.notify_all()
+
+            # base should ONLY increase if pack_num matches sender base next seq num
+            if pack_num != self.window_base:
+                logger.info(
+                    f"ACK{pack_num - first} dropped, at base {self.window_base - first}"
+                )
+                self.tracer.record(eventtrace.ACK_DROPPED, pack_num, self.peer_port)
+                return
+            # remove original message from buffer
+            self.buffer.pop(pack_num - self.window_base)
+            self.buffer_space.notify()
+            instrumentation.record_depth("gbn.buffer", len(self.buffer))
+            # increase window base from removed message in buffer
+            self.window_base += 1
+            # a shrunk window after timeout may rewind next_seq_num below late ACKs
+            self.next_seq_num = max(self.next_seq_num, self.window_base)
+            if self.fec_encoder:
+                self.fec_encoder.discard_below(self.window_base)
+            if self.congestion:
+                previous_window = self.effective_window()
+                self.congestion.on_ack()
+                if self.effective_window() != previous_window:
+                    self.tracer.record(eventtrace.WINDOW, self.effective_window())
+            self.send_ready.notify_all()
+            window_base = self.window_base
+        logger.info(
+            f"ACK{pack_num - first} received, window moves to {window_base - first}"
+        )
+        self.tracer.record(eventtrace.ACK_RECEIVED, pack_num, self.peer_port)
 
-        # Handle DROPS based on mode resolution
-        if self.should_drop(pack_num):
-            self.dropped_packets += 1
-            self.dropped_packet_numbers.append(pack_num)
-            logger.info(f"ACK{pack_num} discarded")
-            return
-
-        # base should ONLY increase if pack_num matches sender base next seq num
-        if pack_num != self.window_base:
-            logger.info(f"ACK{pack_num} dropped, at base {self.window_base}")
+    @instrumented("gbn.handle_incoming_window")
+    def handle_incoming_window(self, metadata):
+        """Handles `window` updates sent when the receive buffer fills or drains."""
+        if self.should_drop(None):
+            logger.info("window update discarded")
             return
-        # remove original message from buffer
+        logger.info(f"receive window is {metadata['rwnd']}")
         with self.buffer_lock:
-            self.buffer.pop(pack_num - self.window_base)
-        # increase window base from removed message in buffer
-        self.window_base += 1
-        logger.info(f"ACK{pack_num} received, window moves to {self.window_base}")
+            self.peer_rwnd = metadata["rwnd"]
+            # the refused packet (and anything after it) goes again once there is room
+            refused = metadata.get("packet_num")
+            if refused is not None and self.window_base <= refused < self.next_seq_num:
+                self.next_seq_num = refused
+            self.send_ready.notify_all()
+
+    def effective_window(self):
+        """Window used for sending: AIMD controlled or the fixed `window_size`."""
+        window = self.congestion.size() if self.congestion else self.window_size
+        # never more than the receiver said it can buffer
+        if self.peer_rwnd is not None:
+            return min(window, self.peer_rwnd)
+        return window
 
     def should_drop(self, pack_num):
         """Determines whether current packet is dropped based on config."""
-        if self.mode == "-p":
-            # drop when the prob matches probabilistic
-            return decision(self.mode_value)
-        else:
-            # drop when the incoming index matches deterministic mode value
-            is_drop_index = pack_num % self.mode_value == 0 and pack_num != 0
-            already_dropped_pack_num = pack_num in self.dropped_packet_numbers
-            return is_drop_index and not already_dropped_pack_num
+        return self.loss_model.should_drop(pack_num)
 
+    @instrumented("gbn.handle_incoming_message")
     def handle_incoming_message(self, sender_ip, sock, payload, metadata):
         """Handle incoming `message` message type."""
         metadata, message = itemgetter("metadata", "payload")(payload)
-        total_message, pack_num = itemgetter("total_message", "packet_num")(metadata)
+        pack_num = itemgetter("packet_num")(metadata)
+        self.streaming = metadata.get("stream", False)
+        client_port = itemgetter("port")(metadata)
+        # a restarted sender starts over at packet 0
+        if metadata.get("session") != self.incoming_session:
+            self.init_receive_state(metadata.get("session"))
+        # sequence numbers run across transfers; logs count from 0 in each
+        first = metadata.get("transfer_first", 0)
+        label = pack_num - first
 
-        logger.info(f"packet{pack_num} {message} received")
+        logger.info(f"packet{label} {self.describe(message)} received")
+        self.tracer.record(eventtrace.RECEIVED, pack_num, client_port, len(message))
 
         # Handle DROPS based on mode resolution
-        if self.should_drop(pack_num):
+        if self.should_drop(label):
             self.dropped_packets += 1
-            self.dropped_packet_numbers.append(pack_num)
-            logger.info(f"packet{pack_num} {message} discarded")
+            logger.info(f"packet{label} {self.describe(message)} discarded")
+            self.tracer.record(eventtrace.DISCARDED, pack_num, client_port)
             return
 
+        # FEC keeps every new packet of open groups (even out of order) for recovery
+        if self.fec_decoder and pack_num >= self.incoming_seq_num:
+            self.fec_decoder.add(pack_num, message, metadata)
+
         # Handle ACK ONLY if incoming message matches incoming seq num
         if pack_num > self.incoming_seq_num:
-            logger.info(f"packet{pack_num} {message} dropped")
+            logger.info(f"packet{label} {self.describe(message)} dropped")
+            self.tracer.record(eventtrace.DROPPED, pack_num, client_port)
             return
 
         if pack_num < self.incoming_seq_num:
             logger.info(
-                f"dup ACK{pack_num} sent, expecting packet{self.incoming_seq_num}"
+                f"dup ACK{label} sent, expecting packet{self.incoming_seq_num - first}"
             )
-            client_port = itemgetter("port")(metadata)
-            ack_metadata = {
-                "packet_num": pack_num,
-                "total_message": total_message,
-            }
-            ack_message = encode(self.create_gbn_message("ack", None, ack_metadata))
-            sock.sendto(ack_message, (sender_ip, client_port))
+            self.tracer.record(eventtrace.ACK_SENT, pack_num, client_port)
+            self.send_ack(sock, sender_ip, client_port, pack_num, metadata)
             return
 
+        if self.accept_packet(sender_ip, sock, pack_num, message, metadata):
+            self.accept_buffered_packets(sender_ip, sock)
+
+    def receive_space(self):
+        """Stream chunks the receiver can still buffer."""
+        return max(self.receive_window - self.delivery.qsize(), 0)
+
+    def advertised_window(self):
+        """`rwnd` sent to the peer; stays 0 until half the buffer is free again.
+
+        Reopening a chunk at a time would degrade to stop-and-wait."""
+        space = self.receive_space()
+        return space if space >= max(self.receive_window // 2, 1) else 0
+
+    def is_flow_controlled(self, metadata):
+        """Only streams written to a sink have a receive buffer to protect."""
+        return self.sink is not None and metadata.get("stream", False)
+
+    def send_ack(self, sock, sender_ip, client_port, pack_num, metadata):
+        """ACKs `pack_num`, advertising the free receive buffer when there is one."""
+        ack_metadata = {
+            "packet_num": pack_num,
+            "total_message": metadata.get("total_message"),
+        }
+        if self.is_flow_controlled(metadata):
+            rwnd = self.advertised_window()
+            if rwnd == 0:
+                self.window_closed_by = (sock, sender_ip, client_port)
+            ack_metadata["rwnd"] = rwnd
+        ack_message = encode(self.create_gbn_message("ack", None, ack_metadata))
+        sock.sendto(ack_message, (sender_ip, client_port))
+
+    def send_window_update(self, sock, sender_ip, client_port, pack_num=None):
+        """Tells the sender how much it may send (and which packet was refused)."""
+        metadata = {"rwnd": self.advertised_window()}
+        if pack_num is not None:
+            metadata["packet_num"] = pack_num
+        window_message = encode(self.create_gbn_message("window", None, metadata))
+        sock.sendto(window_message, (sender_ip, client_port))
+
+    def accept_packet(self, sender_ip, sock, pack_num, message, metadata):
+        """ACKs and delivers the next in-order packet (False if it was refused)."""
+        total_message = metadata.get("total_message")
+        streaming = metadata.get("stream", False)
+        client_port = itemgetter("port")(metadata)
+        first = metadata.get("transfer_first", 0)
+
+        # flow control: refuse chunks while the sink's buffer is full
+        if self.is_flow_controlled(metadata) and self.receive_space() == 0:
+            self.flow_dropped_packets += 1
+            logger.info(f"packet{pack_num - first} refused, receive buffer full")
+            self.tracer.record(eventtrace.DROPPED, pack_num, client_port)
+            self.window_closed_by = (sock, sender_ip, client_port)
+            self.send_window_update(sock, sender_ip, client_port, pack_num)
+            return False
+
+        self.incoming_transfer = metadata.get("transfer")
         # increase incoming seq num
         self.incoming_seq_num += 1
-        logger.info(f"ACK{pack_num} sent, expecting packet{self.incoming_seq_num}")
+        self.incoming_first = first
+        expecting = self.incoming_seq_num - first
+        logger.info(f"ACK{pack_num - first} sent, expecting packet{expecting}")
+        self.tracer.record(eventtrace.ACK_SENT, pack_num, client_port)
         self.acked_packets += 1
 
-        if pack_num == 0 and self.last_acked == 0:
-            self.partial_message = message
-        elif pack_num > self.last_acked:
+        if streaming:
+            self.receive_chunk(message)
+        else:
             self.partial_message += message
-            self.last_acked = pack_num
 
         # send ACK to recv'er
-        client_port = itemgetter("port")(metadata)
-        ack_metadata = {"packet_num": pack_num, "total_message": total_message}
-        ack_message = encode(self.create_gbn_message("ack", None, ack_metadata))
-        sock.sendto(ack_message, (sender_ip, client_port))
+        self.send_ack(sock, sender_ip, client_port, pack_num, metadata)
 
-        # Check if we've hit end
-        if self.partial_message == total_message:
+        # Check if we've hit end (an empty packet terminates a stream)
+        if streaming:
+            is_complete = message == ""
+        else:
+            is_complete = self.partial_message == total_message
+        if is_complete:
+            if streaming:
+                self.finish_stream()
             total_packets = self.dropped_packets + self.acked_packets
             stats_data = {
                 "dropped_packets": self.dropped_packets,
                 "total_packets": total_packets,
             }
+            logger.info(f"transfer{self.incoming_transfer} received")
             logger.info(get_stats_message(**stats_data))
-            stats_message = encode(self.create_gbn_message("stats", stats_data))
-            sock.sendto(stats_message, (sender_ip, client_port))
-            self.init_gbn_state()
+            if self.fec_decoder:
+                logger.info(f"[FEC] {self.recovered_packets} packets recovered")
+            if self.flow_dropped_packets:
+                logger.info(
+                    f"[Flow] {self.flow_dropped_packets} packets refused (buffer full)"
+                )
+            stats_metadata = {"transfer": self.incoming_transfer}
+            stats_message = self.create_gbn_message("stats", stats_data, stats_metadata)
+            sock.sendto(encode(stats_message), (sender_ip, client_port))
+            self.init_incoming_transfer()
+            self.loss_model.reset()
+            # the next packet starts the next transfer (and its FEC groups)
+            self.incoming_first = self.incoming_seq_num
+        return True
+
+    def accept_buffered_packets(self, sender_ip, sock):
+        """Delivers out-of-order packets held by FEC once the gap before them fills."""
+        if not self.fec_decoder:
+            return
+        while self.incoming_seq_num in self.fec_decoder.received:
+            pack_num = self.incoming_seq_num
+            message, metadata = self.fec_decoder.received[pack_num]
+            if not self.accept_packet(sender_ip, sock, pack_num, message, metadata):
+                break
+        self.fec_decoder.discard_below(self.incoming_seq_num, self.incoming_first)
+
+    @instrumented("gbn.handle_incoming_parity")
+    def handle_incoming_parity(self, sender_ip, sock, payload, metadata):
+        """Handle incoming `parity` message type, rebuilding a single lost packet."""
+        parity = itemgetter("payload")(payload)
+        first, lengths = itemgetter("first", "lengths")(metadata)
+        start = first - metadata.get("transfer_first", 0)
+        label = f"parity{start}-{start + len(lengths) - 1}"
+        if not self.fec_decoder:
+            logger.info(f"{label} ignored, FEC is disabled")
+            return
+        # parity packets have no sequence number of their own
+        if self.should_drop(None):
+            logger.info(f"{label} discarded")
+            return
+        recovered = self.fec_decoder.recover(first, lengths, parity)
+        if recovered is None:
+            return
+        pack_num, message = recovered
+        if pack_num < self.incoming_seq_num:
+            return
+        self.recovered_packets += 1
+        self.fec_decoder.add(pack_num, message, metadata)
+        label = pack_num - metadata.get("transfer_first", 0)
+        logger.info(f"packet{label} {self.describe(message)} recovered")
+        self.accept_buffered_packets(sender_ip, sock)
+
+    def describe(self, packet):
+        """Label for packet logs; stream chunks are summarized by size."""
+        return f"<{len(packet)}B>" if self.streaming else packet
+
+    def receive_chunk(self, packet):
+        """Hands an in-order stream chunk to the sink writer."""
+        if self.stream_started is None:
+            self.stream_started = time.time()
+        data = decode_chunk(packet)
+        self.stream_bytes += len(data)
+        if not self.sink:
+            return
+        # a slow sink shouldn't block the socket, so writes happen on their own thread
+        if not self.delivery_started:
+            self.delivery_started = True
+            Thread(target=self.deliver_chunks, daemon=True).start()
+        self.delivery.put(data)
+        instrumentation.record_depth("gbn.delivery", self.delivery.qsize())
 
-    def demux_incoming_message(self, sock, sender_ip, payload):
+    @deadloop
+    def deliver_chunks(self):
+        """Drains buffered chunks into the sink, reopening a closed receive window."""
+        try:
+            data = self.delivery.get(timeout=TIMER_SLEEP_INTERVAL)
+        except Empty:
+            return
+        # None marks the end of a stream
+        if data is None:
+            self.sink.flush()
+        else:
+            self.sink.write(data)
+        if self.window_closed_by and self.advertised_window() > 0:
+            sock, sender_ip, client_port = self.window_closed_by
+            self.window_closed_by = None
+            self.send_window_update(sock, sender_ip, client_port)
+
+    def finish_stream(self):
+        """Flushes the sink and logs receive goodput once a stream completes."""
+        if self.sink:
+            self.delivery.put(None)
+        elapsed = time.time() - self.stream_started
+        goodput = self.stream_bytes / elapsed / 1_000_000 if elapsed else 0
+        logger.info(
+            f"[Stream] {self.stream_bytes} bytes received, goodput = {goodput:.3f} MB/s"
+        )
+
+    def stream(self, chunks):
+        """Streams byte chunks through the window, blocking while the buffer is full.
+
+        Transfers queued while the stream is open wait until it ends."""
+        capacity = max(self.window_size, 1) * STREAM_BUFFER_WINDOWS
+        with self.buffer_lock:
+            transfer = self.queue_transfer([])
+            if transfer is None:
+                return
+            self.streaming = True
+        for chunk in chunks:
+            packet = encode_chunk(chunk)
+            with self.buffer_space:
+                # backpressure: wait for ACKs to drain the buffer
+                while len(self.buffer) >= capacity:
+                    if self.stop_event.is_set():
+                        return
+                    self.buffer_space.wait(TIMER_SLEEP_INTERVAL)
+                self.buffer.append(packet)
+                transfer["total_bytes"] += len(chunk)
+                instrumentation.record_depth("gbn.buffer", len(self.buffer))
+                self.send_ready.notify_all()
+        # an empty packet marks the end of the stream
+        with self.buffer_lock:
+            self.buffer.append("")
+            transfer["last"] = self.window_base + len(self.buffer) - 1
+            self.send_ready.notify_all()
+
+    @instrumented("gbn.demux_incoming_message")
+    def demux_incoming_message(self, sock, sender_ip, payload, delayed=False):
         """Sends ACK based on configured drop rate."""
         metadata, message, type = itemgetter("metadata", "payload", "type")(payload)
+        # injected delay/reordering holds data and ACKs back before handling; every
+        # impaired packet (even undelayed ones) goes through the scheduler thread
+        # so receiver state is never updated from two threads at once
+        if type != "stats" and not delayed and self.loss_model.is_impaired():
+            delay = self.loss_model.delay_for()
+            self.delay_scheduler.call_later(
+                delay, self.demux_incoming_message, sock, sender_ip, payload, True
+            )
+            return
         if type == "stats":
             self.handle_incoming_stats(message, metadata)
             return
@@ -221,31 +694,64 @@ class GenericGBNode:
             return
         elif type == "message":
             self.handle_incoming_message(sender_ip, sock, payload, metadata)
+        elif type == "parity":
+            self.handle_incoming_parity(sender_ip, sock, payload, metadata)
+        elif type == "window":
+            self.handle_incoming_window(metadata)
 
     @deadloop
     def sender_timer(self):
-        """Attaches to last sent message and if no ACK is recv'ed within interval resends & resets."""
+        """Resends the window if no ACK moves its base within the timeout."""
         # do nothing if nothing outbound is being awaited
         with self.buffer_lock:
             if len(self.buffer) == 0:
+                self.send_ready.wait(self.timeout)
                 return
 
         # First message was recv'ed; we're ok
         pre_timer_base = self.window_base
-        time.sleep(TIMER_SLEEP_INTERVAL)
+        time.sleep(self.timeout)
         if self.window_base > pre_timer_base:
             return
 
+        # zero receive window: probe with one packet (not a congestion signal)
+        if self.peer_rwnd == 0:
+            with self.buffer_lock:
+                if self.buffer:
+                    label = self.window_base - self.transfer_first(self.window_base)
+                    logger.info(f"packet{label} window probe")
+                    self.track_sent(self.window_base)
+                    self.send(self.buffer[0], self.window_base, True)
+                    self.next_seq_num = max(self.next_seq_num, self.window_base + 1)
+            return
+
         # handle resend logic (send whats remaining in window)
-        logger.info(f"packet{self.window_base} timeout")
         with self.buffer_lock:
-            # window_base and next_seq_num are constantly inc thus we get relative position
-            messages_to_send = self.buffer[0 : self.next_seq_num - self.window_base]
+            label = self.window_base - self.transfer_first(self.window_base)
+        logger.info(f"packet{label} timeout")
+        self.tracer.record(eventtrace.TIMEOUT, self.window_base, self.peer_port)
+        if self.congestion:
+            self.congestion.on_timeout()
+            self.tracer.record(eventtrace.WINDOW, self.effective_window())
+        with self.buffer_lock:
+            # window_base and next_seq_num are constantly inc thus we get relative
+            # position (a window shrunk by congestion control only resends what it
+            # allows)
+            resend_count = min(
+                self.next_seq_num - self.window_base, self.effective_window()
+            )
+            messages_to_send = self.buffer[0:resend_count]
+            self.next_seq_num = self.window_base + resend_count
             packet_seq_num = self.window_base
             for packet in messages_to_send:
-                self.send(packet, packet_seq_num)
-                logger.info(f"packet{packet_seq_num} {packet} sent")
+                self.send(packet, packet_seq_num, True)
+                label = packet_seq_num - self.transfer_first(packet_seq_num)
+                logger.info(f"packet{label} {self.describe(packet)} sent")
+                self.tracer.record(
+                    eventtrace.RETRANSMIT, packet_seq_num, self.peer_port, len(packet)
+                )
                 packet_seq_num += 1
+            self.send_ready.notify_all()
 
     def handle_command(self, user_input):
         """Parses user plaintext and sends to proper destination."""
@@ -254,17 +760,36 @@ class GenericGBNode:
         if re.match("send (.*)", user_input):
             # Push to queue
             message = " ".join(user_input.split(" ")[1:])
-            self.total_message = message
-            packets = list(message)
+            if not message:
+                return
+            # queued behind (and pipelined with) any transfer still in flight
             with self.buffer_lock:
-                self.buffer.extend(packets)
+                self.queue_transfer(list(message), message)
         else:
             logger.info(f"Unknown command `{user_input}`.")
 
 
 class GBNode:
-    def __init__(self, port, peer_port, window_size, mode, mode_value):
+    def __init__(
+        self,
+        port,
+        peer_port,
+        window_size,
+        mode,
+        mode_value,
+        source=None,
+        sink=None,
+        congestion_control=False,
+        loss_model=None,
+        fec_k=0,
+        receive_window=RECEIVE_WINDOW,
+        transport=None,
+    ):
         self.stop_event = Event()
+        # `-f` file (or `-` for stdin) to stream instead of reading commands
+        self.source = source
+        # `-o` file that a received stream is written to
+        self.sink = open(sink, "wb") if sink else None
         self.node = GenericGBNode(
             port,
             peer_port,
@@ -274,10 +799,15 @@ class GBNode:
             self.stop_event,
             self.on_send,
             self.on_stats,
+            self.sink,
+            congestion_control,
+            loss_model=loss_model,
+            fec_k=fec_k,
+            receive_window=receive_window,
         )
 
         self.client = SocketClient(
-            port, self.stop_event, self.node.demux_incoming_message
+            port, self.stop_event, self.node.demux_incoming_message, transport=transport
         )
 
     def on_stats(self, message, metadata):
@@ -296,14 +826,34 @@ class GBNode:
         # start outbound send timer listener
         Thread(target=self.node.sender_timer).start()
 
+    def stream_source(self):
+        """Streams the `-f` source and waits for the peer's stats."""
+        self.node.stream(read_chunks(self.source, STREAM_CHUNK_SIZE))
+        while not self.stop_event.is_set():
+            if self.node.transfer_done.wait(TIMER_SLEEP_INTERVAL):
+                break
+        self.stop_event.set()
+
     @handles_signal
     def start(self):
         """Start threads, and listen for input."""
         self.start_gbn_threads()
-        # User input parsing (root of GBN sending)
-        while not self.stop_event.is_set():
-            user_input = input(f"node> ")
-            self.node.handle_command(user_input)
+        try:
+            if self.source:
+                self.stream_source()
+                return
+            # Receive only when writing a stream to file
+            if self.sink:
+                while not self.stop_event.wait(TIMER_SLEEP_INTERVAL):
+                    pass
+                return
+            # User input parsing (root of GBN sending)
+            while not self.stop_event.is_set():
+                user_input = input(f"node> ")
+                self.node.handle_command(user_input)
+        finally:
+            if self.sink:
+                self.sink.close()
 
 
 def parse_args(args):
@@ -343,15 +893,67 @@ def parse_mode(args):
     return mode, float(mode_value)
 
 
+def parse_options(args):
+    """Validate optional stream, congestion control and loss model flags."""
+    if len(args) % 2 != 0:
+        raise InvalidArgException("options must be in pairs of 2: `<flag> <value>`")
+    options = {}
+    for flag, value in zip(args[::2], args[1::2]):
+        if flag == "-f":
+            if value != "-" and not os.path.isfile(value):
+                raise InvalidArgException(f"Invalid -f <file>: {value}; No such file")
+            options["source"] = value
+        elif flag == "-o":
+            options["sink"] = value
+        elif flag == "-c":
+            if value != "aimd" and value != "fixed":
+                raise InvalidArgException(f"-c <value> must be `aimd` or `fixed`")
+            options["congestion_control"] = value == "aimd"
+        elif flag == "-k":
+            if not value.isdigit() or int(value) < 1:
+                raise InvalidArgException(f"-k <value> must be a positive digit")
+            options["fec_k"] = int(value)
+        elif flag == "-s":
+            options["seed"] = value
+        elif flag == "-l":
+            options["spec"] = value
+        elif flag == "-i":
+            options["impairment"] = value
+        elif flag == "-r":
+            if not value.isdigit() or int(value) < 1:
+                raise InvalidArgException(f"-r <packets> must be a positive digit")
+            options["receive_window"] = int(value)
+        else:
+            raise InvalidArgException(f"{flag} is not a valid option")
+    return options
+
+
 def parse_mode_and_go():
     """Validate root mode args: `-d` or `-p`."""
     args = parse_help_message(gbn_help_message)
     # validate common base args
     self_port, peer_port, window_size = parse_args(args[:3])
     # valid deterministic or probabilistic args
-    mode, mode_value = parse_mode(args[3:])
+    mode, mode_value = parse_mode(args[3:5])
+    # optional streaming flags
+    options = parse_options(args[5:])
+    # seeded drop/delay model from `-p`/`-d` (or `-l`), `-s` and `-i`
+    loss_options = {
+        key: options.pop(key)
+        for key in ["seed", "spec", "impairment"]
+        if key in options
+    }
+    loss_model = build_loss_model(mode, mode_value, self_port, **loss_options)
     # Construct main GBN sender class
-    sender = GBNode(self_port, peer_port, window_size, mode, mode_value)
+    sender = GBNode(
+        self_port,
+        peer_port,
+        window_size,
+        mode,
+        mode_value,
+        loss_model=loss_model,
+        **options,
+    )
     # Listen for input and send to peer
     sender.start()
 
@@ -362,6 +964,13 @@ if __name__ == "__main__":
     Example usage:
     $ clear && python src/gbnnode.py 5000 5001 1 -p 0.5
     $ clear && python src/gbnnode.py 5001 5000 1 -p 0.5
+
+    Reproducible bursty loss with 5ms delay, 2ms jitter and 1% reordering:
+    $ clear && python src/gbnnode.py 5000 5001 5 -p 0 -s 7 -l ge:0.05,0.5 -i 5,2,0.01
+
+    Streaming a file:
+    $ clear && python src/gbnnode.py 5001 5000 10 -p 0.01 -o out.bin
+    $ clear && python src/gbnnode.py 5000 5001 10 -p 0.01 -f in.bin
     """
     try:
         parse_mode_and_go()
@@ -0,0 +1,195 @@
+import os
+import random
+from abc import ABC, abstractmethod
+
+from utils import InvalidArgException
+
+# optional base seed so every node (gbnnode, cnnode, bench emulators) is reproducible
+SEED_ENV = "PA2_SEED"
+# extra hold applied to reordered packets when no delay/jitter is configured
+REORDER_HOLD = 10 / 1000
+
+
+def salt_seed(seed, *salt):
+    """Per node seed derived from a base seed (None stays unseeded)."""
+    if seed is None:
+        return None
+    return "-".join([str(seed), *[str(s) for s in salt]])
+
+
+def seed_from_env(*salt):
+    """Per node seed derived from `PA2_SEED` (None when unset)."""
+    return salt_seed(os.environ.get(SEED_ENV), *salt)
+
+
+class LossModel(ABC):
+    """Decides whether a packet is dropped and how long it's held back."""
+
+    def __init__(self, seed=None, delay=0, jitter=0, reorder=0):
+        # drops and impairments draw from separate streams so enabling delay
+        # doesn't change which packets get dropped for the same seed
+        self.random = random.Random(seed)
+        self.impair_random = random.Random(None if seed is None else f"{seed}-impair")
+        self.delay = delay
+        self.jitter = jitter
+        self.reorder = reorder
+
+    @abstractmethod
+    def should_drop(self, pack_num):
+        """Whether the packet numbered `pack_num` (None if unnumbered) is dropped."""
+
+    def reset(self):
+        """Called when a GBN session (and its packet numbering) starts over."""
+        pass
+
+    def is_impaired(self):
+        """Whether incoming packets are delayed, jittered or reordered at all."""
+        return bool(self.delay or self.jitter or self.reorder)
+
+    def delay_for(self):
+        """Seconds to hold an incoming packet."""
+        if not self.is_impaired():
+            return 0
+        delay = self.delay + self.impair_random.uniform(0, self.jitter)
+        # reordered packets are held long enough for later ones to overtake
+        if self.reorder and self.impair_random.random() < self.reorder:
+            delay += max(self.delay + self.jitter, REORDER_HOLD)
+        return delay
+
+
+class BernoulliLoss(LossModel):
+    """`-p`: each packet is independently dropped with `probability`."""
+
+    def __init__(self, probability, **kwargs):
+        super().__init__(**kwargs)
+        self.probability = probability
+
+    def should_drop(self, pack_num):
+        return self.random.random() < self.probability
+
+
+class NthLoss(LossModel):
+    """`-d`: every nth packet number is dropped, but only the first time it's seen."""
+
+    def __init__(self, n, **kwargs):
+        super().__init__(**kwargs)
+        self.n = int(n)
+        self.dropped_packet_numbers = set()
+
+    def should_drop(self, pack_num):
+        # parity/control packets without a number are never dropped deterministically
+        if pack_num is None or self.n == 0:
+            return False
+        is_drop_index = pack_num % self.n == 0 and pack_num != 0
+        if not is_drop_index or pack_num in self.dropped_packet_numbers:
+            return False
+        self.dropped_packet_numbers.add(pack_num)
+        return True
+
+    def reset(self):
+        self.dropped_packet_numbers = set()
+
+
+class GilbertElliottLoss(LossModel):
+    """Two state (good/bad) Markov chain producing bursty loss."""
+
+    def __init__(
+        self, p_good_to_bad, p_bad_to_good, loss_good=0, loss_bad=1, **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.p_good_to_bad = p_good_to_bad
+        self.p_bad_to_good = p_bad_to_good
+        self.loss_good = loss_good
+        self.loss_bad = loss_bad
+        self.is_bad = False
+
+    def should_drop(self, pack_num):
+        # transition first, then drop with the loss rate of the new state
+        if self.is_bad:
+            self.is_bad = self.random.random() >= self.p_bad_to_good
+        else:
+            self.is_bad = self.random.random() < self.p_good_to_bad
+        loss = self.loss_bad if self.is_bad else self.loss_good
+        return self.random.random() < loss
+
+
+class TraceLoss(LossModel):
+    """Replays a recorded drop pattern of `0`/`1` chars (1 drops), looping at EOF."""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.pattern = load_trace(path)
+        self.index = 0
+
+    def should_drop(self, pack_num):
+        drop = self.pattern[self.index % len(self.pattern)]
+        self.index += 1
+        return drop
+
+
+def load_trace(path):
+    """Parses a drop trace, ignoring whitespace and `#` comment lines."""
+    pattern = []
+    with open(path) as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            pattern.extend(char == "1" for char in line if char in "01")
+    if len(pattern) == 0:
+        raise InvalidArgException(f"Invalid loss trace: {path}; No 0/1 entries")
+    return pattern
+
+
+def create_loss_model(mode, mode_value, seed=None, **kwargs):
+    """Loss model matching the classic `-p`/`-d` flags."""
+    if mode == "-p":
+        return BernoulliLoss(mode_value, seed=seed, **kwargs)
+    return NthLoss(mode_value, seed=seed, **kwargs)
+
+
+def parse_floats(values, name):
+    try:
+        return [float(value) for value in values.split(",")]
+    except ValueError:
+        raise InvalidArgException(f"Invalid {name}: {values}; Must be valid numbers")
+
+
+def parse_loss_spec(spec, seed=None, **kwargs):
+    """Parses `-l` specs: `p:<prob>`, `d:<n>`, `ge:<p_gb>,<p_bg>[,..]`, `trace:<f>`."""
+    kind, _, values = spec.partition(":")
+    if kind == "trace":
+        if not os.path.isfile(values):
+            raise InvalidArgException(f"Invalid loss trace: {values}; No such file")
+        return TraceLoss(values, seed=seed, **kwargs)
+    params = parse_floats(values, f"-l {kind}")
+    if kind == "p" and len(params) == 1:
+        return BernoulliLoss(params[0], seed=seed, **kwargs)
+    if kind == "d" and len(params) == 1:
+        return NthLoss(params[0], seed=seed, **kwargs)
+    if kind == "ge" and len(params) in (2, 4):
+        return GilbertElliottLoss(*params, seed=seed, **kwargs)
+    raise InvalidArgException(
+        f"Invalid -l <spec>: {spec}; Expecting p:<prob>, d:<n>, "
+        "ge:<p_gb>,<p_bg>[,<loss_good>,<loss_bad>] or trace:<file>"
+    )
+
+
+def parse_impairment(values):
+    """Parses `-i <delay-ms>[,<jitter-ms>[,<reorder-prob>]]` into LossModel kwargs."""
+    params = parse_floats(values, "-i")
+    if len(params) > 3:
+        raise InvalidArgException(
+            f"Invalid -i: {values}; Expecting <delay-ms>[,<jitter-ms>[,<reorder-prob>]]"
+        )
+    delay, jitter, reorder = params + [0] * (3 - len(params))
+    return {"delay": delay / 1000, "jitter": jitter / 1000, "reorder": reorder}
+
+
+def build_loss_model(mode, mode_value, port, seed=None, spec=None, impairment=None):
+    """Node loss model from `-p`/`-d` or `-l`, seeded by `-s` or `PA2_SEED`."""
+    # salted with the port so two nodes given the same `-s` don't drop in lockstep
+    seed = salt_seed(seed if seed is not None else os.environ.get(SEED_ENV), port)
+    kwargs = parse_impairment(impairment) if impairment else {}
+    if spec:
+        return parse_loss_spec(spec, seed, **kwargs)
+    return create_loss_model(mode, mode_value, seed, **kwargs)
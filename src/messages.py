@@ -12,6 +12,15 @@ Options:
     <self-port>: Sender port
     <peer-port>: Reciever port
     <window-size>: Size of GBN window
+    -f <file>: Stream a file through the window (`-` reads stdin)
+    -o <file>: Write a received stream to file
+    -c <aimd|fixed>: Adapt the window with AIMD (bounded by <window-size>)
+    -k <k>: Send an XOR parity packet every <k> packets (code rate k/(k+1))
+    -s <seed>: Seed the drop/delay RNG (defaults to $PA2_SEED)
+    -l <spec>: Loss model overriding -p/-d: p:<prob>, d:<n>,
+               ge:<p_gb>,<p_bg>[,<loss_good>,<loss_bad>] or trace:<file>
+    -i <delay-ms>[,<jitter-ms>[,<reorder-prob>]]: Delay/reorder incoming packets
+    -r <packets>: Receive buffer advertised to the sender (flow control)
 
 Usage:
     GbNode [flags] [options]"""
@@ -21,6 +30,7 @@ dv_help_message = """Dvnode constructs a bellman-ford based distance vector for
 
 Flags:
     last:   Last node information in network.
+    forward: Read `send <dst-port> <message>` commands and relay data along routes.
 
 Options:
     <local-port>: Listening port
@@ -62,3 +72,21 @@ def get_stats_message(dropped_packets, total_packets):
     """Prints stats message on both ends based on GBN loss data."""
     loss = dropped_packets / total_packets
     return f"[Summary] {dropped_packets}/{total_packets} packets discarded, loss rate = {loss}%"
+
+
+def get_transfer_message(total_bytes, elapsed, sent_packets, retransmitted_packets):
+    """Prints goodput and retransmission ratio once a stream finishes."""
+    goodput = total_bytes / elapsed / 1_000_000 if elapsed else 0
+    ratio = retransmitted_packets / sent_packets if sent_packets else 0
+    return (
+        f"[Transfer] {total_bytes} bytes in {elapsed:.3f}s, "
+        f"goodput = {goodput:.3f} MB/s, retransmission ratio = {ratio:.3f}"
+    )
+
+
+def get_window_message(min_window, max_window, mean_window, window_changes):
+    """Prints the AIMD window trajectory summary for a finished transfer."""
+    return (
+        f"[Window] min = {min_window}, max = {max_window}, "
+        f"mean = {mean_window:.2f}, changes = {window_changes}"
+    )
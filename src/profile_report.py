@@ -0,0 +1,105 @@
+import sys
+import json
+from collections import Counter
+
+from utils import InvalidArgException
+
+# rows shown for the sampled stack summary
+TOP_FRAMES = 15
+
+
+def percentile(histogram, fraction):
+    """Upper bound of the bucket holding the `fraction` percentile."""
+    target = histogram["count"] * fraction
+    seen = 0
+    for bucket, count in histogram["buckets"].items():
+        seen += count
+        if seen >= target:
+            return min(2 ** int(bucket), histogram["max"])
+    return histogram["max"]
+
+
+def format_ns(ns):
+    if ns >= 1_000_000:
+        return f"{ns / 1_000_000:.2f}ms"
+    if ns >= 1_000:
+        return f"{ns / 1_000:.1f}us"
+    return f"{ns}ns"
+
+
+def print_histograms(title, histograms, formatter=format_ns):
+    """Prints count/mean/p50/p99/max per histogram, slowest total first."""
+    if not histograms:
+        return
+    print(f"\n{title}")
+    print(f"{'name':<36} {'count':>8} {'mean':>10} {'p50':>10} {'p99':>10} {'max':>10}")
+    ordered = sorted(histograms.items(), key=lambda item: -item[1]["total"])
+    for name, histogram in ordered:
+        mean = histogram["total"] / histogram["count"] if histogram["count"] else 0
+        columns = [
+            mean,
+            percentile(histogram, 0.5),
+            percentile(histogram, 0.99),
+            histogram["max"],
+        ]
+        formatted = " ".join(f"{formatter(int(value)):>10}" for value in columns)
+        print(f"{name:<36} {histogram['count']:>8} {formatted}")
+
+
+def print_counters(counters):
+    """Prints event counters (e.g. work queue drops), largest first."""
+    if not counters:
+        return
+    print("\nCounters")
+    for name, count in sorted(counters.items(), key=lambda item: -item[1]):
+        print(f"{name:<36} {count:>8}")
+
+
+def print_samples(path):
+    """Prints the frames most often on top of (self) and anywhere in (total) stacks."""
+    own, total, samples = Counter(), Counter(), 0
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            frames = stack.split(";")
+            samples += int(count)
+            own[frames[-1]] += int(count)
+            for frame in set(frames):
+                total[frame] += int(count)
+    print(f"\nSampled stacks ({samples} samples)")
+    print(f"{'frame':<60} {'self':>8} {'total':>8}")
+    for frame, count in own.most_common(TOP_FRAMES):
+        print(f"{frame:<60} {count / samples:>8.1%} {total[frame] / samples:>8.1%}")
+
+
+def report(profile_path, samples_path=None):
+    with open(profile_path) as f:
+        profile = json.load(f)
+    print(f"Profile of pid {profile['pid']}: {' '.join(profile['argv'])}")
+    print_histograms("Handler latency", profile["latencies"])
+    print_histograms("Lock wait", profile["lock_waits"])
+    print_histograms("Queue depth", profile["queue_depths"], str)
+    print_counters(profile.get("counters", {}))
+    if samples_path:
+        print_samples(samples_path)
+
+
+if __name__ == "__main__":
+    """Summarize a profile dump written on shutdown when `PA2_PROFILE` is set.
+
+    Example usage:
+    $ export PA2_PROFILE=/tmp/prof PA2_PROFILE_SAMPLE=5
+    $ python src/gbnnode.py 5000 5001 5 -p 0.1
+    $ python src/profile_report.py \
+        /tmp/prof/profile-1234.json /tmp/prof/samples-1234.txt
+    """
+    try:
+        args = sys.argv[1:]
+        if len(args) not in (1, 2):
+            raise InvalidArgException(
+                "only accepts <profile.json> and optionally <samples.txt>"
+            )
+        report(*args)
+    except InvalidArgException as e:
+        print(e)
+        sys.exit(1)
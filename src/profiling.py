@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import time
+import atexit
+import traceback
+from functools import wraps
+from collections import Counter
+from threading import Lock, Thread, Event, get_ident
+
+# directory for profile dumps; instrumentation is a no-op unless this is set
+PROFILE_ENV = "PA2_PROFILE"
+# optional sampling profiler interval in ms (all threads, dumped on shutdown)
+PROFILE_SAMPLE_ENV = "PA2_PROFILE_SAMPLE"
+
+
+class Histogram:
+    """Power of two bucketed histogram (bucket `b` holds values < 2**b)."""
+
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        self.buckets[int(value).bit_length()] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+            "buckets": {str(b): n for b, n in sorted(self.buckets.items())},
+        }
+
+
+class Sampler:
+    """Samples every thread's stack at an interval into collapsed stack counts."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self.stop_event = Event()
+
+    def start(self):
+        Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        own_ident = get_ident()
+        while not self.stop_event.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = traceback.extract_stack(frame)
+                frames = [f"{os.path.basename(f.filename)}:{f.name}" for f in stack]
+                self.stacks[";".join(frames)] += 1
+
+    def dump(self, path):
+        self.stop_event.set()
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Instrumentation:
+    """Collects handler latencies, lock waits, queue depths and counters (opt-in)."""
+
+    def __init__(self, directory=None, sample_interval=None):
+        self.directory = directory
+        self.enabled = directory is not None
+        self.lock = Lock()
+        # name -> Histogram (latencies/lock waits are in ns, depths are counts)
+        self.latencies = {}
+        self.lock_waits = {}
+        self.queue_depths = {}
+        self.counters = Counter()
+        self.sampler = Sampler(sample_interval) if sample_interval else None
+
+    def start(self):
+        """Starts the sampler and registers the shutdown dump."""
+        os.makedirs(self.directory, exist_ok=True)
+        if self.sampler:
+            self.sampler.start()
+        atexit.register(self.dump)
+
+    def record(self, histograms, name, value):
+        with self.lock:
+            if name not in histograms:
+                histograms[name] = Histogram()
+            histograms[name].record(value)
+
+    def record_latency(self, name, ns):
+        self.record(self.latencies, name, ns)
+
+    def record_lock_wait(self, name, ns):
+        self.record(self.lock_waits, name, ns)
+
+    def record_depth(self, name, depth):
+        if self.enabled:
+            self.record(self.queue_depths, name, depth)
+
+    def record_count(self, name, count=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] += count
+
+    def dump(self):
+        """Writes `profile-<pid>.json` (and `samples-<pid>.txt`) to the directory."""
+        pid = os.getpid()
+        with self.lock:
+            data = {
+                "pid": pid,
+                "argv": sys.argv,
+                "dumped_at": time.time(),
+                "latencies": {n: h.to_dict() for n, h in self.latencies.items()},
+                "lock_waits": {n: h.to_dict() for n, h in self.lock_waits.items()},
+                "queue_depths": {n: h.to_dict() for n, h in self.queue_depths.items()},
+                "counters": dict(self.counters),
+            }
+        with open(os.path.join(self.directory, f"profile-{pid}.json"), "w") as f:
+            json.dump(data, f, indent=2)
+        if self.sampler:
+            self.sampler.dump(os.path.join(self.directory, f"samples-{pid}.txt"))
+
+
+class InstrumentedLock:
+    """Lock wrapper recording how long each acquire waited."""
+
+    def __init__(self, lock, name):
+        self.lock = lock
+        self.name = name
+
+    def acquire(self, blocking=True, timeout=-1):
+        started = time.perf_counter_ns()
+        acquired = self.lock.acquire(blocking, timeout)
+        instrumentation.record_lock_wait(self.name, time.perf_counter_ns() - started)
+        return acquired
+
+    def release(self):
+        self.lock.release()
+
+    def locked(self):
+        return self.lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *_args):
+        self.release()
+
+
+def create_instrumentation():
+    """Instrumentation configured from `PA2_PROFILE`/`PA2_PROFILE_SAMPLE`."""
+    directory = os.environ.get(PROFILE_ENV)
+    sample_ms = os.environ.get(PROFILE_SAMPLE_ENV)
+    sample_interval = float(sample_ms) / 1000 if directory and sample_ms else None
+    created = Instrumentation(directory, sample_interval)
+    if created.enabled:
+        created.start()
+    return created
+
+
+instrumentation = create_instrumentation()
+
+
+def instrumented(name):
+    """Records per call latency of the method under `name` when profiling is on."""
+
+    def decorator(method):
+        # resolved at import so disabled instrumentation costs nothing per call
+        if not instrumentation.enabled:
+            return method
+
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter_ns() - started
+                instrumentation.record_latency(name, elapsed)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_lock(lock, name):
+    """Wraps `lock` to record wait times when profiling is on."""
+    if not instrumentation.enabled:
+        return lock
+    return InstrumentedLock(lock, name)
@@ -0,0 +1,143 @@
+import os
+import sys
+import mmap
+import time
+import zlib
+import struct
+from collections import namedtuple
+
+# directory for routing snapshots; nodes neither load nor save unless this is set
+SNAPSHOT_ENV = "PA2_SNAPSHOT_DIR"
+SNAPSHOT_MAGIC = b"PA2S"
+SNAPSHOT_VERSION = 2
+# seconds between periodic snapshots
+SNAPSHOT_INTERVAL = 5
+# magic, version, node port, saved at, neighbor vector count
+HEADER = struct.Struct("<4sHHdI")
+# destination, loss, hop count (followed by `hop count` uint16 ports)
+ROUTE = struct.Struct("<HdB")
+# neighbor port, route count (followed by that many routes)
+NEIGHBOR = struct.Struct("<HI")
+# crc32 of everything before it
+TRAILER = struct.Struct("<I")
+
+# the table itself is rebuilt from these vectors and the CLI links on load
+Snapshot = namedtuple("Snapshot", ["port", "saved_at", "neighbor_vectors"])
+
+
+def path_for(port):
+    """Snapshot file for a node port, configured from `PA2_SNAPSHOT_DIR`."""
+    directory = os.environ.get(SNAPSHOT_ENV)
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"node-{port}.snap")
+
+
+def pack_routes(vector):
+    """Packs a `{ port: {loss, hops} }` vector (keys may be str, as on the wire)."""
+    parts = []
+    for port, route in vector.items():
+        hops = route.get("hops") or []
+        parts.append(ROUTE.pack(int(port), float(route["loss"]), len(hops)))
+        parts.append(struct.pack(f"<{len(hops)}H", *hops))
+    return parts
+
+
+def unpack_routes(buffer, offset, count):
+    """(vector, next offset) for `count` routes starting at `offset`."""
+    vector = {}
+    for _ in range(count):
+        port, loss, hop_count = ROUTE.unpack_from(buffer, offset)
+        offset += ROUTE.size
+        hops = list(struct.unpack_from(f"<{hop_count}H", buffer, offset))
+        offset += 2 * hop_count
+        vector[port] = {"loss": loss, "hops": hops}
+    return vector, offset
+
+
+def encode_snapshot(port, neighbor_vectors):
+    """Binary snapshot of the last vector received from each neighbor."""
+    parts = [
+        HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION, port, time.time(), len(neighbor_vectors)
+        )
+    ]
+    for neighbor, vector in neighbor_vectors.items():
+        parts.append(NEIGHBOR.pack(neighbor, len(vector)))
+        parts += pack_routes(vector)
+    body = b"".join(parts)
+    return body + TRAILER.pack(zlib.crc32(body))
+
+
+def decode_snapshot(buffer):
+    """Parses a snapshot buffer (bytes or mmap); raises ValueError when invalid."""
+    if len(buffer) < HEADER.size + TRAILER.size:
+        raise ValueError("snapshot is truncated")
+    body_size = len(buffer) - TRAILER.size
+    (crc,) = TRAILER.unpack_from(buffer, body_size)
+    if zlib.crc32(buffer[:body_size]) != crc:
+        raise ValueError("snapshot checksum mismatch")
+    header = HEADER.unpack_from(buffer, 0)
+    magic, version, port, saved_at, neighbors = header
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f"not a v{SNAPSHOT_VERSION} snapshot")
+
+    offset = HEADER.size
+    neighbor_vectors = {}
+    for _ in range(neighbors):
+        neighbor, count = NEIGHBOR.unpack_from(buffer, offset)
+        vector, offset = unpack_routes(buffer, offset + NEIGHBOR.size, count)
+        # neighbor vectors keep str keys, like decoded DV messages
+        neighbor_vectors[neighbor] = {str(k): v for k, v in vector.items()}
+    return Snapshot(port, saved_at, neighbor_vectors)
+
+
+def write_snapshot(path, port, neighbor_vectors):
+    """Atomically replaces `path` (tmp file, fsync, rename); crashes never tear it."""
+    data = encode_snapshot(port, neighbor_vectors)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    # persist the rename itself
+    directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+    return len(data)
+
+
+def read_snapshot(path):
+    """Memory-maps and parses a snapshot; None when missing or invalid."""
+    try:
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return decode_snapshot(mapped)
+    except (OSError, ValueError, struct.error):
+        # missing, empty or corrupt snapshots mean a cold start
+        return None
+
+
+if __name__ == "__main__":
+    """Prints a snapshot file.
+
+    Example usage:
+    $ python src/snapshot.py /tmp/snap/node-1024.snap
+    """
+    if len(sys.argv) != 2:
+        print("usage: python src/snapshot.py <snapshot-file>")
+        sys.exit(1)
+    saved = read_snapshot(sys.argv[1])
+    if saved is None:
+        print(f"{sys.argv[1]} is missing or not a valid snapshot")
+        sys.exit(1)
+    print(f"Node {saved.port} saved {time.time() - saved.saved_at:.1f}s ago")
+    for neighbor, vector in saved.neighbor_vectors.items():
+        print(f"Vector from Node {neighbor}: {len(vector)} routes")
+        for port, route in vector.items():
+            hops = " ; ".join(f"Next hop -> {hop}" for hop in route["hops"])
+            print(f"- ({route['loss']}) -> Node {port}{'; ' + hops if hops else ''}")
@@ -0,0 +1,234 @@
+import sys
+import statistics
+from collections import Counter, defaultdict
+
+from utils import InvalidArgException
+import eventtrace
+
+trace_help_message = """Trace report summarizes event traces recorded with `PA2_TRACE`.
+
+Flags:
+    --diagram <n>   Sequence diagram of the first <n> packet events
+    --rtt           RTT curve per node (mean RTT per time bucket)
+    --window        Window size curve per node
+    --dv            Distance vector convergence timeline
+
+Options:
+    <trace>: One or more `node-<port>.trace` files
+
+Usage:
+    trace_report [flags] <trace>..."""
+
+LANE_WIDTH = 24
+# time buckets the RTT curve is averaged over
+RTT_BUCKETS = 20
+PACKET_EVENTS = {
+    eventtrace.SENT: "sent {seq} -->",
+    eventtrace.RETRANSMIT: "resent {seq} -->",
+    eventtrace.RECEIVED: "--> recv {seq}",
+    eventtrace.DISCARDED: "x discard {seq}",
+    eventtrace.DROPPED: "x drop {seq}",
+    eventtrace.ACK_SENT: "<-- ack {seq}",
+    eventtrace.ACK_RECEIVED: "ack {seq} <--",
+    eventtrace.ACK_DISCARDED: "x ack discard {seq}",
+    eventtrace.ACK_DROPPED: "x ack drop {seq}",
+    eventtrace.TIMEOUT: "timeout {seq}",
+}
+
+
+def load_traces(paths):
+    """Merges trace files into one time ordered list of event tuples."""
+    events = []
+    for path in paths:
+        try:
+            events.extend(eventtrace.read_trace(path))
+        except (OSError, ValueError) as e:
+            raise InvalidArgException(f"Invalid <trace>: {path}; {e}")
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def ms_since(start, timestamp):
+    return (timestamp - start) / 1_000_000
+
+
+def print_summary(events):
+    """Event counts, retransmissions and bytes sent per node."""
+    counts = defaultdict(Counter)
+    sent_bytes = Counter()
+    for _ts, node, event, _seq, _peer, size in events:
+        counts[node][event] += 1
+        if event in (eventtrace.SENT, eventtrace.RETRANSMIT):
+            sent_bytes[node] += size
+    duration = ms_since(events[0][0], events[-1][0])
+    print(f"{len(events)} events over {duration:.3f}ms")
+    for node in sorted(counts):
+        node_counts = counts[node]
+        sent = node_counts[eventtrace.SENT] + node_counts[eventtrace.RETRANSMIT]
+        ratio = node_counts[eventtrace.RETRANSMIT] / sent if sent else 0
+        print(
+            f"\nNode {node}: {sent} packets sent ({sent_bytes[node]} bytes), "
+            f"{node_counts[eventtrace.RETRANSMIT]} retransmitted ({ratio:.1%})"
+        )
+        for event, count in sorted(node_counts.items()):
+            print(f"  {eventtrace.EVENT_NAMES[event]:<14} {count}")
+
+
+def rtt_samples(events):
+    """Per node (ACK timestamp, RTT ms) from first send to ACK, Karn filtered."""
+    samples = defaultdict(list)
+    sent_at = defaultdict(dict)
+    retransmitted = defaultdict(set)
+    highest_sent = {}
+    for ts, node, event, seq, _peer, _size in events:
+        if event == eventtrace.SENT:
+            # first sends only go backwards when a new session starts over
+            if seq <= highest_sent.get(node, -1):
+                sent_at[node].clear()
+                retransmitted[node].clear()
+            highest_sent[node] = seq
+            sent_at[node][seq] = ts
+        elif event == eventtrace.RETRANSMIT:
+            # Karn's rule: an ACK for a resent packet is ambiguous
+            retransmitted[node].add(seq)
+        elif event == eventtrace.ACK_RECEIVED:
+            if seq in sent_at[node] and seq not in retransmitted[node]:
+                samples[node].append((ts, ms_since(sent_at[node][seq], ts)))
+    return samples
+
+
+def print_rtts(events):
+    samples = rtt_samples(events)
+    if not samples:
+        return
+    print("\nRTT (ms)")
+    columns = ["samples", "mean", "p50", "p99", "max"]
+    print(f"{'node':<8} {columns[0]:>8} " + " ".join(f"{c:>10}" for c in columns[1:]))
+    for node in sorted(samples):
+        values = sorted(rtt for _ts, rtt in samples[node])
+        p99 = values[min(int(len(values) * 0.99), len(values) - 1)]
+        columns = [statistics.mean(values), statistics.median(values), p99, values[-1]]
+        formatted = " ".join(f"{value:>10.3f}" for value in columns)
+        print(f"{node:<8} {len(values):>8} {formatted}")
+
+
+def print_rtt_curve(events, buckets=RTT_BUCKETS):
+    """Mean RTT per node over equal time buckets of the trace."""
+    samples = rtt_samples(events)
+    if not samples:
+        return
+    start = events[0][0]
+    width = max(ms_since(start, events[-1][0]) / buckets, 1e-3)
+    print("\nRTT curve (ms: mean RTT ms (samples))")
+    for node in sorted(samples):
+        bucketed = defaultdict(list)
+        for ts, rtt in samples[node]:
+            bucketed[min(int(ms_since(start, ts) / width), buckets - 1)].append(rtt)
+        points = ", ".join(
+            f"{bucket * width:.1f}: {statistics.mean(rtts):.3f} ({len(rtts)})"
+            for bucket, rtts in sorted(bucketed.items())
+        )
+        print(f"Node {node}: {points}")
+
+
+def print_window_curve(events):
+    """Window size changes per node (AIMD runs only)."""
+    start = events[0][0]
+    curves = defaultdict(list)
+    for ts, node, event, seq, _peer, _size in events:
+        if event == eventtrace.WINDOW:
+            curves[node].append((ms_since(start, ts), seq))
+    print("\nWindow curve (ms: window)")
+    for node in sorted(curves):
+        points = ", ".join(f"{t:.1f}: {size}" for t, size in curves[node])
+        print(f"Node {node}: {points}")
+
+
+def print_dv_timeline(events):
+    """When each node's table changed and when the whole network went quiet."""
+    start = events[0][0]
+    updates = [event for event in events if event[2] == eventtrace.DV_UPDATED]
+    messages = Counter(event[1] for event in events if event[2] == eventtrace.DV_SENT)
+    print("\nDV timeline (ms)")
+    for ts, node, _event, seq, _peer, _size in updates:
+        print(f"{ms_since(start, ts):>10.3f}  Node {node} table updated ({seq} routes)")
+    if updates:
+        converged = ms_since(start, updates[-1][0])
+        print(
+            f"Converged after {converged:.3f}ms, "
+            f"{sum(messages.values())} DV messages sent"
+        )
+
+
+def print_diagram(events, limit):
+    """ASCII sequence diagram with one lane per node."""
+    start = events[0][0]
+    nodes = sorted({event[1] for event in events})
+    print("\n" + f"{'ms':>10} | " + " | ".join(f"{n:<{LANE_WIDTH}}" for n in nodes))
+    shown = 0
+    for ts, node, event, seq, _peer, _size in events:
+        if event not in PACKET_EVENTS:
+            continue
+        label = PACKET_EVENTS[event].format(seq=seq)
+        lanes = [label if n == node else "" for n in nodes]
+        lanes_text = " | ".join(f"{lane:<{LANE_WIDTH}}" for lane in lanes)
+        print(f"{ms_since(start, ts):>10.3f} | {lanes_text}")
+        shown += 1
+        if shown >= limit:
+            break
+
+
+def parse_args(args):
+    """Validates flags and trace paths."""
+    if len(args) == 0:
+        raise InvalidArgException(trace_help_message)
+    options = {"diagram": 0, "rtt": False, "window": False, "dv": False, "paths": []}
+    args = list(args)
+    while args:
+        arg = args.pop(0)
+        if arg == "--diagram":
+            if not args or not args[0].isdigit():
+                raise InvalidArgException("--diagram only accepts <n>")
+            options["diagram"] = int(args.pop(0))
+        elif arg == "--rtt":
+            options["rtt"] = True
+        elif arg == "--window":
+            options["window"] = True
+        elif arg == "--dv":
+            options["dv"] = True
+        else:
+            options["paths"].append(arg)
+    if not options["paths"]:
+        raise InvalidArgException("Specify at least one <trace>")
+    return options
+
+
+def report(options):
+    events = load_traces(options["paths"])
+    if not events:
+        print("No events recorded.")
+        return
+    print_summary(events)
+    print_rtts(events)
+    if options["rtt"]:
+        print_rtt_curve(events)
+    if options["window"]:
+        print_window_curve(events)
+    if options["dv"]:
+        print_dv_timeline(events)
+    if options["diagram"]:
+        print_diagram(events, options["diagram"])
+
+
+if __name__ == "__main__":
+    """Analyze packet event traces offline.
+
+    Example usage:
+    $ PA2_TRACE=/tmp/trace python src/gbnnode.py 5000 5001 5 -p 0.1 -c aimd
+    $ python src/trace_report.py --rtt --window /tmp/trace/node-*.trace
+    """
+    try:
+        report(parse_args(sys.argv[1:]))
+    except InvalidArgException as e:
+        print(e)
+        sys.exit(1)
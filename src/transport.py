@@ -0,0 +1,385 @@
+import os
+import time
+import atexit
+import fcntl
+import select
+import socket
+import struct
+import tempfile
+from abc import ABC, abstractmethod
+from threading import Lock
+from multiprocessing import shared_memory, resource_tracker
+
+# transport backend for a node: `udp` (default), `unix` or `shm`
+TRANSPORT_ENV = "PA2_TRANSPORT"
+# directory for unix socket and shared memory lock files (defaults to the tmp dir)
+TRANSPORT_DIR_ENV = "PA2_TRANSPORT_DIR"
+# address reported for senders on the host-local backends
+LOCAL_IP = "127.0.0.1"
+
+RING_MAGIC = b"PA2R"
+RING_VERSION = 1
+# bytes of datagram space in each node's inbox ring
+RING_CAPACITY = 1024 * 1024
+# magic, version, closed flag (set once the owner stops or a new owner took over),
+# data capacity (segments may be rounded up to a page size)
+RING_HEADER = struct.Struct("<4sHBxI")
+RING_CLOSED_OFFSET = 6
+# read/write positions are free running byte counts on their own cache lines
+RING_HEAD_OFFSET = 64
+RING_TAIL_OFFSET = 128
+RING_DATA_OFFSET = 192
+# sender port, datagram length (records are padded to 8 bytes)
+RING_RECORD = struct.Struct("<HI")
+# record length marking the rest of the ring as unused, continue at the start
+RING_WRAP = 0xFFFFFFFF
+# how long a unix sender retries while the peer's queue is full (the kernel
+# only queues `net.unix.max_dgram_qlen` datagrams, 10 by default)
+UNIX_SEND_TIMEOUT = 5 / 1000
+# an empty ring is polled without sleeping (only yielding the GIL) this long,
+# then with sleeps backing off from the min to the max
+POLL_SPIN = 200 / 1_000_000
+POLL_MIN = 50 / 1_000_000
+POLL_MAX = 1 / 1000
+
+
+def transport_directory():
+    """Directory for unix sockets and ring lock files, from `PA2_TRANSPORT_DIR`."""
+    directory = os.environ.get(TRANSPORT_DIR_ENV) or tempfile.gettempdir()
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+class Transport(ABC):
+    """Datagram endpoint bound to a node port.
+
+    Handlers reply through `sendto(data, (ip, port))`, so every backend keeps the
+    socket signature (the host-local backends ignore the ip).
+    """
+
+    @abstractmethod
+    def bind(self, port):
+        """Starts receiving datagrams addressed to `port`."""
+
+    @abstractmethod
+    def receive(self, timeout, bufsize):
+        """(data, (sender ip, sender port)) or None when nothing arrived in time."""
+
+    @abstractmethod
+    def sendto(self, data, address):
+        """Sends one datagram to the node at `address` (ip, port)."""
+
+    def close(self):
+        pass
+
+
+class UDPTransport(Transport):
+    """AF_INET datagrams (works across hosts)."""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def bind(self, port):
+        self.sock.bind(("", port))
+
+    def receive(self, timeout, bufsize):
+        readables, _, _ = select.select([self.sock], [], [], timeout)
+        if not readables:
+            return None
+        return self.sock.recvfrom(bufsize)
+
+    def sendto(self, data, address):
+        self.sock.sendto(data, address)
+
+    def close(self):
+        self.sock.close()
+
+
+class UnixTransport(Transport):
+    """AF_UNIX datagrams between nodes on one host, one socket file per port."""
+
+    def __init__(self, directory=None):
+        self.directory = directory or transport_directory()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        # a peer queue that stays full drops the datagram (as UDP would)
+        self.sock.setblocking(False)
+        self.path = None
+
+    def path_for(self, port):
+        return os.path.join(self.directory, f"pa2-{port}.sock")
+
+    def bind(self, port):
+        self.path = self.path_for(port)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.sock.bind(self.path)
+        atexit.register(self.close)
+
+    def receive(self, timeout, bufsize):
+        readables, _, _ = select.select([self.sock], [], [], timeout)
+        if not readables:
+            return None
+        try:
+            data, path = self.sock.recvfrom(bufsize)
+        except BlockingIOError:
+            return None
+        port = int(os.path.basename(path)[4:-5]) if path else 0
+        return data, (LOCAL_IP, port)
+
+    def sendto(self, data, address):
+        _ip, port = address
+        deadline = time.monotonic() + UNIX_SEND_TIMEOUT
+        pause = POLL_MIN
+        while True:
+            try:
+                self.sock.sendto(data, self.path_for(port))
+                return
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    return
+                time.sleep(pause)
+                pause = min(pause * 2, POLL_MAX)
+            except (FileNotFoundError, ConnectionRefusedError):
+                # peer is down, datagram semantics say drop it
+                return
+
+    def close(self):
+        self.sock.close()
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+        self.path = None
+
+
+# inbox rings created by this process (their owner unlinks them)
+owned_rings = set()
+
+
+def ring_name(port):
+    return f"pa2-{port}"
+
+
+def open_ring(port):
+    try:
+        return shared_memory.SharedMemory(ring_name(port))
+    except FileNotFoundError:
+        return None
+
+
+def attach_ring(port):
+    """Maps another node's inbox ring (None if it isn't running)."""
+    memory = open_ring(port)
+    if memory is not None and port not in owned_rings:
+        # attaching registers the segment with our resource tracker, which
+        # would unlink the other process' inbox when this process exits
+        resource_tracker.unregister(memory._name, "shared_memory")
+    return memory
+
+
+class Ring:
+    """Inbox ring laid over a shared memory segment.
+
+    Positions are read and written through 8 byte memoryview casts since
+    `struct.pack_into` zero fills before packing, which a reader in another
+    process can observe.
+    """
+
+    def __init__(self, memory):
+        self.memory = memory
+        self.buf = memory.buf
+        self.head = self.buf[RING_HEAD_OFFSET : RING_HEAD_OFFSET + 8].cast("Q")
+        self.tail = self.buf[RING_TAIL_OFFSET : RING_TAIL_OFFSET + 8].cast("Q")
+        self.capacity = RING_HEADER.unpack_from(self.buf, 0)[3]
+
+    @classmethod
+    def create(cls, memory, capacity):
+        """Initializes a fresh segment, publishing the magic last."""
+        RING_HEADER.pack_into(memory.buf, 0, b"\0" * 4, RING_VERSION, 0, capacity)
+        ring = cls(memory)
+        ring.head[0] = 0
+        ring.tail[0] = 0
+        ring.buf[: len(RING_MAGIC)] = RING_MAGIC
+        return ring
+
+    def is_ready(self):
+        return bytes(self.buf[: len(RING_MAGIC)]) == RING_MAGIC
+
+    def is_closed(self):
+        return self.buf[RING_CLOSED_OFFSET] != 0
+
+    def mark_closed(self):
+        """Flags the ring so writers still attached to it re-attach."""
+        self.buf[RING_CLOSED_OFFSET] = 1
+
+    def write(self, port, data):
+        """Appends one datagram (single writer at a time), False when full."""
+        size = (RING_RECORD.size + len(data) + 7) & ~7
+        head, tail = self.head[0], self.tail[0]
+        offset = tail % self.capacity
+        contiguous = self.capacity - offset
+        needed = size if size <= contiguous else contiguous + size
+        if tail - head + needed > self.capacity:
+            return False
+        if size > contiguous:
+            RING_RECORD.pack_into(self.buf, RING_DATA_OFFSET + offset, 0, RING_WRAP)
+            tail += contiguous
+            offset = 0
+        start = RING_DATA_OFFSET + offset
+        RING_RECORD.pack_into(self.buf, start, port, len(data))
+        start += RING_RECORD.size
+        self.buf[start : start + len(data)] = data
+        # publish only once the record is fully written
+        self.tail[0] = tail + size
+        return True
+
+    def read(self):
+        """Pops the next (sender port, datagram) (single reader), None when empty."""
+        while True:
+            head = self.head[0]
+            if head == self.tail[0]:
+                return None
+            offset = head % self.capacity
+            port, length = RING_RECORD.unpack_from(self.buf, RING_DATA_OFFSET + offset)
+            if length == RING_WRAP:
+                self.head[0] = head + self.capacity - offset
+                continue
+            start = RING_DATA_OFFSET + offset + RING_RECORD.size
+            data = bytes(self.buf[start : start + length])
+            self.head[0] = head + ((RING_RECORD.size + length + 7) & ~7)
+            return port, data
+
+    def close(self):
+        # views into the segment must be released before it can be unmapped
+        self.head.release()
+        self.tail.release()
+        self.buf = None
+        self.memory.close()
+
+
+class RingWriter:
+    """Producer side of a peer's inbox ring, serialized across processes by flock."""
+
+    def __init__(self, ring, lock_path):
+        self.ring = ring
+        self.lock_file = open(lock_path, "a+b")
+        self.lock = Lock()
+
+    def write(self, port, data):
+        with self.lock:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+            try:
+                return self.ring.write(port, data)
+            finally:
+                fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def close(self):
+        self.lock_file.close()
+        self.ring.close()
+
+
+class SharedMemoryTransport(Transport):
+    """Per node inbox ring in `multiprocessing.shared_memory` (same host only).
+
+    Any number of senders append under a flock on the ring's lock file and the
+    owning node is the single reader, so datagrams skip the socket layer.
+    """
+
+    def __init__(self, directory=None, capacity=RING_CAPACITY):
+        self.directory = directory or transport_directory()
+        self.capacity = capacity
+        self.port = None
+        self.inbox = None
+        # peer port -> RingWriter
+        self.writers = {}
+        self.writers_lock = Lock()
+
+    def lock_path_for(self, port):
+        return os.path.join(self.directory, f"pa2-{port}.lock")
+
+    def bind(self, port):
+        self.port = port
+        stale = open_ring(port)
+        if stale is not None:
+            # a previous owner crashed; tell its writers to re-attach
+            stale.buf[RING_CLOSED_OFFSET] = 1
+            stale.unlink()
+            stale.close()
+        memory = shared_memory.SharedMemory(
+            ring_name(port), create=True, size=RING_DATA_OFFSET + self.capacity
+        )
+        owned_rings.add(port)
+        self.inbox = Ring.create(memory, self.capacity)
+        atexit.register(self.close)
+
+    def receive(self, timeout, bufsize):
+        now = time.monotonic()
+        spin_until = now + POLL_SPIN
+        deadline = now + timeout
+        pause = POLL_MIN
+        while True:
+            received = self.inbox.read()
+            if received is not None:
+                port, data = received
+                return data, (LOCAL_IP, port)
+            now = time.monotonic()
+            if now >= deadline:
+                return None
+            if now < spin_until:
+                time.sleep(0)
+                continue
+            time.sleep(pause)
+            pause = min(pause * 2, POLL_MAX)
+
+    def writer_for(self, port):
+        with self.writers_lock:
+            writer = self.writers.get(port)
+            if writer is not None and writer.ring.is_closed():
+                writer.close()
+                writer = None
+            if writer is None:
+                memory = attach_ring(port)
+                if memory is None:
+                    return None
+                ring = Ring(memory)
+                if not ring.is_ready():
+                    ring.close()
+                    return None
+                writer = RingWriter(ring, self.lock_path_for(port))
+                self.writers[port] = writer
+            return writer
+
+    def sendto(self, data, address):
+        _ip, port = address
+        writer = self.writer_for(port)
+        # peer down or ring full: dropped, like a datagram
+        if writer is not None:
+            writer.write(self.port, data)
+
+    def close(self):
+        with self.writers_lock:
+            for writer in self.writers.values():
+                writer.close()
+            self.writers = {}
+        if self.inbox is not None:
+            self.inbox.mark_closed()
+            memory = self.inbox.memory
+            self.inbox.close()
+            memory.unlink()
+            self.inbox = None
+            owned_rings.discard(self.port)
+
+
+TRANSPORTS = {
+    "udp": UDPTransport,
+    "unix": UnixTransport,
+    "shm": SharedMemoryTransport,
+}
+
+
+def create_transport(name=None):
+    """Transport backend by name, defaulting to `PA2_TRANSPORT` (or udp)."""
+    name = name or os.environ.get(TRANSPORT_ENV) or "udp"
+    if name not in TRANSPORTS:
+        raise ValueError(
+            f"Invalid transport: {name}; Expecting one of {', '.join(TRANSPORTS)}"
+        )
+    return TRANSPORTS[name]()
@@ -1,10 +1,17 @@
-import socket
 import signal
 import json
-import select
+import base64
+import heapq
+import mmap
+import os
+import sys
+import time
+from collections import deque
 from functools import wraps
-from log import logger
-from threading import Lock
+from log import logger, que
+from threading import Lock, Condition, Thread, current_thread
+from profiling import instrumented, instrument_lock, instrumentation
+from transport import create_transport
 
 
 class InvalidArgException(Exception):
@@ -64,6 +71,7 @@ def deadloop(method):
     return wrapper
 
 
+@instrumented("socket.decode")
 def decode(message):
     """Convert bytes to deserialized JSON."""
     return json.loads(message.decode("utf-8"))
@@ -74,37 +82,297 @@ def encode(message):
     return json.dumps(message).encode("utf-8")
 
 
+# largest datagram read off a socket (bigger payloads must be fragmented)
+RECV_BUFFER_SIZE = 4096
+# files at or above this size are memory-mapped instead of read in chunks
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
+
+def encode_chunk(data):
+    """Convert raw bytes to a JSON safe string."""
+    return base64.b64encode(data).decode("ascii")
+
+
+def decode_chunk(packet):
+    """Convert a JSON safe string back to raw bytes."""
+    return base64.b64decode(packet)
+
+
+def read_chunks(path, chunk_size):
+    """Yields `chunk_size` byte chunks from a file (or stdin when path is `-`)."""
+    if path == "-":
+        while True:
+            chunk = sys.stdin.buffer.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        # small files are read directly; large ones are paged in lazily via mmap
+        if size < MMAP_THRESHOLD:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for offset in range(0, size, chunk_size):
+                yield mapped[offset : offset + chunk_size]
+
+
+# receive work queue classes, highest priority first
+CONTROL, DATA, ROUTING = 0, 1, 2
+WORK_CLASS_NAMES = ["control", "data", "routing"]
+# message type -> work class (unknown types are handled as data)
+WORK_CLASSES = {
+    "ack": CONTROL,
+    "stats": CONTROL,
+    "window": CONTROL,
+    "hb": CONTROL,
+    "message": DATA,
+    "parity": DATA,
+    "data": DATA,
+    "dv": ROUTING,
+    "dvfrag": ROUTING,
+}
+# datagrams buffered per class before the receive thread starts dropping
+WORK_QUEUE_CAPACITY = 1024
+# handler threads per socket (0 handles datagrams inline on the receive thread)
+WORKERS_ENV = "PA2_WORKERS"
+WORKERS = len(WORK_CLASS_NAMES)
+# messages built by `create_*_message` start with their type
+TYPE_PREFIX = b'{"type": "'
+
+
+def workers_from_env():
+    """Worker pool size from `PA2_WORKERS` (defaults to one per work class)."""
+    workers = os.environ.get(WORKERS_ENV)
+    if workers is None:
+        return WORKERS
+    if not workers.isdigit():
+        raise InvalidArgException(f"{WORKERS_ENV} must be a non negative integer")
+    return int(workers)
+
+
+def peek_type(data):
+    """Message type of an encoded datagram (None if it has none or isn't JSON)."""
+    # the usual key order lets most datagrams skip a full decode
+    if data.startswith(TYPE_PREFIX):
+        end = data.find(b'"', len(TYPE_PREFIX))
+        if end != -1:
+            return data[len(TYPE_PREFIX) : end].decode("ascii", "replace")
+    try:
+        message = decode(data)
+    except ValueError:
+        return None
+    return message.get("type") if isinstance(message, dict) else None
+
+
+class WorkQueues:
+    """Bounded per class FIFOs served in strict priority order.
+
+    A class is handed to at most one worker at a time so its datagrams are
+    still handled in arrival order, while other classes run alongside it.
+    """
+
+    def __init__(self, capacity=WORK_QUEUE_CAPACITY):
+        self.capacity = capacity
+        self.queues = [deque() for _ in WORK_CLASS_NAMES]
+        self.busy = [False] * len(WORK_CLASS_NAMES)
+        self.enqueued = [0] * len(WORK_CLASS_NAMES)
+        self.dropped = [0] * len(WORK_CLASS_NAMES)
+        self.peak = [0] * len(WORK_CLASS_NAMES)
+        self.ready = Condition(Lock())
+
+    def put(self, work_class, item):
+        """Queues `item`, returns False (and counts a drop) when the class is full."""
+        with self.ready:
+            queue = self.queues[work_class]
+            if len(queue) >= self.capacity:
+                self.dropped[work_class] += 1
+                return False
+            queue.append(item)
+            self.enqueued[work_class] += 1
+            self.peak[work_class] = max(self.peak[work_class], len(queue))
+            self.ready.notify()
+        return True
+
+    def get(self, timeout):
+        """(work class, item) of the highest priority idle class, None on timeout."""
+        with self.ready:
+            while True:
+                for work_class, queue in enumerate(self.queues):
+                    if queue and not self.busy[work_class]:
+                        self.busy[work_class] = True
+                        return work_class, queue.popleft()
+                if not self.ready.wait(timeout):
+                    return None
+
+    def done(self, work_class):
+        """Marks the class idle again once its item was handled."""
+        with self.ready:
+            self.busy[work_class] = False
+            if self.queues[work_class]:
+                self.ready.notify()
+
+    def stats(self):
+        """{ class: {depth, peak, enqueued, dropped} } snapshot."""
+        with self.ready:
+            return {
+                name: {
+                    "depth": len(self.queues[work_class]),
+                    "peak": self.peak[work_class],
+                    "enqueued": self.enqueued[work_class],
+                    "dropped": self.dropped[work_class],
+                }
+                for work_class, name in enumerate(WORK_CLASS_NAMES)
+            }
+
+
+class DelayScheduler:
+    """Runs delayed calls on a single thread, earliest due first."""
+
+    def __init__(self, stop_event):
+        self.stop_event = stop_event
+        # (due, order, fn, args); `order` keeps equal due times in call order
+        self.pending = []
+        self.order = 0
+        self.ready = Condition(Lock())
+        self.started = False
+
+    def call_later(self, delay, fn, *args):
+        """Schedules `fn(*args)` in `delay` seconds."""
+        with self.ready:
+            due = time.monotonic() + delay
+            heapq.heappush(self.pending, (due, self.order, fn, args))
+            self.order += 1
+            if not self.started:
+                self.started = True
+                Thread(target=self.run, daemon=current_thread().daemon).start()
+            self.ready.notify()
+
+    @deadloop
+    def run(self):
+        """Waits for the earliest pending call to come due and runs it."""
+        with self.ready:
+            if not self.pending:
+                self.ready.wait(1)
+                return
+            due, _order, fn, args = self.pending[0]
+            wait = due - time.monotonic()
+            if wait > 0:
+                # woken early when a sooner call is scheduled
+                self.ready.wait(min(wait, 1))
+                return
+            heapq.heappop(self.pending)
+        try:
+            fn(*args)
+        except Exception:
+            logger.exception("delayed call failed")
+
+
 class SocketClient:
-    def __init__(self, listen_port, stop_event, on_message_fn):
-        self.sock = self._create_sock()
-        self.sock_lock = Lock()
+    def __init__(
+        self,
+        listen_port,
+        stop_event,
+        on_message_fn,
+        workers=None,
+        queue_capacity=WORK_QUEUE_CAPACITY,
+        transport=None,
+    ):
+        # `transport` (or `PA2_TRANSPORT`) picks the udp, unix or shm backend
+        self.sock = self._create_sock(transport)
+        self.sock_lock = instrument_lock(Lock(), "sock_lock")
         self.stop_event = stop_event
         self.on_message_fn = on_message_fn
 
-        self.sock.bind(("", listen_port))
+        # the receive thread only reads datagrams, `workers` threads handle them
+        self.workers = workers_from_env() if workers is None else workers
+        self.work_queues = WorkQueues(queue_capacity)
+        self.workers_started = False
+
+        self.sock.bind(listen_port)
 
-    def _create_sock(self):
-        """Create a socket."""
+    def _create_sock(self, transport):
+        """Create the transport endpoint."""
         try:
-            return socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        except socket.error as e:
-            raise SocketClientError(f"UDP client error when creating socket: {e}")
+            return create_transport(transport)
+        except ValueError as e:
+            raise InvalidArgException(str(e))
+        except OSError as e:
+            raise SocketClientError(f"Client error when creating transport: {e}")
+
+    def start_workers(self):
+        """Starts the worker pool (daemonic when the receive thread is)."""
+        self.workers_started = True
+        for _ in range(self.workers):
+            Thread(target=self.work, daemon=current_thread().daemon).start()
 
     @deadloop
     def listen(self):
         """Listens for messages."""
-        readables, _, _ = select.select([self.sock], [], [], 1)
-        for read_socket in readables:
-            data, (sender_ip, _) = read_socket.recvfrom(4096)
-            message = decode(data)
-            self.on_message_fn(read_socket, sender_ip, message)
+        if not self.workers_started:
+            self.start_workers()
+        received = self.sock.receive(1, RECV_BUFFER_SIZE)
+        if received is not None:
+            data, (sender_ip, _) = received
+            if self.workers:
+                self.enqueue(self.sock, sender_ip, data)
+            else:
+                self.dispatch(self.sock, sender_ip, decode(data))
+        instrumentation.record_depth("log.queue", que.qsize())
+
+    def enqueue(self, sock, sender_ip, data):
+        """Queues a raw datagram by message type for the worker pool."""
+        type = peek_type(data)
+        work_class = WORK_CLASSES.get(type)
+        if work_class is None:
+            logger.warning(f"Unknown message type {type!r} from {sender_ip}, as data")
+            instrumentation.record_count("socket.queue.unknown")
+            work_class = DATA
+        name = WORK_CLASS_NAMES[work_class]
+        if not self.work_queues.put(work_class, (sock, sender_ip, data)):
+            instrumentation.record_count(f"socket.queue.{name}.dropped")
+            return
+        instrumentation.record_depth(
+            f"socket.queue.{name}", len(self.work_queues.queues[work_class])
+        )
+
+    @deadloop
+    def work(self):
+        """Handles queued datagrams, highest priority class first."""
+        work = self.work_queues.get(1)
+        if work is None:
+            return
+        work_class, (sock, sender_ip, data) = work
+        try:
+            self.dispatch(sock, sender_ip, decode(data))
+        except Exception:
+            # a malformed datagram or failing handler mustn't stop the worker
+            logger.exception(f"Failed to handle datagram from {sender_ip}")
+        finally:
+            self.work_queues.done(work_class)
+
+    def queue_stats(self):
+        """Receive work queue depths and drop counters per class."""
+        return self.work_queues.stats()
+
+    @instrumented("socket.on_message")
+    def dispatch(self, sock, sender_ip, message):
+        """Hands a decoded datagram to the protocol handler."""
+        self.on_message_fn(sock, sender_ip, message)
 
     def send(self, message, port, ip="0.0.0.0"):
         """Sends a single packet onto UDP socket."""
+        # logger.info(f"sending {message} to {port} @ {ip}")
+        self.send_encoded(encode(message), port, ip)
+
+    def send_encoded(self, packet, port, ip="0.0.0.0"):
+        """Sends an already serialized packet (e.g. cached fragments)."""
         try:
-            # logger.info(f"sending {message} to {port} @ {ip}")
-            packet = encode(message)
             with self.sock_lock:
                 self.sock.sendto(packet, (ip, port))
-        except socket.error as e:
-            raise SocketClientError(f"UDP socket error: {e}")
+        except OSError as e:
+            raise SocketClientError(f"Transport error: {e}")
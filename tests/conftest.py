@@ -0,0 +1,7 @@
+"""Puts src/ on the path; the modules import each other as top-level names."""
+import os
+import sys
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
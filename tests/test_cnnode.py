@@ -0,0 +1,47 @@
+import time
+
+from cnnode import CNLink, parse_args
+
+
+def create_link(send_neighbors):
+    # port 0 binds an ephemeral endpoint
+    link = CNLink(0, [{"port": 4112, "loss": 0.1}], send_neighbors)
+    link.dv_node.heartbeat_interval = 0.02
+    return link
+
+
+def test_parse_args_send_neighbors_are_ints():
+    args = ["4111", "receive", "4112", "0.1", "send", "4222", "4333", "last"]
+    port, recv_neighbors, send_neighbors, is_last = parse_args(args)
+    assert port == 4111
+    assert recv_neighbors == [{"port": 4112, "loss": 0.1}]
+    assert send_neighbors == [4222, 4333]
+    assert is_last
+
+
+def test_send_neighbors_are_monitored():
+    link = create_link(["4222"])
+    node = link.dv_node
+    try:
+        assert node.adjacent_ports == {4112, 4222}
+        # one pass sends keepalives to every adjacent link without raising
+        type(node).monitor_neighbors.__wrapped__(node)
+        assert set(node.last_sent) == {4112, 4222}
+        node.heard_from(4222)
+        assert 4222 in node.last_heard
+    finally:
+        link.stop_event.set()
+        node.stop_event.set()
+
+
+def test_silent_send_neighbor_is_withdrawn():
+    link = create_link([4222])
+    node = link.dv_node
+    try:
+        node.heard_from(4222)
+        time.sleep(node.heartbeat_interval * (node.heartbeat_misses + 1))
+        type(node).monitor_neighbors.__wrapped__(node)
+        assert 4222 in node.dead_neighbors
+    finally:
+        link.stop_event.set()
+        node.stop_event.set()
@@ -0,0 +1,49 @@
+import snapshot
+from dvnode import DVNode
+
+
+def create_node(sent, snapshot_path=None):
+    # port 0 binds an ephemeral endpoint; the node acts as 6200
+    node = DVNode(
+        0,
+        [{"port": 6201, "loss": 0.1}, {"port": 6203, "loss": 0.1}],
+        snapshot_path=snapshot_path,
+    )
+    node.port = 6200
+    node.client.send_encoded = lambda datagram, port, ip="0.0.0.0": sent.append(port)
+    return node
+
+
+def test_dv_from_non_neighbor_is_ignored():
+    node = create_node([])
+    before = dict(node.distance_vector)
+    vector = {"6203": {"loss": 0.0, "hops": []}, "6205": {"loss": 0.1, "hops": []}}
+    node.handle_incoming_dv({"port": 6204}, {"vector": vector})
+    assert node.distance_vector == before
+
+
+def test_dv_from_neighbor_is_merged():
+    node = create_node([])
+    vector = {"6202": {"loss": 0.1, "hops": []}}
+    node.handle_incoming_dv({"port": 6201}, {"vector": vector})
+    assert node.distance_vector[6202] == {"loss": 0.2, "hops": [6201]}
+
+
+def test_dispatch_only_reaches_adjacent_links():
+    sent = []
+    node = create_node(sent)
+    node.distance_vector[6202] = {"loss": 0.2, "hops": [6201]}
+    node.dispatch_dv(node.distance_vector)
+    assert sorted(set(sent)) == [6201, 6203]
+
+
+def test_neighbor_vector_change_is_snapshotted(tmp_path):
+    node = create_node([], str(tmp_path / "node-6200.snap"))
+    node.save_snapshot()
+    # a worse route than the direct link leaves our own table unchanged
+    vector = {"6203": {"loss": 0.5, "hops": []}}
+    node.handle_incoming_dv({"port": 6201}, {"vector": vector})
+    assert node.snapshot_version != node.neighbor_vectors_version
+    node.save_snapshot()
+    saved = snapshot.read_snapshot(str(tmp_path / "node-6200.snap"))
+    assert saved.neighbor_vectors == {6201: vector}
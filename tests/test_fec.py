@@ -0,0 +1,87 @@
+from fec import FecDecoder, FecEncoder
+
+
+def send_group(encoder, payloads, first=0):
+    parity = None
+    for seq, payload in enumerate(payloads, first):
+        parity = encoder.add(seq, payload, seq == first + len(payloads) - 1)
+    return parity
+
+
+def test_parity_only_when_group_closes():
+    encoder = FecEncoder(3)
+    assert encoder.add(0, "a") is None
+    assert encoder.add(1, "b") is None
+    parity = encoder.add(2, "c")
+    assert parity["first"] == 0
+    assert parity["lengths"] == [1, 1, 1]
+
+
+def test_recovers_single_missing_packet():
+    payloads = ["hello", "wo", "rld!", "é"]
+    parity = send_group(FecEncoder(4), payloads)
+    for missing in range(len(payloads)):
+        decoder = FecDecoder(4)
+        for seq, payload in enumerate(payloads):
+            if seq != missing:
+                decoder.add(seq, payload, {})
+        recovered = decoder.recover(0, parity["lengths"], parity["parity"])
+        assert recovered == (missing, payloads[missing])
+
+
+def test_short_last_group():
+    encoder = FecEncoder(4)
+    encoder.add(0, "abcd")
+    parity = send_group(encoder, ["ef", ""], first=4)
+    assert parity["first"] == 4
+    decoder = FecDecoder(4)
+    decoder.add(5, "", {})
+    assert decoder.recover(4, parity["lengths"], parity["parity"]) == (4, "ef")
+
+
+def test_no_recovery_with_two_missing_or_none_missing():
+    payloads = ["a", "b", "c"]
+    parity = send_group(FecEncoder(3), payloads)
+    decoder = FecDecoder(3)
+    decoder.add(0, "a", {})
+    assert decoder.recover(0, parity["lengths"], parity["parity"]) is None
+    for seq, payload in enumerate(payloads):
+        decoder.add(seq, payload, {})
+    assert decoder.recover(0, parity["lengths"], parity["parity"]) is None
+
+
+def test_discard_below_forgets_acked_groups():
+    encoder = FecEncoder(2)
+    send_group(encoder, ["a", "b", "c", "d"])
+    encoder.discard_below(2)
+    assert list(encoder.groups) == [2]
+    decoder = FecDecoder(2)
+    for seq in range(4):
+        decoder.add(seq, "x", {})
+    decoder.discard_below(3)
+    assert sorted(decoder.received) == [2, 3]
+
+
+def test_groups_restart_at_transfer_boundary():
+    encoder = FecEncoder(4)
+    # "abc" ends mid group; "defgh" starts at seq 3 with groups of its own
+    send_group(encoder, ["a", "b", "c"])
+    second = ["d", "e", "f", "g", "h"]
+    parities = [
+        encoder.add(seq, payload, seq == 7, first=3)
+        for seq, payload in enumerate(second, 3)
+    ]
+    assert [p["first"] for p in parities if p] == [3, 7]
+    parity = parities[3]
+    decoder = FecDecoder(4)
+    for seq, payload in enumerate(second[1:4], 4):
+        decoder.add(seq, payload, {})
+    assert decoder.recover(3, parity["lengths"], parity["parity"]) == (3, "d")
+
+
+def test_decoder_keeps_open_group_of_later_transfer():
+    decoder = FecDecoder(4)
+    for seq in range(3, 6):
+        decoder.add(seq, "x", {})
+    decoder.discard_below(5, first=3)
+    assert sorted(decoder.received) == [3, 4, 5]
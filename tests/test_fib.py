@@ -0,0 +1,42 @@
+from fib import ForwardingTable
+
+
+def create_table():
+    return ForwardingTable(
+        {
+            1025: {"loss": 0.1, "hops": []},
+            1026: {"loss": 0.2, "hops": [1025]},
+            "1027": {"loss": 0.3, "hops": [1025, 1028, 1029]},
+        }
+    )
+
+
+def test_direct_and_single_hop_routes():
+    table = create_table()
+    assert table.lookup(1025) == 1025
+    assert table.lookup(1026, flow="a") == 1025
+    assert table.lookup(9999) is None
+
+
+def test_flow_sticks_to_one_hop():
+    table = create_table()
+    for flow in ["a", 7, ("1024", 1027)]:
+        hops = {table.lookup(1027, flow) for _ in range(20)}
+        assert len(hops) == 1
+
+
+def test_flow_hop_is_stable_across_tables_and_processes():
+    # crc32(b"b") % 3 == 2, so flow "b" always takes the third hop
+    assert create_table().lookup(1027, "b") == 1029
+    assert create_table().lookup(1027, "b") == 1029
+
+
+def test_flows_spread_over_equal_cost_hops():
+    table = create_table()
+    hops = {table.lookup(1027, flow) for flow in range(30)}
+    assert hops == {1025, 1028, 1029}
+
+
+def test_round_robin_without_flow():
+    table = create_table()
+    assert [table.lookup(1027) for _ in range(4)] == [1025, 1028, 1029, 1025]
@@ -0,0 +1,65 @@
+import json
+import random
+
+from fragment import COMPRESS_THRESHOLD, Reassembler, encode_fragments
+from utils import RECV_BUFFER_SIZE, decode
+
+
+def create_vector(routes):
+    return {
+        str(10000 + i): {"loss": 0.05, "hops": [2000 + i % 7]} for i in range(routes)
+    }
+
+
+def reassemble(datagrams, reassembler=None):
+    reassembler = reassembler or Reassembler()
+    body = None
+    for datagram in datagrams:
+        message = decode(datagram)
+        body = reassembler.add(message["metadata"], message["payload"])
+    return body
+
+
+def test_small_body_single_uncompressed_fragment():
+    body = {"vector": create_vector(2)}
+    datagrams = encode_fragments("dvfrag", 1024, 1, body)
+    assert len(datagrams) == 1
+    assert decode(datagrams[0])["metadata"]["compressed"] is False
+    assert reassemble(datagrams) == body
+
+
+def test_large_body_round_trips_compressed():
+    body = {"vector": create_vector(5000)}
+    assert len(json.dumps(body)) > COMPRESS_THRESHOLD
+    datagrams = encode_fragments("dvfrag", 1024, 1, body)
+    assert len(datagrams) > 1
+    assert all(len(datagram) <= RECV_BUFFER_SIZE for datagram in datagrams)
+    assert decode(datagrams[0])["metadata"]["compressed"] is True
+    assert reassemble(datagrams) == body
+
+
+def test_out_of_order_and_interleaved_senders():
+    first = {"vector": create_vector(3000)}
+    second = {"vector": create_vector(4000)}
+    datagrams = encode_fragments("dvfrag", 1024, 1, first, fragment_size=256)
+    datagrams += encode_fragments("dvfrag", 1025, 1, second, fragment_size=256)
+    random.Random(7).shuffle(datagrams)
+    reassembler = Reassembler()
+    bodies = []
+    for datagram in datagrams:
+        message = decode(datagram)
+        body = reassembler.add(message["metadata"], message["payload"])
+        if body is not None:
+            bodies.append(body)
+    assert len(bodies) == 2 and first in bodies and second in bodies
+    assert reassembler.partials == {}
+
+
+def test_incomplete_messages_expire():
+    datagrams = encode_fragments(
+        "dvfrag", 1024, 1, {"vector": create_vector(3000)}, fragment_size=256
+    )
+    reassembler = Reassembler(timeout=0)
+    assert reassemble(datagrams[:-1], reassembler) is None
+    reassembler.expire(float("inf"))
+    assert reassembler.partials == {}
@@ -0,0 +1,116 @@
+import pytest
+
+from loss import (
+    BernoulliLoss,
+    GilbertElliottLoss,
+    LossModel,
+    NthLoss,
+    TraceLoss,
+    build_loss_model,
+    parse_impairment,
+    parse_loss_spec,
+)
+from utils import InvalidArgException
+
+
+def drops(model, count=500):
+    return [model.should_drop(n) for n in range(count)]
+
+
+def test_loss_model_is_abstract():
+    with pytest.raises(TypeError):
+        LossModel()
+
+
+@pytest.mark.parametrize(
+    "create",
+    [
+        lambda seed: BernoulliLoss(0.2, seed=seed),
+        lambda seed: GilbertElliottLoss(0.05, 0.5, seed=seed),
+    ],
+)
+def test_same_seed_same_drops(create):
+    assert drops(create("7-5000")) == drops(create("7-5000"))
+    assert drops(create("7-5000")) != drops(create("7-5001"))
+
+
+def test_delays_do_not_change_drops():
+    plain = BernoulliLoss(0.2, seed="7")
+    impaired = BernoulliLoss(0.2, seed="7", delay=0.005, jitter=0.002, reorder=0.1)
+    for n in range(500):
+        assert plain.should_drop(n) == impaired.should_drop(n)
+        impaired.delay_for()
+
+
+def test_seeded_delays_repeat():
+    first = BernoulliLoss(0, seed="7", jitter=0.01, reorder=0.1)
+    second = BernoulliLoss(0, seed="7", jitter=0.01, reorder=0.1)
+    assert [first.delay_for() for _ in range(100)] == [
+        second.delay_for() for _ in range(100)
+    ]
+
+
+def test_unseeded_delays_are_random():
+    first, second = BernoulliLoss(0, jitter=0.01), BernoulliLoss(0, jitter=0.01)
+    assert [first.delay_for() for _ in range(20)] != [
+        second.delay_for() for _ in range(20)
+    ]
+
+
+def test_no_impairment_handles_inline():
+    assert BernoulliLoss(0.5, seed="7").delay_for() == 0
+
+
+def test_nth_drops_first_time_only():
+    model = NthLoss(3)
+    assert [n for n in range(10) if model.should_drop(n)] == [3, 6, 9]
+    assert not model.should_drop(3)
+    model.reset()
+    assert model.should_drop(3)
+
+
+def test_trace_loops(tmp_path):
+    path = tmp_path / "drops.txt"
+    path.write_text("# recorded\n0 1\n1\n")
+    assert drops(TraceLoss(str(path)), 6) == [False, True, True] * 2
+
+
+def test_parse_loss_spec():
+    assert isinstance(parse_loss_spec("p:0.1"), BernoulliLoss)
+    assert isinstance(parse_loss_spec("d:4"), NthLoss)
+    assert isinstance(parse_loss_spec("ge:0.05,0.5,0,1"), GilbertElliottLoss)
+    with pytest.raises(InvalidArgException):
+        parse_loss_spec("ge:0.05")
+    with pytest.raises(InvalidArgException):
+        parse_loss_spec("trace:/does/not/exist")
+
+
+def test_parse_impairment():
+    assert parse_impairment("5,2,0.01") == {
+        "delay": 0.005,
+        "jitter": 0.002,
+        "reorder": 0.01,
+    }
+    with pytest.raises(InvalidArgException):
+        parse_impairment("1,2,3,4")
+
+
+def test_explicit_seed_is_salted_per_port(monkeypatch):
+    monkeypatch.delenv("PA2_SEED", raising=False)
+    sender = build_loss_model("-p", 0.2, 5000, seed="7")
+    receiver = build_loss_model("-p", 0.2, 5001, seed="7")
+    assert drops(sender) != drops(receiver)
+    assert drops(build_loss_model("-p", 0.2, 5000, seed="7")) == drops(
+        build_loss_model("-p", 0.2, 5000, seed="7")
+    )
+
+
+def test_env_seed_matches_explicit_seed(monkeypatch):
+    monkeypatch.setenv("PA2_SEED", "7")
+    from_env = build_loss_model("-p", 0.2, 5000)
+    assert drops(from_env) == drops(build_loss_model("-p", 0.2, 5000, seed="7"))
+
+
+def test_impaired_only_when_configured():
+    assert not BernoulliLoss(0.1).is_impaired()
+    assert BernoulliLoss(0.1, reorder=0.1).is_impaired()
@@ -0,0 +1,47 @@
+import snapshot
+
+
+def create_vectors():
+    return {
+        1025: {
+            "1026": {"loss": 0.05, "hops": [1025]},
+            "1027": {"loss": 0.1, "hops": []},
+        },
+        1027: {"1025": {"loss": 0.25, "hops": [1027, 1026]}},
+    }
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "node-1024.snap")
+    size = snapshot.write_snapshot(path, 1024, create_vectors())
+    saved = snapshot.read_snapshot(path)
+    assert (tmp_path / "node-1024.snap").stat().st_size == size
+    assert saved.port == 1024
+    assert saved.neighbor_vectors == create_vectors()
+
+
+def test_rewrite_replaces_atomically(tmp_path):
+    path = str(tmp_path / "node-1024.snap")
+    snapshot.write_snapshot(path, 1024, create_vectors())
+    snapshot.write_snapshot(path, 1024, {})
+    assert snapshot.read_snapshot(path).neighbor_vectors == {}
+    assert [p.name for p in tmp_path.iterdir()] == ["node-1024.snap"]
+
+
+def test_missing_or_corrupt_is_cold_start(tmp_path):
+    path = tmp_path / "node-1024.snap"
+    assert snapshot.read_snapshot(str(path)) is None
+    snapshot.write_snapshot(str(path), 1024, create_vectors())
+    data = bytearray(path.read_bytes())
+    data[len(data) // 2] ^= 0xFF
+    path.write_bytes(bytes(data))
+    assert snapshot.read_snapshot(str(path)) is None
+    path.write_bytes(b"")
+    assert snapshot.read_snapshot(str(path)) is None
+
+
+def test_path_for_needs_env(tmp_path, monkeypatch):
+    monkeypatch.delenv(snapshot.SNAPSHOT_ENV, raising=False)
+    assert snapshot.path_for(1024) is None
+    monkeypatch.setenv(snapshot.SNAPSHOT_ENV, str(tmp_path / "snap"))
+    assert snapshot.path_for(1024) == str(tmp_path / "snap" / "node-1024.snap")